@@ -1,27 +1,277 @@
 from __future__ import annotations
 
-import sys
+import argparse
+import datetime as dt
+import os
 import signal
-
-from fastlog import log
+import sys
+from collections.abc import Iterable
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from PySide6.QtGui import QGuiApplication
-from PySide6.QtQml import QQmlApplicationEngine
+from fastlog import log
 
-from .backend import BackendInterface, Backend
+if TYPE_CHECKING:
+    from .utils.grading import ScoreType
 
 
 def main() -> None:
+    # subcommands first, everything else is a station
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        COMMANDS[sys.argv[1]](sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(prog="easysnec")
+    parser.add_argument(
+        "--headless", action="store_true", help="run the station without the gui, grades go to the log"
+    )
+    parser.add_argument(
+        "--port",
+        action="append",
+        default=[],
+        help="serial port to read from (repeatable, default: every SPORTident station)",
+    )
+    parser.add_argument("--courses", help="IOF XML 3.0 or CSV course file (default: the builtin courses)")
+    add_time_limit_options(parser)
+    parser.add_argument(
+        "--score-type",
+        choices=SCORE_TYPES,
+        default="animal-o",
+        help="how --headless grades cards, the gui has its own setting (default: animal-o)",
+    )
+    parser.add_argument(
+        "--event",
+        help="name of the event, its readouts go to ~/.easysnec/events/EVENT.sqlite3 and come back on a restart "
+        "(default: today's date)",
+    )
+    parser.add_argument("--journal", help="readout journal path (default: the event's)")
+    parser.add_argument(
+        "--export",
+        action="append",
+        default=[],
+        metavar="PATH",
+        help="keep a live results export, .csv or IOF XML 3.0 ResultList (.xml), rewritten at startup and "
+        "appended to as cards come in (repeatable)",
+    )
+    parser.add_argument(
+        "--broadcast-port",
+        type=int,
+        help="push every new result as newline-delimited JSON to TCP clients on PORT",
+    )
+    parser.add_argument(
+        "--broadcast-host",
+        default="127.0.0.1",
+        help="address to broadcast results on, 0.0.0.0 for other machines on the network (default: 127.0.0.1)",
+    )
+    parser.add_argument(
+        "--reader",
+        choices=("thread", "async"),
+        default=os.environ.get("EASYSNEC_READER", "thread"),
+        help="a thread per serial port, or every port on one asyncio thread (posix, extended protocol stations "
+        "only) (default: thread)",
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, help="serve per-stage timings on http://127.0.0.1:PORT/metrics (Prometheus)"
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=60,
+        help="log a station health summary every this many seconds, 0 to turn it off (default: 60)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="DIR",
+        default=os.environ.get("EASYSNEC_PROFILE"),
+        help="sample cProfile and tracemalloc around reading and grading, snapshots go to DIR "
+        "(default: $EASYSNEC_PROFILE, off if unset)",
+    )
+    parser.add_argument(
+        "--profile-every",
+        type=int,
+        default=500,
+        help="write a profiling snapshot every this many readouts (default: 500)",
+    )
+    parser.add_argument(
+        "--profile-minutes",
+        type=float,
+        default=15,
+        help="... or every this many minutes, whichever comes first (default: 15)",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="also trace allocations with tracemalloc, about doubles the cost of grading while profiling "
+        "(default: on)",
+    )
+    # anything we don't know is left for qt (-platform, -style, ...)
+    args, qt_args = parser.parse_known_args()
+    args.journal_path = journal_path(parser, args)
+
+    from .utils.profiling import PROFILER, ProfileConfig
+
+    if args.profile:
+        PROFILER.start(
+            ProfileConfig(
+                Path(args.profile),
+                every_readouts=args.profile_every,
+                every_seconds=args.profile_minutes * 60,
+                memory_frames=1 if args.profile_memory else 0,
+            )
+        )
+    try:
+        run_station(args, qt_args)
+    finally:
+        # the last snapshot, if we were profiling
+        PROFILER.stop()
+
+
+SCORE_TYPES = ("animal-o", "classic-o", "score-o")
+
+
+def score_type(name: str) -> ScoreType:
+    # "classic-o" -> ScoreType.CLASSIC_O
+    from .utils.grading import ScoreType
+
+    return ScoreType[name.upper().replace("-", "_")]
+
+
+def add_time_limit_options(parser: argparse.ArgumentParser) -> None:
+    # course files don't say how long a score-o course is, so the station has to be told
+    parser.add_argument(
+        "--time-limit",
+        type=minutes,
+        metavar="MINUTES",
+        help="how long runners have on the score-o courses of --courses (default: no limit)",
+    )
+    parser.add_argument(
+        "--penalty-per-minute",
+        type=points,
+        default=0,
+        metavar="POINTS",
+        help="points a score-o runner loses for every started minute over --time-limit (default: 0)",
+    )
+
+
+def minutes(value: str) -> dt.timedelta:
+    try:
+        limit = dt.timedelta(minutes=float(value))
+    except (ValueError, OverflowError):
+        raise argparse.ArgumentTypeError(f"{value!r} is not a number of minutes") from None
+    if limit <= dt.timedelta(0):
+        raise argparse.ArgumentTypeError("must be more than 0 minutes")
+    return limit
+
+
+def points(value: str) -> float:
+    try:
+        penalty = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value!r} is not a number of points") from None
+    if not penalty >= 0:
+        raise argparse.ArgumentTypeError("can't be less than 0 points")
+    return penalty
+
+
+def journal_path(parser: argparse.ArgumentParser, args: argparse.Namespace) -> Path:
+    # --journal, or the journal of --event (today's without one)
+    from .utils.journal import default_journal_path
+
+    if args.journal:
+        return Path(args.journal)
+    try:
+        return default_journal_path(args.event)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+def check_journals(parser: argparse.ArgumentParser, paths: list[Path | str]) -> None:
+    # export / regrade read journals that must be there already: a typo is an error before any output is opened
+    for path in paths:
+        if not Path(path).is_file():
+            parser.error(f"no readout journal at {path}")
+
+
+def run_station(args: argparse.Namespace, qt_args: list[str]) -> None:
+    if args.headless:
+        # imported here so headless never loads PySide6
+        from .headless import run_headless
+
+        run_headless(
+            args.port,
+            args.journal_path,
+            args.courses,
+            score_type=score_type(args.score_type),
+            metrics_port=args.metrics_port,
+            metrics_interval=args.metrics_interval,
+            time_limit=args.time_limit,
+            penalty_per_minute=args.penalty_per_minute,
+            reader_backend=args.reader,
+            exports=args.export,
+            broadcast_port=args.broadcast_port,
+            broadcast_host=args.broadcast_host,
+        )
+    else:
+        run_gui(
+            [sys.argv[0], *qt_args],
+            args.journal_path,
+            args.courses,
+            args.metrics_port,
+            args.metrics_interval,
+            time_limit=args.time_limit,
+            penalty_per_minute=args.penalty_per_minute,
+            reader_backend=args.reader,
+            exports=args.export,
+            broadcast_port=args.broadcast_port,
+            broadcast_host=args.broadcast_host,
+            ports=args.port,
+        )
+
+
+def run_gui(
+    argv: list[str],
+    journal_path: Path | str,
+    course_file: str | None = None,
+    metrics_port: int | None = None,
+    metrics_interval: float = 60,
+    time_limit: dt.timedelta | None = None,
+    penalty_per_minute: float = 0,
+    reader_backend: str = "thread",
+    exports: Iterable[Path | str] = (),
+    broadcast_port: int | None = None,
+    broadcast_host: str = "127.0.0.1",
+    ports: Iterable[str] = (),
+) -> None:
+    from PySide6.QtGui import QGuiApplication
+    from PySide6.QtQml import QQmlApplicationEngine
+
+    from .backend import Backend, BackendInterface
+    from .utils.broadcast import ResultBroadcaster
+    from .utils.metrics import start_reporting
+
     # Set up the application window
-    app = QGuiApplication(sys.argv)
+    app = QGuiApplication(argv)
     engine = QQmlApplicationEngine()
     context = engine.rootContext()
 
     # --- connect backend
     backend_interface = BackendInterface()
     context.setContextProperty("backend", backend_interface)
-    backend = Backend(backend_interface, engine)
+    backend = Backend(
+        backend_interface,
+        engine,
+        journal_path,
+        time_limit=time_limit,
+        penalty_per_minute=penalty_per_minute,
+        reader_backend=reader_backend,
+        exports=exports,
+        broadcaster=ResultBroadcaster(broadcast_port, broadcast_host) if broadcast_port is not None else None,
+    )
+    if course_file:
+        backend_interface.set_course_set(course_file)
+    # --port picks the readers to start with, the ports list in the gui changes them from then on
+    backend_interface.set_selected_ports(ports)
     backend.start()
 
     # TODO: This is prob how we embed files in the application
@@ -39,11 +289,157 @@ def main() -> None:
 
     # --- wire up qt to kill python and vice versa
     app.aboutToQuit.connect(backend.shutdown)
+    reporters = start_reporting(metrics_port, metrics_interval)
+    app.aboutToQuit.connect(lambda: [reporter.stop() for reporter in reporters])
     signal.signal(signal.SIGINT, lambda x, y: app.quit())
 
     # --- start the app
     app.exec()
 
 
+def profile_diff(argv: list[str]) -> None:
+    from .utils.profiling import diff_snapshots
+
+    parser = argparse.ArgumentParser(
+        prog="easysnec profile-diff", description="compare two snapshots written by easysnec --profile"
+    )
+    parser.add_argument("old", help="the earlier .pstats or .tracemalloc snapshot")
+    parser.add_argument("new", help="the later snapshot, of the same kind")
+    parser.add_argument("--limit", type=int, default=25, help="how many rows to show (default: 25)")
+    args = parser.parse_args(argv)
+    try:
+        print(diff_snapshots(args.old, args.new, args.limit))
+    except ValueError as e:
+        parser.error(str(e))
+
+
+def export(argv: list[str]) -> None:
+    # regrade a journal into result files after the fact, one readout at a time
+    from .utils.course_index import CourseIndex
+    from .utils.course_loader import load_courses
+    from .utils.export import open_result_writer
+    from .utils.grading import COURSES, OutputData
+    from .utils.journal import replay
+    from .utils.splits import SplitAnalysis
+
+    parser = argparse.ArgumentParser(
+        prog="easysnec export", description="write every readout in a journal out as results"
+    )
+    parser.add_argument("out", nargs="+", help=".csv or IOF XML 3.0 ResultList (.xml) file to write")
+    parser.add_argument("--event", help="the event to export (default: today's)")
+    parser.add_argument("--journal", help="readout journal path (default: the event's)")
+    parser.add_argument("--courses", help="IOF XML 3.0 or CSV course file (default: the builtin courses)")
+    add_time_limit_options(parser)
+    parser.add_argument("--score-type", choices=SCORE_TYPES, default="animal-o")
+    args = parser.parse_args(argv)
+
+    try:
+        courses = CourseIndex(
+            load_courses(
+                args.courses, time_limit=args.time_limit, penalty_per_minute=args.penalty_per_minute
+            )
+            if args.courses
+            else COURSES
+        )
+    except (OSError, ValueError, SyntaxError) as e:
+        # a missing or broken course file is a usage error, before any output is opened
+        parser.error(f"could not load courses from {args.courses}: {e}")
+    path = journal_path(parser, args)
+    check_journals(parser, [path])
+    writers = [open_result_writer(path) for path in args.out]
+    # time lost against the runners before, like the live export
+    splits = SplitAnalysis()
+    try:
+        for input_data in replay(path):
+            runner_grade = input_data.grade_against_closest(courses, score_type(args.score_type))
+            output = OutputData.from_grade(runner_grade, splits.add(runner_grade))
+            for writer in writers:
+                writer.write(output)
+    finally:
+        for writer in writers:
+            writer.close()
+            log.info(f"exported {writer.count} results to {writer.path}")
+
+
+def regrade(argv: list[str]) -> None:
+    # grade whole journals again on every core (utils/regrade.py), e.g. after a course got fixed
+    import time
+    from collections import Counter
+    from itertools import chain
+
+    from .utils.course_loader import load_courses
+    from .utils.export import open_result_writer
+    from .utils.grading import COURSES, OutputData
+    from .utils.journal import replay
+    from .utils.regrade import CHUNK_SIZE
+    from .utils.regrade import regrade as regrade_readouts
+    from .utils.splits import SplitAnalysis
+
+    parser = argparse.ArgumentParser(
+        prog="easysnec regrade", description="grade every readout in one or more journals again, on every core"
+    )
+    parser.add_argument("out", nargs="*", help=".csv or IOF XML 3.0 ResultList (.xml) file to write results to")
+    parser.add_argument(
+        "--journal",
+        action="append",
+        default=[],
+        help="readout journal to regrade (repeatable, default: the event's)",
+    )
+    parser.add_argument("--event", help="the event to regrade when there's no --journal (default: today's)")
+    parser.add_argument("--courses", help="IOF XML 3.0 or CSV course file (default: the builtin courses)")
+    add_time_limit_options(parser)
+    parser.add_argument("--score-type", choices=SCORE_TYPES, default="animal-o")
+    parser.add_argument("--workers", type=int, help="processes to grade on (default: one per core)")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=CHUNK_SIZE,
+        help=f"readouts sent to a worker at a time (default: {CHUNK_SIZE})",
+    )
+    args = parser.parse_args(argv)
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+
+    try:
+        courses = (
+            load_courses(args.courses, time_limit=args.time_limit, penalty_per_minute=args.penalty_per_minute)
+            if args.courses
+            else COURSES
+        )
+    except (OSError, ValueError, SyntaxError) as e:
+        # a missing or broken course file is a usage error, before any output is opened
+        parser.error(f"could not load courses from {args.courses}: {e}")
+    journals = args.journal or [journal_path(parser, args)]
+    check_journals(parser, journals)
+    readouts = chain.from_iterable(replay(path) for path in journals)
+
+    statuses: Counter[str] = Counter()
+    writers = [open_result_writer(path) for path in args.out]
+    splits = SplitAnalysis()
+    start = time.perf_counter()
+    try:
+        for grade in regrade_readouts(readouts, courses, score_type(args.score_type), args.workers, args.chunk_size):
+            statuses[grade.status.name] += 1
+            if writers:
+                output = OutputData.from_grade(grade, splits.add(grade))
+                for writer in writers:
+                    writer.write(output)
+    finally:
+        for writer in writers:
+            writer.close()
+            log.info(f"exported {writer.count} results to {writer.path}")
+    elapsed = time.perf_counter() - start
+
+    total = sum(statuses.values())
+    print(f"regraded {total} readouts in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f}/s)")
+    for status, count in statuses.most_common():
+        print(f"  {status:<12}{count:>8}")
+
+
+COMMANDS = {"profile-diff": profile_diff, "export": export, "regrade": regrade}
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,396 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+
+from fastlog import log
+from serial import Serial, SerialException
+from sportident import (
+    SIReader,
+    SIReaderCardChanged,
+    SIReaderException,
+    SIReaderTimeout,
+    _crc,
+)
+
+from .utils.grading import InputData
+from .utils.metrics import METRICS, Metrics
+from .utils.profiling import PROFILER, Profiler
+from .utils.raw_card import RawCard
+
+# The other way to run the first stage of the station: instead of a thread per serial port blocking in
+# StationReader.run, every station is a task on one asyncio loop in one thread (AsyncReaderHub). The loop
+# watches each port's file descriptor (loop.add_reader), frames come in as they arrive and a station only
+# gets the thread while it has bytes to deal with, so a hub with twenty BSM stations is still one thread.
+#
+# sportident only does blocking i/o, so the readout protocol is spoken here (extended protocol, BSM7/8 in
+# "read SI cards" mode, the same commands SIReaderReadout sends) and the card memory is kept as it came, see
+# utils/raw_card.py.
+# Every station has its own timeouts: a stuck one times out and reconnects without holding up the others.
+# Stations on the legacy protocol, and windows (no fd to watch), need the threaded StationReader.
+#
+# Readouts go to on_readout (GradingPipeline.submit) from the hub thread, exactly like the threaded readers,
+# so the gui (queued signals to its own event loop) and headless mode don't care which reader they're using.
+
+STX, ETX, NAK = SIReader.STX[0], SIReader.ETX[0], SIReader.NAK[0]
+CARD_EVENTS = {SIReader.C_SI_REM[0], SIReader.C_SI5_DET[0], SIReader.C_SI6_DET[0], SIReader.C_SI9_DET[0]}
+
+# card number ranges of the cards that announce themselves with C_SI9_DET, as SIReaderReadout sorts them
+SI9_DET_CARD_TYPES = (
+    (range(1_000_000, 2_000_000), "SI9"),
+    (range(2_000_000, 3_000_000), "SI8"),
+    (range(4_000_000, 5_000_000), "SIpCard"),
+    (range(6_000_000, 7_000_000), "SItCard"),
+    (range(7_000_000, 10_000_000), "SI10"),
+)
+
+
+@dataclass(frozen=True)
+class AsyncReaderConfig:
+    # one command and its answer
+    command_timeout: float = 5.0
+    # reading out a whole card, from the first block to the last
+    readout_timeout: float = 15.0
+    connect_attempts: int = 10
+    connect_retry: float = 1.0
+
+
+# frozen, so every station can share it as the default
+DEFAULT_CONFIG = AsyncReaderConfig()
+
+
+class FrameParser:
+    # STX cmd len station(2) data crc(2) ETX frames out of whatever bytes the port had. yields (cmd, data),
+    # or the bare NAK / a CRC error as an exception
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> list[tuple[int, bytes] | SIReaderException]:
+        buffer = self._buffer
+        buffer += data
+        frames: list[tuple[int, bytes] | SIReaderException] = []
+        while True:
+            # skip to the next frame. WAKEUP and repeated STX are just noise, a NAK is an answer of its own
+            skip = 0
+            while skip < len(buffer) and (buffer[skip] != STX or buffer[skip + 1 : skip + 2] == SIReader.STX):
+                if buffer[skip] == NAK:
+                    frames.append(SIReaderException("Invalid command or parameter."))
+                skip += 1
+            del buffer[:skip]
+
+            if len(buffer) < 3:
+                return frames
+            length = buffer[2]
+            if len(buffer) < length + 6:
+                return frames
+            body, crc = bytes(buffer[1 : length + 3]), bytes(buffer[length + 3 : length + 5])
+            etx = buffer[length + 5]
+            del buffer[: length + 6]
+            if etx != ETX:
+                frames.append(SIReaderException("No ETX byte received."))
+            elif _crc(body) != crc:
+                frames.append(SIReaderException("CRC check failed"))
+            else:
+                # cmd, len and the station code aren't data
+                frames.append((body[0], body[4:]))
+
+
+class AsyncStationReader:
+    def __init__(
+        self,
+        port: str,
+        on_readout: Callable[[InputData], None],
+        config: AsyncReaderConfig = DEFAULT_CONFIG,
+        metrics: Metrics = METRICS,
+        profiler: Profiler = PROFILER,
+    ):
+        self.port = port
+        self.on_readout = on_readout
+        self.config = config
+        self.metrics = metrics
+        self.profiler = profiler
+
+        # the card in the station, as the station's last insert/remove event said
+        self.card: int | None = None
+        self.card_type: str | None = None
+
+        self._serial: Serial | None = None
+        self._parser = FrameParser()
+        # answers to our commands (or what went wrong instead), in order
+        self._replies: asyncio.Queue[tuple[int, bytes] | Exception] = asyncio.Queue()
+        self._card_changed = asyncio.Event()
+        # set when the port went away, the station task reconnects
+        self._error: SIReaderException | None = None
+
+        log.info(f"async reader created for port {port}")
+
+    async def run(self) -> None:
+        # the station task: connect, read cards until the port goes away, reconnect. cancel it to stop
+        log.info(f"starting async si loop on {self.port}...")
+        try:
+            while await self.connect():
+                try:
+                    await self.serve()
+                except SIReaderException as e:
+                    log.warning(f"lost SI reader at port {self.port}: {e}")
+                self.close()
+        finally:
+            self.close()
+
+    async def connect(self) -> bool:
+        for _ in range(self.config.connect_attempts):
+            try:
+                await self._open()
+                log.success(f"connected to SI at port {self.port}")
+                self.metrics.count("reader_connects")
+                return True
+            except (SIReaderException, SIReaderTimeout) as e:
+                log.debug(f"could not connect to {self.port}: {e}")
+                self.close()
+                self.metrics.count("reader_connect_errors")
+                await asyncio.sleep(self.config.connect_retry)
+        log.error(f"Could not open SI reader at port {self.port}")
+        return False
+
+    async def serve(self) -> None:
+        while True:
+            await self._card_changed.wait()
+            self._card_changed.clear()
+            if self._error is not None:
+                raise self._error
+            if self.card is None:
+                # taken out
+                continue
+
+            try:
+                start = time.perf_counter()
+                async with asyncio.timeout(self.config.readout_timeout):
+                    raw_data = await self._read_card()
+                with self.profiler.profile():
+                    raw = RawCard(self.card_type, raw_data, dt.datetime.now())
+                    input_data = InputData.from_raw(raw, reader_id=self.port)
+                self.metrics.observe("read_sicard", time.perf_counter() - start)
+
+                # beep
+                with self.metrics.time("ack_sicard"):
+                    self._write(SIReader.ACK)
+            except (SIReaderCardChanged, SIReaderException, SIReaderTimeout, TimeoutError) as e:
+                if self._error is not None:
+                    raise self._error
+                # card removed too early, a broken block, a station that stopped answering. next card
+                log.warning(f"exception: {e or 'readout timed out'}")
+                self.metrics.count("reader_exceptions")
+                continue
+
+            self.metrics.count("readouts")
+            self.on_readout(input_data)
+
+    def close(self) -> None:
+        if self._serial is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self._serial.fileno())
+        except (RuntimeError, SerialException, OSError, ValueError):
+            pass
+        self._serial.close()
+        self._serial = None
+
+    async def _open(self) -> None:
+        # SIReader._connect_reader, without blocking
+        try:
+            self._serial = Serial(self.port, baudrate=38400, timeout=0)
+            self._serial.reset_input_buffer()
+        except (SerialException, OSError):
+            raise SIReaderException(f"Could not open port '{self.port}'")
+        self._parser = FrameParser()
+        self._error = None
+        self.card = self.card_type = None
+        asyncio.get_running_loop().add_reader(self._serial.fileno(), self._on_readable)
+
+        for baudrate in (38400, 4800):
+            self._serial.baudrate = baudrate
+            self._write(SIReader.WAKEUP + SIReader.STX)
+            try:
+                await self._command(SIReader.C_SET_MS, SIReader.P_MS_DIRECT)
+                break
+            except (SIReaderException, SIReaderTimeout) as e:
+                if baudrate == 4800:
+                    raise SIReaderException(f"This module only works with BSM7/8 stations: {e}")
+
+        proto_config = (await self._command(SIReader.C_GET_SYS_VAL, SIReader.O_PROTO + b"\x01"))[1]
+        if not proto_config & 1:
+            raise SIReaderException("station uses the legacy protocol, only the threaded reader speaks that")
+        self._write(SIReader.WAKEUP + SIReader.STX)
+        mode = (await self._command(SIReader.C_GET_SYS_VAL, SIReader.O_MODE + b"\x01"))[1]
+        if mode != SIReader.M_READOUT:
+            raise SIReaderException("Station must be in 'Read SI cards' operating mode!")
+
+    async def _read_card(self) -> bytes:
+        # SIReaderReadout.read_sicard, for the extended protocol
+        card_type = self.card_type
+        if card_type == "SI5":
+            return await self._command(SIReader.C_GET_SI5, b"")
+        if card_type == "SI6":
+            blocks = [(await self._command(SIReader.C_GET_SI6, SIReader.P_SI6_CB))[1:]]
+            blocks.append((await self._reply())[1:])
+            block_2 = await self._reply()
+            blocks.append(block_2[1:])
+            if block_2[0] == 7:
+                return b"".join(blocks)  # 0, 6, 7 blocks of SI6
+            # 192 punches mode: the station sends 8 blocks
+            blocks += [(await self._reply())[1:] for _ in range(5)]
+            block_0, _, block_2, block_3, block_4, block_5, block_6, block_7 = blocks
+            return block_0 + block_6 + block_7 + block_2 + block_3 + block_4 + block_5
+        if card_type in ("SI8", "SI9", "SIpCard", "SItCard"):
+            return b"".join(
+                [
+                    (await self._command(SIReader.C_GET_SI9, bytes([block])))[1:]
+                    for block in range(SIReader.CARD[card_type]["BC"])
+                ]
+            )
+        if card_type == "SI10":
+            # only the blocks with punches in them
+            raw_data = (await self._command(SIReader.C_GET_SI9, b"\x00"))[1:]
+            punch_count = min(raw_data[SIReader.CARD["SI10"]["RC"]], 128)
+            for block in (4, 5, 6, 7)[: (punch_count + 31) // 32]:
+                raw_data += (await self._command(SIReader.C_GET_SI9, bytes([block])))[1:]
+            return raw_data
+        raise SIReaderException("No card in the device.")
+
+    async def _command(self, command: bytes, parameters: bytes) -> bytes:
+        # send a command and wait for its answer. anything still queued is an answer nobody waited for
+        while not self._replies.empty():
+            self._replies.get_nowait()
+        frame = command + bytes([len(parameters)]) + parameters
+        self._write(SIReader.STX + frame + _crc(frame) + SIReader.ETX)
+        return await self._reply()
+
+    async def _reply(self) -> bytes:
+        try:
+            async with asyncio.timeout(self.config.command_timeout):
+                reply = await self._replies.get()
+        except TimeoutError:
+            raise SIReaderTimeout(f"no answer from {self.port}")
+        if isinstance(reply, Exception):
+            raise reply
+        return reply[1]
+
+    def _write(self, data: bytes) -> None:
+        if self._serial is None:
+            raise SIReaderException(f"port {self.port} is closed")
+        try:
+            self._serial.write(data)
+        except (SerialException, OSError) as e:
+            raise SIReaderException(f"Could not send command: {e}")
+
+    def _on_readable(self) -> None:
+        # the loop calls this whenever the port has bytes for us
+        serial = self._serial
+        if serial is None:
+            return
+        try:
+            data = serial.read(serial.in_waiting or 1)
+        except (SerialException, OSError) as e:
+            self._lose(SIReaderException(f"Error reading command: {e}"))
+            return
+        for frame in self._parser.feed(data):
+            if isinstance(frame, Exception):
+                self._replies.put_nowait(frame)
+            elif frame[0] in CARD_EVENTS:
+                self._card_event(*frame)
+                # whatever we were doing was about the card that just changed
+                self._replies.put_nowait(SIReaderCardChanged("SI-Card changed during command."))
+                self._card_changed.set()
+            else:
+                self._replies.put_nowait(frame)
+
+    def _card_event(self, command: int, data: bytes) -> None:
+        # SIReaderReadout._read_command's bookkeeping of the card in the station
+        self.card = self.card_type = None
+        if command == SIReader.C_SI5_DET[0]:
+            self.card, self.card_type = SIReader._decode_cardnr(data), "SI5"
+        elif command == SIReader.C_SI6_DET[0]:
+            self.card, self.card_type = int.from_bytes(data), "SI6"
+        elif command == SIReader.C_SI9_DET[0]:
+            # SI 9 sends corrupt first byte (insignificant)
+            card = int.from_bytes(data[1:])
+            card_type = next((name for cards, name in SI9_DET_CARD_TYPES if card in cards), None)
+            if card_type is None:
+                log.warning(f"unknown card type for card {card} at port {self.port}")
+                return
+            self.card, self.card_type = card, card_type
+
+    def _lose(self, error: SIReaderException) -> None:
+        # the port went away (unplugged). stop watching it and wake the station task up to reconnect
+        self._error = error
+        self.close()
+        self._replies.put_nowait(error)
+        self._card_changed.set()
+
+
+class AsyncReaderHub:
+    # every station's AsyncStationReader as a task on one event loop, in one thread
+    def __init__(
+        self,
+        on_readout: Callable[[InputData], None],
+        config: AsyncReaderConfig = DEFAULT_CONFIG,
+        metrics: Metrics = METRICS,
+        profiler: Profiler = PROFILER,
+    ):
+        self.on_readout = on_readout
+        self.config = config
+        self.metrics = metrics
+        self.profiler = profiler
+        self.loop = asyncio.new_event_loop()
+        # only touched from the loop's thread
+        self.readers: dict[str, tuple[asyncio.Task, AsyncStationReader]] = {}
+        self._thread = threading.Thread(target=self._run, name="reader hub", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self, timeout: float = 2) -> None:
+        if not self._thread.is_alive():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            log.warning("reader hub did not stop")
+
+    def attach_readers(self, ports: Iterable[str]) -> None:
+        # start a station task for every new port, cancel the tasks of ports that went away. any thread
+        self.loop.call_soon_threadsafe(self._attach_readers, list(ports))
+
+    def _attach_readers(self, ports: list[str]) -> None:
+        for port in set(self.readers) - set(ports):
+            task, _ = self.readers.pop(port)
+            task.cancel()
+            log.info(f"detached reader at port {port}")
+
+        # a station task that gave up on its port (or died) is started over below
+        for port, (task, _) in list(self.readers.items()):
+            if task.done():
+                del self.readers[port]
+                log.warning(f"reader at port {port} stopped, starting it again")
+
+        for port in ports:
+            if port in self.readers:
+                continue
+            reader = AsyncStationReader(port, self.on_readout, self.config, self.metrics, self.profiler)
+            self.readers[port] = (self.loop.create_task(reader.run(), name=f"reader {port}"), reader)
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            tasks = [task for task, _ in self.readers.values()]
+            self.readers.clear()
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
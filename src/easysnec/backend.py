@@ -1,27 +1,39 @@
 from __future__ import annotations
 
+import datetime as dt
 import pprint
 import time
-import serial.tools.list_ports
+from collections.abc import Iterable
+from enum import Enum
+from functools import partial
+from pathlib import Path
 
 from fastlog import log
-from sportident import SIReaderReadout, SIReaderCardChanged, SIReaderException
-
 from PySide6.QtCore import (
+    Property,
+    QEnum,
+    QObject,
     QStringListModel,
-    QTimer,
+    Qt,
     QThread,
-    QObject,
-    QEnum,
+    QTimer,
+    QUrl,
     Signal,
     Slot,
-    Property,
 )
 
-from .utils.grading import COURSES, SuccessStatus, InputData
-
-from enum import Enum
-from functools import partial
+from .async_reader import AsyncReaderHub
+from .pipeline import GradingPipeline
+from .reader import StationReader
+from .utils.broadcast import ResultBroadcaster
+from .utils.card_wait import DEFAULT_CONFIG, CardWaitConfig
+from .utils.course_loader import load_courses
+from .utils.export import LIVE_FLUSH_INTERVAL, open_result_writer
+from .utils.grading import COURSES, Grade, ScoreType
+from .utils.journal import ReadoutJournal
+from .utils.metrics import METRICS
+from .utils.port_watcher import PortWatcher, list_sportident_ports
+from .utils.results_model import ResultsModel
 
 # from warnings import DeprecationWarning
 
@@ -30,14 +42,6 @@ class BackendInterfacePython:
     pass
 
 
-class DummyClass(QObject):
-    @QEnum
-    class BackendScoreType(Enum):
-        SCORE_O = 1
-        CLASSIC_O = 2
-        ANIMAL_O = 3
-
-
 class BackendInterface(QObject):
     # this object should contain all program state
 
@@ -93,10 +97,8 @@ class BackendInterface(QObject):
     nameChanged = Signal(str)
     name = Property(str, get_name, set_name, notify=nameChanged)  # ty: ignore[invalid-argument-type]
 
-    # --- ports property (rw)
-    _ports = QStringListModel(
-        [port.device for port in serial.tools.list_ports.comports()]
-    )
+    # --- ports property (rw). starts empty, the port watcher fills it in
+    _ports = QStringListModel()
 
     def get_ports(self):
         return self._ports
@@ -109,6 +111,29 @@ class BackendInterface(QObject):
     portsChanged = Signal(QObject)
     ports = Property(QObject, get_ports, set_ports, notify=portsChanged)  # ty: ignore[invalid-argument-type]
 
+    @Slot(list, list)
+    def update_ports(self, added: list[str], removed: list[str]):
+        # apply a port watcher diff to the model in place, so qml only redraws the rows that changed
+        for port in removed:
+            ports = self._ports.stringList()
+            if port in ports:
+                self._ports.removeRows(ports.index(port), 1)
+        for port in added:
+            row = self._ports.rowCount()
+            self._ports.insertRows(row, 1)
+            self._ports.setData(self._ports.index(row), port)
+        if added or removed:
+            self.portsChanged.emit(self._ports)
+
+    # --- results property (r). every grade of the session, newest last
+    _results = ResultsModel()
+
+    def get_results(self):
+        return self._results
+
+    resultsChanged = Signal(QObject)
+    results = Property(QObject, get_results, notify=resultsChanged)  # ty: ignore[invalid-argument-type]
+
     # --- selected port property (rw)
     _selected_port = ""
 
@@ -125,8 +150,26 @@ class BackendInterface(QObject):
         str, get_selected_port, set_selected_port, notify=selectedPortChanged
     )  # ty: ignore[invalid-argument-type]
 
-    # --- scoring mode property (rw)
-    _scoring_mode = None
+    # --- selected ports property (rw). every port in here gets its own reader. empty means every SPORTident
+    # station
+    _selected_ports: tuple[str, ...] = ()
+
+    def get_selected_ports(self):
+        return list(self._selected_ports)
+
+    def set_selected_ports(self, new_selected_ports):
+        new_selected_ports = tuple(new_selected_ports)
+        if self._selected_ports != new_selected_ports:
+            self._selected_ports = new_selected_ports
+            self.selectedPortsChanged.emit(list(new_selected_ports))
+
+    selectedPortsChanged = Signal(list)
+    selectedPorts = Property(
+        list, get_selected_ports, set_selected_ports, notify=selectedPortsChanged
+    )  # ty: ignore[invalid-argument-type]
+
+    # --- scoring mode property (rw). "animal-o", "classic-o" or "score-o", like --score-type
+    _scoring_mode = "animal-o"
 
     def get_scoring_mode(self):
         return self._scoring_mode
@@ -137,12 +180,7 @@ class BackendInterface(QObject):
             self.scoringModeChanged.emit(new_scoring_mode)
 
     scoringModeChanged = Signal(str)
-    scoringMode = Property(
-        DummyClass.BackendScoreType,
-        get_scoring_mode,
-        set_scoring_mode,
-        notify=scoringModeChanged,
-    )  # ty: ignore[invalid-argument-type]
+    scoringMode = Property(str, get_scoring_mode, set_scoring_mode, notify=scoringModeChanged)  # ty: ignore[invalid-argument-type]
 
     # --- course set property (rw)
     _course_set = ""
@@ -176,16 +214,55 @@ class BackendInterface(QObject):
 class Backend:
     # this object should contain all the workers and logic
 
-    def __init__(self, backend_interface, engine):
+    def __init__(
+        self,
+        backend_interface,
+        engine,
+        journal_path: Path | str,
+        time_limit: dt.timedelta | None = None,
+        penalty_per_minute: float = 0,
+        reader_backend: str = "thread",
+        exports: Iterable[Path | str] = (),
+        broadcaster: ResultBroadcaster | None = None,
+    ):
         # super().__init__()
 
         self.backend_interface = backend_interface
-
-        # create reader thread+worker, + wire it to the start signal
-        self.reader = QThread()
-        self.reader_worker = self.ReaderWorker(engine)
-        self.reader_worker.moveToThread(self.reader)
-        self.backend_interface.backend_started.connect(self.reader_worker.spin_thread)
+        self.engine = engine
+        # for the score-o courses of every course file loaded (--time-limit, --penalty-per-minute)
+        self.time_limit = time_limit
+        self.penalty_per_minute = penalty_per_minute
+
+        # one reader thread+worker per serial port. they only read + ack and put readouts on the pipeline's
+        # queue, a single grading thread does the rest and hands results back to the gui thread via a signal
+        self.readers: dict[str, tuple[QThread, Backend.ReaderWorker]] = {}
+        # or ("async") all of them as tasks on one asyncio loop in one thread. its readouts take
+        # the same way to the gui: pipeline.submit -> grading thread -> queued signal
+        self.reader_hub = None
+        self.backend_interface.selectedPortsChanged.connect(
+            lambda ports: self.attach_readers(self.reader_ports())
+        )
+
+        # every raw readout is journaled to disk before grading, and replayed on startup
+        self.journal = ReadoutJournal(journal_path)
+
+        # live result exports (--export), rewritten from the journal on startup and appended to from then on
+        self.exports = [open_result_writer(path, flush_interval=LIVE_FLUSH_INTERVAL) for path in exports]
+        # and results pushed to other machines (--broadcast-port)
+        self.broadcaster = broadcaster
+
+        self.result_presenter = self.ResultPresenter(self.backend_interface.get_results())
+        self.grader = QThread()
+        sinks = [*self.exports, self.broadcaster] if self.broadcaster is not None else self.exports
+        self.grader_worker = self.GradingWorker(COURSES, self.scoring_mode, self.journal, sinks)
+        self.grader_worker.moveToThread(self.grader)
+        # qml asks the results model for a course's leg statistics (results.legStats(course))
+        self.backend_interface.get_results().split_analysis = self.grader_worker.pipeline.splits
+        self.grader.started.connect(self.grader_worker.run)
+        self.grader_worker.graded.connect(
+            self.result_presenter.show_grade, Qt.ConnectionType.QueuedConnection
+        )
+        self.backend_interface.courseSetChanged.connect(self.load_course_set)
 
         # --- create our debug timer
         def update_time():
@@ -201,24 +278,57 @@ class Backend:
         self.test_timer = QTimer(singleShot=True, interval=1000)
         self.test_timer.timeout.connect(partial(self.big_test, engine=engine))
 
-        # create our ports list
-        def update_ports():
-            curr_ports = QStringListModel(
-                [port.device for port in serial.tools.list_ports.comports()]
-            )
-            self.backend_interface.set_ports(curr_ports)
+        # keep the ports list up to date. the watcher runs in its own thread, its diffs reach the model
+        # through a queued signal
+        self.port_events = self.PortEvents()
+        self.port_events.changed.connect(
+            self.backend_interface.update_ports, Qt.ConnectionType.QueuedConnection
+        )
+        self.backend_interface.portsChanged.connect(
+            lambda ports: self.attach_readers(self.reader_ports())
+        )
+        self.port_watcher = PortWatcher(self.port_events.changed.emit)
 
-        self.timer_ports = QTimer(interval=1000)
-        self.timer_ports.timeout.connect(update_ports)
+        if reader_backend == "async":
+            self.reader_hub = AsyncReaderHub(self.grader_worker.pipeline.submit)
 
     def start(self):
+        if self.broadcaster is not None:
+            self.broadcaster.start()
+        start = time.perf_counter()
+        restored = self.grader_worker.pipeline.restore(self.journal.replay())
+        self.backend_interface.get_results().extend(self.grader_worker.pipeline.results)
+        log.info(
+            f"restored {restored} readouts from {self.journal.path} in {time.perf_counter() - start:.3f}s"
+        )
+
+        self.backend_interface.update_ports(self.port_watcher.start(), [])
+        log.info(f"watching serial ports ({self.port_watcher.active_mode.name.lower()})")
+
         self.backend_interface.backend_started.emit()
         self.timer.start()
         self.test_timer.start()
-        self.reader.start()
+        self.grader.start()
+        if self.reader_hub is not None:
+            self.reader_hub.start()
+        self.attach_readers(self.reader_ports())
 
     def shutdown(self):
-        self.reader.terminate()
+        self.port_watcher.stop()
+        self.attach_readers([])
+        if self.reader_hub is not None:
+            self.reader_hub.stop()
+        # everything read so far is graded, journaled and exported before the journal and the sinks close
+        self.grader_worker.pipeline.close()
+        self.grader.quit()
+        self.grader.wait()
+        self.journal.close()
+        for writer in self.exports:
+            writer.close()
+            log.info(f"exported {writer.count} results to {writer.path}")
+        if self.broadcaster is not None:
+            self.broadcaster.close()
+        log.info(f"repeat readouts: {self.grader_worker.pipeline.cache.stats()}")
         self.timer.stop()
         log.success("threads safely stopped")
 
@@ -226,77 +336,123 @@ class Backend:
         log.info("testing now!!")
         pass
 
+    def reader_ports(self) -> list[str]:
+        # the ports the user picked, or if they haven't picked any, every port we know about that's a SPORTident
+        # station. any other serial device (a gps, a modem) is only read when it's ticked
+        selected = self.backend_interface.get_selected_ports()
+        if selected:
+            return list(selected)
+        try:
+            stations = set(list_sportident_ports())
+        except OSError as e:
+            log.error(f"could not list serial ports: {e}")
+            return []
+        return [port for port in self.backend_interface.get_ports().stringList() if port in stations]
+
+    def attach_readers(self, ports: list[str]):
+        # start a worker for every new port, stop the workers of ports that went away
+        if self.reader_hub is not None:
+            self.reader_hub.attach_readers(ports)
+            return
+
+        for port in set(self.readers) - set(ports):
+            reader, reader_worker = self.readers.pop(port)
+            reader_worker.stop()
+            reader.quit()
+            if not reader.wait(2000):
+                reader.terminate()
+            log.info(f"detached reader at port {port}")
+
+        # a reader that gave up on its port (couldn't open it, or its loop died) is forgotten, so it starts
+        # over below
+        for port, (reader, reader_worker) in list(self.readers.items()):
+            if reader_worker.reader.done.is_set():
+                del self.readers[port]
+                reader.quit()
+                reader.wait(2000)
+                log.warning(f"reader at port {port} stopped, starting it again")
+
+        for port in ports:
+            if port in self.readers:
+                continue
+            reader = QThread()
+            reader_worker = self.ReaderWorker(port, self.grader_worker.pipeline.submit)
+            reader_worker.moveToThread(reader)
+            reader.started.connect(reader_worker.spin_thread)
+            self.readers[port] = (reader, reader_worker)
+            reader.start()
+
+    def load_course_set(self, course_set: str):
+        # "Builtins" (or nothing) means the animal courses, anything else is a course file (path or file:// url)
+        if course_set in ("", "Builtins"):
+            courses = COURSES
+        else:
+            path = QUrl(course_set).toLocalFile() if course_set.startswith("file:") else course_set
+            try:
+                start = time.perf_counter()
+                courses = load_courses(
+                    path, time_limit=self.time_limit, penalty_per_minute=self.penalty_per_minute
+                )
+            except (OSError, ValueError, SyntaxError) as e:
+                log.error(f"could not load courses from {path}: {e}")
+                return
+            log.success(
+                f"loaded {len(courses)} courses from {path} in {time.perf_counter() - start:.3f}s"
+            )
+        self.grader_worker.pipeline.set_courses(courses)
+
+    def scoring_mode(self) -> ScoreType:
+        # read for every card, so a change in the gui counts from the next one on
+        return ScoreType[self.backend_interface.get_scoring_mode().upper().replace("-", "_")]
+
     # --- nested classes
-    class ReaderWorker(QObject):
-        def __init__(self, engine):
+    class GradingWorker(QObject):
+        graded = Signal(object)
+
+        def __init__(self, courses, score_type, journal=None, exports=()):
             super().__init__()
-            self.engine = engine
+            self.pipeline = GradingPipeline(
+                courses, self.graded.emit, score_type, journal=journal, exports=exports
+            )
 
-            log.info("reader worker created")
+        def run(self):
+            log.info("starting grading loop...")
+            self.pipeline.run()
 
-        def get_reader(self):
-            # TODO: retry
-            # TODO: do not recreate each loop. cache once
-            for _ in range(10):
-                try:
-                    reader_port = BackendInterface.selectedPort
-                    self.si = SIReaderReadout(reader_port)
+    class PortEvents(QObject):
+        # (added, removed) from the port watcher thread
+        changed = Signal(list, list)
 
-                    log.success(f"connected to SI at port {reader_port}")
-                    return
+    class ResultPresenter(QObject):
+        # lives in the gui thread, so this is the only place that touches the results model
+        def __init__(self, results: ResultsModel):
+            super().__init__()
+            self.results = results
 
-                except SIReaderException:
-                    time.sleep(1)
-            raise RuntimeError("Could not open SI reader")
+        @Slot(object)
+        def show_grade(self, runner_grade: Grade):
+            log.info(
+                f"[{runner_grade.input_data.reader_id}] Correctness: "
+                + pprint.pformat(runner_grade.status)
+            )
+            # qml picks the new row (and results.latest) up from the model's signals
+            with METRICS.time("ui_update"):
+                self.results.append(runner_grade)
 
-        def spin_thread(self):
-            log.info("starting si loop...")
-            self.get_reader()
-
-            while True:
-                log.info("starting instance of si loop...")
-                # TODO: make port an argument or pull from the ui someplace
-                # reader_port = '/dev/cu.SLAB_USBtoUART'
-
-                try:
-                    # wait for poll
-                    while not self.si.poll_sicard():
-                        pass
-
-                    # process output
-                    input_data = InputData.from_si_result(self.si.read_sicard())
-                except (SIReaderCardChanged, SIReaderException) as e:
-                    # this exception (card removed too early) can be ignored
-                    log.warning(f"exception: {e}")
-
-                # beep
-                self.si.ack_sicard()
-
-                # when multiple courses are available, get_closest_course before grading
-                best_guess_course = input_data.get_closest_course(COURSES)
-                runner_grade = input_data.score_against(
-                    best_guess_course, BackendInterface.scoringMode
-                )
+    class ReaderWorker(QObject):
+        # qt shell around StationReader, so the read loop can live in a QThread
+        def __init__(
+            self,
+            port: str,
+            on_readout,
+            card_wait_config: CardWaitConfig = DEFAULT_CONFIG,
+        ):
+            super().__init__()
+            self.port = port
+            self.reader = StationReader(port, on_readout, card_wait_config)
 
-                log.info("Correctness: " + pprint.pformat(runner_grade.status))
-
-                # Put stuff in the UI
-                if runner_grade.status == SuccessStatus.SUCCESS:
-                    self.engine.rootObjects()[0].setProperty(
-                        "image_path", "./resources/glassy-smiley-good-green.png"
-                    )
-                    self.engine.rootObjects()[0].setProperty("feedback_message", "")
-                elif runner_grade.status == SuccessStatus.MISSES:
-                    self.engine.rootObjects()[0].setProperty(
-                        "image_path", "./resources/glassy-smiley-bad.png"
-                    )
-                    self.engine.rootObjects()[0].setProperty(
-                        "feedback_message", "Try again!"
-                    )
-                elif runner_grade.status == SuccessStatus.INCOMPLETE:
-                    self.engine.rootObjects()[0].setProperty(
-                        "image_path", "./resources/glassy-smiley-surprised.png"
-                    )
-                self.engine.rootObjects()[0].setProperty(
-                    "scoring_output", runner_grade.scoring_output
-                )
+        def stop(self):
+            self.reader.stop()
+
+        def spin_thread(self):
+            self.reader.run()
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import datetime as dt
+import signal
+import threading
+import time
+from collections.abc import Iterable
+from pathlib import Path
+
+from fastlog import log
+
+from .async_reader import AsyncReaderHub
+from .pipeline import GradingPipeline
+from .reader import StationReader
+from .utils.broadcast import ResultBroadcaster
+from .utils.course_loader import load_courses
+from .utils.export import LIVE_FLUSH_INTERVAL, open_result_writer
+from .utils.grading import COURSES, Course, Grade, ScoreType
+from .utils.journal import ReadoutJournal
+from .utils.metrics import METRICS, start_reporting
+from .utils.port_watcher import PortWatcher, list_sportident_ports
+
+# Headless station: the same readers, grading pipeline and journal as the gui, driven from plain threads and
+# reporting every grade to the log. Nothing here (or in anything it imports) touches PySide6, so unattended
+# boxes don't pay for Qt and QML at startup or in memory.
+
+
+def log_grade(runner_grade: Grade) -> None:
+    log.info(
+        f"[{runner_grade.input_data.reader_id}] card {runner_grade.input_data.card_id} "
+        f"{runner_grade.course.course_name}: {runner_grade.status.name}, {runner_grade.scoring_output}"
+    )
+
+
+class HeadlessStation:
+    def __init__(
+        self,
+        ports: Iterable[str],
+        journal_path: Path | str,
+        courses: Iterable[Course] = COURSES,
+        score_type: ScoreType = ScoreType.ANIMAL_O,
+        on_grade=log_grade,
+        reader_backend: str = "thread",
+        exports: Iterable[Path | str] = (),
+        broadcaster: ResultBroadcaster | None = None,
+    ):
+        self.ports = list(ports)
+        self.journal = ReadoutJournal(journal_path)
+        # live exports start over with every run, restoring the journal writes the earlier results back in
+        self.exports = [open_result_writer(path, flush_interval=LIVE_FLUSH_INTERVAL) for path in exports]
+        # results for other machines on the network, restored ones included so the first snapshot has them
+        self.broadcaster = broadcaster
+        sinks = [*self.exports, self.broadcaster] if self.broadcaster is not None else self.exports
+        self.pipeline = GradingPipeline(
+            courses, on_grade, lambda: score_type, journal=self.journal, exports=sinks
+        )
+        self.grader = threading.Thread(target=self.pipeline.run, name="grader", daemon=True)
+        self.readers: dict[str, tuple[threading.Thread, StationReader]] = {}
+        # readers and ports change on the main thread (start, shutdown) and on the port watcher's. reentrant so
+        # on_ports_changed can hold it from reading self.ports through attach_readers
+        self.readers_lock = threading.RLock()
+        # "async": every port on one asyncio loop (AsyncReaderHub) instead of a thread per port
+        self.hub = AsyncReaderHub(self.pipeline.submit) if reader_backend == "async" else None
+
+    def start(self) -> None:
+        if self.broadcaster is not None:
+            self.broadcaster.start()
+        start = time.perf_counter()
+        restored = self.pipeline.restore(self.journal.replay())
+        log.info(
+            f"restored {restored} readouts from {self.journal.path} in {time.perf_counter() - start:.3f}s"
+        )
+
+        self.grader.start()
+        if self.hub is not None:
+            self.hub.start()
+        self.attach_readers(self.ports)
+
+    def attach_readers(self, ports: Iterable[str]) -> None:
+        with self.readers_lock:
+            self._attach_readers(list(ports))
+
+    def _attach_readers(self, ports: list[str]) -> None:
+        # start a reader for every new port, stop the readers of ports that went away
+        if self.hub is not None:
+            self.hub.attach_readers(ports)
+            self.ports = ports
+            return
+        for port in set(self.readers) - set(ports):
+            reader, station_reader = self.readers.pop(port)
+            station_reader.stop()
+            reader.join(2)
+            if reader.is_alive():
+                log.warning(f"reader at port {port} did not stop")
+            log.info(f"detached reader at port {port}")
+
+        # a reader that gave up on its port (couldn't open it, or its loop died) is started over below
+        for port, (reader, _) in list(self.readers.items()):
+            if not reader.is_alive():
+                del self.readers[port]
+                log.warning(f"reader at port {port} stopped, starting it again")
+
+        for port in ports:
+            if port in self.readers:
+                continue
+            station_reader = StationReader(port, self.pipeline.submit)
+            reader = threading.Thread(target=station_reader.run, name=f"reader {port}", daemon=True)
+            self.readers[port] = (reader, station_reader)
+            reader.start()
+        self.ports = ports
+
+    def on_ports_changed(self, added: list[str], removed: list[str]) -> None:
+        # called on the port watcher's thread
+        log.info(f"serial ports changed: +{added} -{removed}")
+        with self.readers_lock:
+            self._attach_readers([port for port in self.ports if port not in removed] + added)
+
+    def shutdown(self) -> None:
+        with self.readers_lock:
+            for reader, station_reader in self.readers.values():
+                station_reader.stop()
+            self._attach_readers([])
+        if self.hub is not None:
+            self.hub.stop()
+
+        # everything read so far is graded, journaled and exported before the journal and the sinks close
+        self.pipeline.close()
+        if self.grader.is_alive():
+            self.grader.join()
+        self.journal.close()
+        for writer in self.exports:
+            writer.close()
+            log.info(f"exported {writer.count} results to {writer.path}")
+        if self.broadcaster is not None:
+            self.broadcaster.close()
+        log.info(f"repeat readouts: {self.pipeline.cache.stats()}")
+        log.success("threads safely stopped")
+
+
+def run_headless(
+    ports: list[str],
+    journal_path: Path | str,
+    course_file: Path | str | None = None,
+    score_type: ScoreType = ScoreType.ANIMAL_O,
+    metrics_port: int | None = None,
+    metrics_interval: float = 60,
+    time_limit: dt.timedelta | None = None,
+    penalty_per_minute: float = 0,
+    reader_backend: str = "thread",
+    exports: Iterable[Path | str] = (),
+    broadcast_port: int | None = None,
+    broadcast_host: str = "127.0.0.1",
+) -> None:
+    courses = (
+        load_courses(course_file, time_limit=time_limit, penalty_per_minute=penalty_per_minute)
+        if course_file
+        else COURSES
+    )
+    station = HeadlessStation(
+        ports,
+        journal_path,
+        courses,
+        score_type,
+        reader_backend=reader_backend,
+        exports=exports,
+        broadcaster=ResultBroadcaster(broadcast_port, broadcast_host) if broadcast_port is not None else None,
+    )
+
+    # no ports given: follow whatever SPORTident station gets plugged in
+    port_watcher = None
+    if not ports:
+        port_watcher = PortWatcher(station.on_ports_changed, list_sportident_ports)
+        # a change the watcher sees right away waits for the first scan to be in place
+        with station.readers_lock:
+            station.ports = port_watcher.start()
+    log.info(f"headless station on ports {station.ports}")
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+
+    reporters = start_reporting(metrics_port, metrics_interval)
+    station.start()
+    try:
+        stopping.wait()
+    finally:
+        if port_watcher is not None:
+            port_watcher.stop()
+        station.shutdown()
+        for reporter in reporters:
+            reporter.stop()
+        log.info(f"station health: {METRICS.summary()}")
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable
+
+from fastlog import log
+
+from .utils.course_index import CourseIndex
+from .utils.export import ResultSink
+from .utils.grading import Course, Grade, InputData, OutputData, ScoreType
+from .utils.journal import ReadoutJournal
+from .utils.leaderboard import Leaderboard
+from .utils.metrics import METRICS, Metrics
+from .utils.profiling import PROFILER, Profiler
+from .utils.readout_cache import ReadoutCache
+from .utils.splits import SplitAnalysis
+
+# The station side of things is split in two stages so a slow grade never holds up the next card:
+#   reader thread(s): wait for card -> read -> ack -> GradingPipeline.submit(input_data) (-> journal)
+#   grading thread:   GradingPipeline.run() -> match course -> grade -> on_grade(grade)
+# Nothing in here knows about Qt, the gui hands in an on_grade that emits a queued signal.
+
+# how often run() looks at its stop event while the queue is empty
+STOP_POLL_INTERVAL = 0.1
+
+
+class GradingPipeline:
+    def __init__(
+        self,
+        courses: Iterable[Course] | CourseIndex,
+        on_grade: Callable[[Grade], None],
+        score_type: Callable[[], ScoreType] = lambda: ScoreType.ANIMAL_O,
+        maxsize: int = 0,
+        journal: ReadoutJournal | None = None,
+        cache_size: int = 1024,
+        metrics: Metrics = METRICS,
+        profiler: Profiler = PROFILER,
+        exports: Iterable[ResultSink] = (),
+    ):
+        # index the course set once up front instead of scanning it on every card
+        self.courses = courses if isinstance(courses, CourseIndex) else CourseIndex(courses)
+        self.on_grade = on_grade
+        self.score_type = score_type
+        # (submitted at, readout, its cache key)
+        self.readouts: queue.Queue[tuple[float, InputData, tuple] | None] = queue.Queue(maxsize)
+        # cache keys of readouts submitted but not graded yet, so a re-dip right behind one isn't journaled
+        self._queued: set[tuple] = set()
+        self._queued_lock = threading.Lock()
+        self.journal = journal
+        # every grade of the session, including the ones rebuilt from the journal on startup
+        self.results: list[Grade] = []
+        # standings per course, a card read out again replaces its earlier result
+        self.leaderboard = Leaderboard()
+        # leg time statistics per course. every new grade gets its time lost from here before anyone sees it
+        self.splits = SplitAnalysis()
+        self.cache = ReadoutCache(cache_size)
+        # held to swap the course set, and by the grading thread from its cache lookup until the grade is cached,
+        # so a grade against the old courses can't land in the cache after set_courses cleared it
+        self._courses_lock = threading.Lock()
+        self.metrics = metrics
+        self.profiler = profiler
+        # live export files (and the results broadcast), every new grade goes to each of them from the grading
+        # thread
+        self.exports = list(exports)
+
+    def set_courses(self, courses: Iterable[Course] | CourseIndex) -> None:
+        # swap the course set. the grading thread picks it up with the next readout
+        index = courses if isinstance(courses, CourseIndex) else CourseIndex(courses)
+        with self._courses_lock:
+            self.courses = index
+            # grades against the old courses mustn't be handed out for repeats any more
+            self.cache.clear()
+
+    def submit(self, input_data: InputData) -> None:
+        # safe to call from any reader thread. a re-dip of a card we've already graded or queued (same punches)
+        # is the same readout: it isn't journaled again, and run() hands out the grade we already have
+        submitted = time.perf_counter()
+        key = self.cache.key(input_data, self.score_type())
+        with self._queued_lock:
+            repeat = key in self._queued or key in self.cache
+            self._queued.add(key)
+        if self.journal is not None and not repeat:
+            self.journal.append(input_data)
+        self.readouts.put((submitted, input_data, key))
+
+    def restore(self, readouts: Iterable[InputData]) -> int:
+        # regrade readouts from an earlier run (the journal) without journaling them again
+        restored = []
+        for input_data in readouts:
+            with self._courses_lock:
+                if self.cache.get(input_data, self.score_type()) is not None:
+                    # a re-dip an older version journaled twice
+                    continue
+                runner_grade = self.grade(input_data)
+                self.cache.put(input_data, runner_grade, runner_grade.score_type)
+            restored.append(runner_grade)
+        self.results.extend(restored)
+        for runner_grade in restored:
+            self.leaderboard.add(runner_grade)
+            self.splits.add(runner_grade)
+            self.export(runner_grade)
+        return len(restored)
+
+    def close(self) -> None:
+        # wake run() up and make it return once everything submitted so far is graded
+        self.readouts.put(None)
+
+    def export(self, runner_grade: Grade) -> None:
+        # one OutputData for every file, with the time lost the split analysis worked out for the grade
+        if not self.exports:
+            return
+        output = OutputData.from_grade(runner_grade, self.splits.time_lost(runner_grade))
+        for writer in self.exports:
+            try:
+                writer.write(output)
+            except OSError as e:
+                # a full disk or a yanked usb stick shouldn't stop the grading
+                log.error(f"could not export card {runner_grade.input_data.card_id}: {e}")
+
+    def grade(self, input_data: InputData) -> Grade:
+        with self.profiler.profile():
+            # when multiple courses are available, get_closest_course before grading. the grade keeps the
+            # alignment against the course that won
+            with self.metrics.time("match_course"):
+                best_guess_course, alignment = self.courses.closest_aligned(input_data.station_codes)
+            with self.metrics.time("grade"):
+                runner_grade = input_data.score_against(best_guess_course, self.score_type(), alignment)
+                # do the grading work here rather than in whichever thread (the gui's) looks first
+                _ = runner_grade.scoring_output
+        return runner_grade
+
+    def run(self, stop: threading.Event | None = None) -> None:
+        # returns once it takes the None close() queued, or, given a stop event, within STOP_POLL_INTERVAL of it
+        # being set. readouts still queued then stay queued
+        while not (stop and stop.is_set()):
+            try:
+                item = self.readouts.get(timeout=STOP_POLL_INTERVAL if stop else None)
+            except queue.Empty:
+                continue
+            if item is None:
+                return
+            submitted, input_data, key = item
+            self.metrics.observe("queue_wait", time.perf_counter() - submitted)
+
+            try:
+                # looked up here, on the one thread that fills the cache, so a re-dip submitted before its first
+                # readout was graded is caught too. it goes out as the grade we already have, which is already in
+                # results and the standings
+                with self._courses_lock:
+                    cached = self.cache.get(input_data, self.score_type())
+                    if cached is None:
+                        runner_grade = self.grade(input_data)
+                        self.cache.put(input_data, runner_grade, runner_grade.score_type)
+                if cached is not None:
+                    self.metrics.count("repeat_readouts")
+                    self.on_grade(cached)
+                    continue
+                self.results.append(runner_grade)
+                self.leaderboard.add(runner_grade)
+                self.splits.add(runner_grade)
+                self.on_grade(runner_grade)
+                self.metrics.observe("readout_to_grade", time.perf_counter() - submitted)
+                # after the gui has its grade, the files can wait a few microseconds
+                self.export(runner_grade)
+            except Exception as e:  # noqa: BLE001
+                # a bad readout must not take the whole station down: whatever it raised, this thread is the only
+                # one grading, and if it died every card after it would sit in the queue
+                self.metrics.count("grading_errors")
+                log.error(f"could not grade readout {input_data.reading_id}: {e!r}")
+            finally:
+                with self._queued_lock:
+                    self._queued.discard(key)
+            self.profiler.readout_done()
@@ -4,6 +4,7 @@
 import QtQuick
 import QtQuick.Layouts
 import QtQuick.Controls
+import QtQuick.Dialogs
 // import QtQml
 
 // docs
@@ -30,10 +31,10 @@ ApplicationWindow {
     property bool connected: false
     property bool show_start_page: true
 
-    // RESULTS
-    property var image_path: "./resources/glassy-smiley-late.png"
-    property var scoring_output: ""
-    property var feedback_message: ""
+    // RESULTS (the newest row of backend.results)
+    property var image_path: backend.results.latest.imagePath
+    property var scoring_output: backend.results.latest.scoringOutput
+    property var feedback_message: backend.results.latest.feedbackMessage
 
     // ------- Program State!
 
@@ -153,8 +154,23 @@ ApplicationWindow {
                     Layout.alignment: Qt.AlignBottom
 
                     ComboBox {
+                        // tick the ports to read from, none ticked reads from every SPORTident station
                         textRole: "display"
                         model: backend.ports
+                        displayText: backend.selectedPorts.length ? backend.selectedPorts.join(", ") : "All SPORTident stations"
+                        delegate: CheckDelegate {
+                            width: ListView.view.width
+                            text: model.display
+                            checked: backend.selectedPorts.indexOf(model.display) >= 0
+                            onToggled: {
+                                const port = model.display;
+                                const ports = backend.selectedPorts.filter((selected) => selected !== port);
+                                if (checked)
+                                    ports.push(port);
+                                backend.selectedPorts = ports;
+                                checked = Qt.binding(() => backend.selectedPorts.indexOf(port) >= 0);
+                            }
+                        }
                         // background: Rectangle {
                         //     color: root.connected ? '#65c15a':'#a83434'
                         // }
@@ -165,7 +181,15 @@ ApplicationWindow {
                             text: "Scoring Mode:"
                         }
                         ComboBox {
-                            model: ["Score-O", "Animal-O"]
+                            textRole: "text"
+                            valueRole: "value"
+                            model: [
+                                { text: "Animal-O", value: "animal-o" },
+                                { text: "Classic-O", value: "classic-o" },
+                                { text: "Score-O", value: "score-o" }
+                            ]
+                            Component.onCompleted: currentIndex = indexOfValue(backend.scoringMode)
+                            onActivated: backend.scoringMode = currentValue
                         }
                     }
                     RowLayout {
@@ -173,7 +197,22 @@ ApplicationWindow {
                             text: "Course Set:"
                         }
                         ComboBox {
+                            id: course_set_box
                             model: ["Builtins", "Load from File"]
+                            onActivated: (index) => {
+                                if (index === 1) {
+                                    course_file_dialog.open();
+                                } else {
+                                    backend.courseSet = "Builtins";
+                                }
+                            }
+                        }
+                        FileDialog {
+                            id: course_file_dialog
+                            title: "Load courses (IOF XML 3.0 or CSV)"
+                            nameFilters: ["Course files (*.xml *.csv)", "All files (*)"]
+                            onAccepted: backend.courseSet = selectedFile
+                            onRejected: course_set_box.currentIndex = 0
                         }
                     }
 
@@ -195,53 +234,100 @@ ApplicationWindow {
 
         Pane { // feedback pane
             id: feedback_pane
-            ColumnLayout {
+            RowLayout {
                 anchors.fill: parent
 
-                
-
-                Rectangle {
+                ColumnLayout {
                     Layout.fillWidth: true
                     Layout.fillHeight: true
-                    color: Qt.rgba(1, 0, 0, 0)
-                    Image {
-                        id: image
-                        fillMode: Image.PreserveAspectFit
-                        // anchors.centerIn: root
-                        anchors.fill:parent
-
-                        source: root.image_path
+
+                
+
+                    Rectangle {
+                        Layout.fillWidth: true
+                        Layout.fillHeight: true
+                        color: Qt.rgba(1, 0, 0, 0)
+                        Image {
+                            id: image
+                            fillMode: Image.PreserveAspectFit
+                            // anchors.centerIn: root
+                            anchors.fill:parent
+
+                            source: root.image_path
+                        }
                     }
-                }
 
-                Label {
-                    Layout.alignment: Qt.AlignHCenter
+                    Label {
+                        Layout.alignment: Qt.AlignHCenter
 
-                    color: "#0090f8"
-                    text: root.scoring_output
-                    font.pointSize: 17
-                    font.bold: true
-                    font.family: "Arial"
-                    renderType: Text.NativeRendering
-                    horizontalAlignment: Text.AlignHCenter
-                    padding: 10
+                        color: "#0090f8"
+                        text: root.scoring_output
+                        font.pointSize: 17
+                        font.bold: true
+                        font.family: "Arial"
+                        renderType: Text.NativeRendering
+                        horizontalAlignment: Text.AlignHCenter
+                        padding: 10
 
-                    // background: Rectangle {
-                    //     anchors.fill: parent
-                    //     // color: "#333333"
-                    // }
+                        // background: Rectangle {
+                        //     anchors.fill: parent
+                        //     // color: "#333333"
+                        // }
+                    }
+                    Label {
+                        Layout.alignment: Qt.AlignHCenter
+
+                        color: "#0090f8"
+                        text: root.feedback_message
+                        font.pointSize: 17
+                        font.bold: true
+                        font.family: "Arial"
+                        renderType: Text.NativeRendering
+                        horizontalAlignment: Text.AlignHCenter
+                        padding: 10
+                    }
                 }
-                Label {
-                    Layout.alignment: Qt.AlignHCenter
 
-                    color: "#0090f8"
-                    text: root.feedback_message
-                    font.pointSize: 17
-                    font.bold: true
-                    font.family: "Arial"
-                    renderType: Text.NativeRendering
-                    horizontalAlignment: Text.AlignHCenter
-                    padding: 10
+                ListView {
+                    id: results_view
+                    Layout.preferredWidth: 260
+                    Layout.fillHeight: true
+                    clip: true
+                    model: backend.results
+                    // delegates scrolled out of view get reused for the rows scrolled in, so thousands of
+                    // results cost no more than a screenful
+                    reuseItems: true
+                    ScrollBar.vertical: ScrollBar {}
+
+                    // follow new results, unless someone scrolled back to look at older ones
+                    property bool following: true
+                    onMovementEnded: following = atYEnd
+                    onCountChanged: if (following) positionViewAtEnd()
+
+                    delegate: Rectangle {
+                        required property int index
+                        required property int cardId
+                        required property string status
+                        required property string course
+                        required property string time
+                        required property string scoringOutput
+                        required property string splits
+
+                        width: ListView.view.width
+                        height: result_text.implicitHeight + 10
+                        color: status === "SUCCESS" ? root.success_green
+                             : status === "MISSES" ? root.bad_red : root.neutral_grey
+
+                        Label {
+                            id: result_text
+                            anchors.fill: parent
+                            anchors.margins: 5
+                            wrapMode: Text.Wrap
+                            text: cardId + "  " + course + "  " + time
+                                  + (scoringOutput ? "\n" + scoringOutput : "")
+                                  + (splits ? "\n" + splits : "")
+                        }
+                    }
                 }
             }
         }
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import datetime as dt
+import threading
+import time
+from collections.abc import Callable
+
+from fastlog import log
+from sportident import SIReader, SIReaderCardChanged, SIReaderException, SIReaderReadout
+
+from .utils.card_wait import DEFAULT_CONFIG, CardWaitConfig, wait_for_card
+from .utils.grading import InputData
+from .utils.metrics import METRICS, Metrics
+from .utils.profiling import PROFILER, Profiler
+from .utils.raw_card import RawCard
+
+# The first stage of the station: one StationReader per serial port waits for a card, reads it, acks it
+# (beep) and hands the readout on. Plain python, so both the gui (inside a QThread) and headless mode (inside
+# a threading.Thread) drive the same loop.
+
+
+def read_raw_card(si: SIReaderReadout) -> RawCard:
+    # SIReaderReadout.read_sicard, keeping the card memory instead of decoding it
+    if si.proto_config["mode"] != SIReader.M_READOUT:
+        raise SIReaderException("Station must be in 'Read SI cards' operating mode! Change operating mode first.")
+
+    card_type = si.cardtype
+    if card_type == "SI5":
+        data = si._send_command(SIReader.C_GET_SI5, b"")[1]
+    elif card_type == "SI6":
+        blocks = [si._send_command(SIReader.C_GET_SI6, SIReader.P_SI6_CB)[1][1:], si._read_command()[1][1:]]
+        block_2 = si._read_command()[1]
+        blocks.append(block_2[1:])
+        if block_2[0] != 7:
+            # 192 punches mode: the station sends 8 blocks
+            blocks += [si._read_command()[1][1:] for _ in range(5)]
+            block_0, _, block_2, block_3, block_4, block_5, block_6, block_7 = blocks
+            blocks = [block_0, block_6, block_7, block_2, block_3, block_4, block_5]
+        data = b"".join(blocks)
+    elif card_type in ("SI8", "SI9", "SIpCard", "SItCard"):
+        data = b"".join(
+            si._send_command(SIReader.C_GET_SI9, bytes([block]))[1][1:]
+            for block in range(SIReader.CARD[card_type]["BC"])
+        )
+    elif card_type == "SI10":
+        # only the blocks with punches in them
+        blocks = [si._send_command(SIReader.C_GET_SI9, b"\x00")[1][1:]]
+        punch_count = min(blocks[0][SIReader.CARD["SI10"]["RC"]], 128)
+        for block in (4, 5, 6, 7)[: (punch_count + 31) // 32]:
+            blocks.append(si._send_command(SIReader.C_GET_SI9, bytes([block]))[1][1:])
+        data = b"".join(blocks)
+    else:
+        raise SIReaderException("No card in the device.")
+    return RawCard(card_type, data, dt.datetime.now())
+
+
+class StationReader:
+    def __init__(
+        self,
+        port: str,
+        on_readout: Callable[[InputData], None],
+        card_wait_config: CardWaitConfig = DEFAULT_CONFIG,
+        metrics: Metrics = METRICS,
+        profiler: Profiler = PROFILER,
+    ):
+        self.port = port
+        self.on_readout = on_readout
+        self.card_wait_config = card_wait_config
+        self.metrics = metrics
+        self.profiler = profiler
+        self._stop = threading.Event()
+        # set once run() returns, stopped or not: a reader that gave up on its port (or died) needs replacing
+        self.done = threading.Event()
+
+        log.info(f"reader worker created for port {port}")
+
+    def get_reader(self) -> bool:
+        # TODO: do not recreate each loop. cache once
+        for _ in range(10):
+            if self._stop.is_set():
+                return False
+            try:
+                self.si = SIReaderReadout(self.port)
+
+                log.success(f"connected to SI at port {self.port}")
+                self.metrics.count("reader_connects")
+                return True
+
+            except SIReaderException:
+                self.metrics.count("reader_connect_errors")
+                self._stop.wait(1)
+        log.error(f"Could not open SI reader at port {self.port}")
+        return False
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        try:
+            self._run()
+        finally:
+            self.done.set()
+
+    def _run(self):
+        log.info(f"starting si loop on {self.port}...")
+        if not self.get_reader():
+            return
+
+        while not self._stop.is_set():
+            log.info(f"starting instance of si loop on {self.port}...")
+
+            try:
+                # block (without spinning) until the station tells us about a card
+                if not wait_for_card(self.si, self.card_wait_config, self._stop):
+                    continue
+
+                with self.profiler.profile():
+                    # process output
+                    start = time.perf_counter()
+                    raw = read_raw_card(self.si)
+                    self.metrics.observe("read_sicard", time.perf_counter() - start)
+                    input_data = InputData.from_raw(raw, reader_id=self.port)
+
+                    # beep
+                    with self.metrics.time("ack_sicard"):
+                        self.si.ack_sicard()
+            except (SIReaderCardChanged, SIReaderException) as e:
+                # this exception (card removed too early) can be ignored
+                log.warning(f"exception: {e}")
+                self.metrics.count("reader_exceptions")
+                continue
+
+            self.metrics.count("readouts")
+            self.on_readout(input_data)
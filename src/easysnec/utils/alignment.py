@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import operator
+from collections.abc import Sequence
+from dataclasses import dataclass
+from enum import Enum
+from typing import NamedTuple
+
+# Optimal string alignment (restricted Damerau-Levenshtein, the same distance pyxdameraulevenshtein gives the
+# course matcher) between a course and what a runner punched, with the traceback kept: which controls were
+# missed, which punches were extra, which were punched instead of the right control and which two were swapped.
+#
+# Runners mostly get most of a course right, so the common prefix and suffix are matched up front and the
+# dynamic programming table only covers the part in between. For a single missed control or swapped pair
+# that's a handful of cells, not len(course) * len(punches).
+
+
+_FAR = 1 << 30
+
+
+class Edit(Enum):
+    MISSED = 1  # course control with no punch for it
+    EXTRA = 2  # punch that isn't on the course (there)
+    WRONG = 3  # punched something else where the course wanted this control
+    SWAPPED = 4  # two neighbouring controls punched the other way round
+
+
+class Step(NamedTuple):
+    edit: Edit
+    # position in the course / in the punches. None for EXTRA / MISSED. for SWAPPED it's the first of the pair
+    course_index: int | None
+    punch_index: int | None
+
+
+@dataclass(frozen=True)
+class Alignment:
+    distance: int
+    # every edit in course (and punch) order. everything not in here was punched right
+    edits: tuple[Step, ...]
+
+
+PERFECT = Alignment(0, ())
+
+
+def align(course: Sequence[int], punches: Sequence[int]) -> Alignment:
+    if len(course) == len(punches) and all(map(operator.eq, course, punches)):
+        return PERFECT
+
+    # skip what matches at both ends
+    end = min(len(course), len(punches))
+    prefix = 0
+    while prefix < end and course[prefix] == punches[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < end - prefix and course[-1 - suffix] == punches[-1 - suffix]:
+        suffix += 1
+    a = course[prefix : len(course) - suffix]
+    b = punches[prefix : len(punches) - suffix]
+    m, n = len(a), len(b)
+
+    if m == 0 or n == 0:
+        return Alignment(
+            m + n,
+            tuple(Step(Edit.MISSED, prefix + i, None) for i in range(m))
+            + tuple(Step(Edit.EXTRA, None, prefix + j) for j in range(n)),
+        )
+
+    # runners are rarely more than a few edits off, so only fill the table within a band of k around the
+    # diagonal (a path that leaves it costs more than k). if the answer fits in the band it's exact, otherwise
+    # double k and go again
+    k = max(abs(m - n), 2)
+    while True:
+        table = _banded_table(a, b, k)
+        if table[m][n] <= k:
+            break
+        k *= 2
+
+    # walk back from the end. ties go to match, then swap, then wrong control, then missed, then extra
+    edits = []
+    i, j = m, n
+    while i or j:
+        here = table[i][j]
+        if i and j and a[i - 1] == b[j - 1] and here == table[i - 1][j - 1]:
+            i, j = i - 1, j - 1
+        elif (
+            i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1] and here == table[i - 2][j - 2] + 1
+        ):
+            edits.append(Step(Edit.SWAPPED, prefix + i - 2, prefix + j - 2))
+            i, j = i - 2, j - 2
+        elif i and j and here == table[i - 1][j - 1] + 1:
+            edits.append(Step(Edit.WRONG, prefix + i - 1, prefix + j - 1))
+            i, j = i - 1, j - 1
+        elif i and here == table[i - 1][j] + 1:
+            edits.append(Step(Edit.MISSED, prefix + i - 1, None))
+            i -= 1
+        else:
+            edits.append(Step(Edit.EXTRA, None, prefix + j - 1))
+            j -= 1
+    edits.reverse()
+    return Alignment(table[m][n], tuple(edits))
+
+
+def _banded_table(a: Sequence[int], b: Sequence[int], k: int) -> list[list[int]]:
+    # table[i][j]: distance between a[:i] and b[:j], for |i - j| <= k. cells outside the band are _FAR
+    m, n = len(a), len(b)
+    table = [[j if j <= k else _FAR for j in range(n + 1)]]
+    before = None  # table[i - 2]
+    for i in range(1, m + 1):
+        row = [_FAR] * (n + 1)
+        if i <= k:
+            row[0] = i
+        above = table[i - 1]
+        a_i = a[i - 1]
+        a_before = a[i - 2] if i > 1 else None
+        first = max(1, i - k)
+        b_before = b[first - 2] if first > 1 else None
+        for j in range(first, min(n, i + k) + 1):
+            b_j = b[j - 1]
+            best = min(above[j - 1] + (a_i != b_j), above[j] + 1, row[j - 1] + 1)
+            if a_i == b_before and a_before == b_j and before is not None:
+                best = min(best, before[j - 2] + 1)
+            row[j] = best
+            b_before = b_j
+        table.append(row)
+        before = above
+    return table
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+
+from fastlog import log
+
+from .grading import Grade, OutputData
+from .metrics import METRICS, Metrics
+
+# Results for the announcer laptop and the results screen: a small TCP server speaking newline-delimited JSON
+# (easysnec --broadcast-port 9465, then e.g. `nc finish-pc 9465`). It sits in the grading pipeline next to
+# the export files, so every new grade goes out to every connected client. One message per line:
+#
+#   {"type": "snapshot", "first": 1, "results": [...]}    every result so far. sent to every new client, and
+#                                                         to any client that sends a {"type": "snapshot"} line
+#   {"type": "results", "first": 42, "results": [...]}    new results, numbered from first
+#
+# A client that sees a "first" it didn't expect has missed something and should ask for a snapshot.
+#
+# New grades are held for batch_interval and go out together, so a burst of cards is one message, not one per
+# card. Each client has a queue of at most client_queue messages. A client that can't keep up (the queue is
+# full) is dropped rather than holding up the others or growing without bound. It can reconnect, and starts
+# with a snapshot like any new client.
+#
+# The server runs on its own asyncio loop in its own thread. write() is called from the grading thread and only
+# encodes the result and hands it to the loop.
+
+
+def result_record(result: Grade | OutputData) -> dict:
+    output = result if isinstance(result, OutputData) else OutputData.from_grade(result)
+    record = {
+        "card": output.card_id,
+        "course": output.course_name,
+        "status": output.success_status.name,
+        "time": None if output.time is None else output.time.total_seconds(),
+        "score": output.score,
+        "missed": output.missed_checkpoints,
+        "splits": output.splits,
+        "start": None if output.start_time is None else output.start_time.isoformat(),
+        "finish": None if output.finish_time is None else output.finish_time.isoformat(),
+        # from/to null are the start/finish, lost is seconds behind the leg's median
+        "legs": [
+            {"from": leg.from_control, "to": leg.to_control, "seconds": leg.seconds, "lost": lost}
+            for leg, lost in zip(output.legs, output.time_lost)
+        ],
+    }
+    if output.reading_id is not None:
+        record["reader"] = output.reader_id
+        record["reading_id"] = str(output.reading_id)
+    return record
+
+
+class _Client:
+    def __init__(self, writer: asyncio.StreamWriter, maxsize: int):
+        self.writer = writer
+        self.queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize)
+
+    def send(self, message: bytes) -> bool:
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def pump(self) -> None:
+        while True:
+            self.writer.write(await self.queue.get())
+            await self.writer.drain()
+
+
+class ResultBroadcaster:
+    def __init__(
+        self,
+        port: int = 9465,
+        host: str = "127.0.0.1",
+        batch_interval: float = 0.05,
+        max_batch: int = 500,
+        client_queue: int = 64,
+        metrics: Metrics = METRICS,
+    ):
+        self.host = host
+        self.batch_interval = batch_interval
+        self.max_batch = max_batch
+        self.client_queue = client_queue
+        self.metrics = metrics
+        self.count = 0
+
+        self.loop = asyncio.new_event_loop()
+        # only touched from the loop's thread: every result so far (encoded), how many of them went out already,
+        # and the clients
+        self._records: list[bytes] = []
+        self._sent = 0
+        self._clients: set[_Client] = set()
+        self._wake = asyncio.Event()
+        self._server: asyncio.Server | None = None
+
+        self._requested_port = port
+        self._ready = threading.Event()
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._run, name="results-broadcast", daemon=True)
+
+    @property
+    def port(self) -> int:
+        assert self._server is not None
+        return self._server.sockets[0].getsockname()[1]
+
+    @property
+    def clients(self) -> int:
+        return len(self._clients)
+
+    def start(self) -> None:
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+        log.info(f"broadcasting results on {self.host}:{self.port}")
+
+    def write(self, result: Grade | OutputData) -> None:
+        # any thread. the grade is encoded here, everything else happens on the loop
+        record = json.dumps(result_record(result), separators=(",", ":")).encode()
+        self.count += 1
+        self.loop.call_soon_threadsafe(self._add, record)
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(2)
+
+    def _add(self, record: bytes) -> None:
+        self._records.append(record)
+        self._wake.set()
+
+    def _message(self, kind: str, first: int, records: list[bytes]) -> bytes:
+        return b'{"type":"%s","first":%d,"results":[%s]}\n' % (kind.encode(), first, b",".join(records))
+
+    def _snapshot(self) -> bytes:
+        # what has gone out so far. the rest is on its way in the next batch
+        return self._message("snapshot", 1, self._records[: self._sent])
+
+    async def _batches(self) -> None:
+        while True:
+            await self._wake.wait()
+            # let the rest of the burst come in
+            await asyncio.sleep(self.batch_interval)
+            self._wake.clear()
+            while self._sent < len(self._records):
+                batch = self._records[self._sent : self._sent + self.max_batch]
+                message = self._message("results", self._sent + 1, batch)
+                self._sent += len(batch)
+                for client in list(self._clients):
+                    if not client.send(message):
+                        self._drop(client)
+
+    def _drop(self, client: _Client) -> None:
+        # too far behind. it gets a snapshot if it comes back
+        log.warning(f"dropping results client {client.writer.get_extra_info('peername')}, it isn't keeping up")
+        self.metrics.count("broadcast_dropped_clients")
+        self._clients.discard(client)
+        client.writer.transport.abort()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        client = _Client(writer, self.client_queue)
+        client.send(self._snapshot())
+        self._clients.add(client)
+        pump = asyncio.create_task(client.pump())
+        try:
+            # the only thing clients say is that they want a snapshot
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    continue
+                wants_snapshot = isinstance(request, dict) and request.get("type") == "snapshot"
+                if wants_snapshot and not client.send(self._snapshot()):
+                    self._drop(client)
+                    break
+        except (ConnectionError, ValueError):
+            # gone, or a line too long to be a request
+            pass
+        finally:
+            self._clients.discard(client)
+            pump.cancel()
+            writer.close()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        try:
+            self._server = self.loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self._requested_port)
+            )
+        except OSError as e:
+            self._error = e
+            self._ready.set()
+            self.loop.close()
+            return
+        batches = self.loop.create_task(self._batches())
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self._server.close()
+            for client in list(self._clients):
+                client.writer.transport.abort()
+            batches.cancel()
+            tasks = asyncio.all_tasks(self.loop)
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import select
+import threading
+import time
+from dataclasses import dataclass
+from enum import Enum
+
+# Waiting for a card used to be `while not si.poll_sicard(): pass`, which keeps a whole core busy for the
+# entire event. Instead we block on the serial port's file descriptor (select) and only call poll_sicard once
+# the station actually sent us something. Where there is no fd to select on (windows) we fall back to sleeping
+# on a short backoff schedule, which still idles at ~0% cpu.
+
+
+class WaitMode(Enum):
+    AUTO = 1  # select if the port has a file descriptor, else backoff
+    SELECT = 2
+    BACKOFF = 3
+    SPIN = 4  # the old busy loop. only here so we can benchmark against it
+
+
+@dataclass(frozen=True)
+class CardWaitConfig:
+    mode: WaitMode = WaitMode.AUTO
+    # how long a single blocking wait may take before we come up for air (to check the stop flag)
+    slice_timeout: float = 0.25
+    # sleep schedule (seconds) for BACKOFF mode. we step through it while idle and restart after any activity,
+    # so the worst case insertion latency is the last entry
+    backoff_schedule: tuple[float, ...] = (0.001, 0.002, 0.005, 0.01, 0.02)
+
+
+# frozen, so every reader can share it as the default
+DEFAULT_CONFIG = CardWaitConfig()
+
+
+def port_fileno(serial_port) -> int | None:
+    # pyserial only exposes fileno() on posix
+    try:
+        return serial_port.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def resolve_mode(serial_port, config: CardWaitConfig) -> WaitMode:
+    if config.mode is not WaitMode.AUTO:
+        return config.mode
+    return WaitMode.SELECT if port_fileno(serial_port) is not None else WaitMode.BACKOFF
+
+
+def wait_for_input(serial_port, timeout: float, config: CardWaitConfig = DEFAULT_CONFIG) -> bool:
+    # block until the serial port has bytes waiting or timeout runs out. returns whether there is input
+    mode = resolve_mode(serial_port, config)
+
+    if mode is WaitMode.SELECT:
+        fd = port_fileno(serial_port)
+        if fd is not None:
+            readable, _, _ = select.select([fd], [], [], timeout)
+            return bool(readable)
+        mode = WaitMode.BACKOFF
+
+    deadline = time.monotonic() + timeout
+    step = 0
+    while True:
+        if serial_port.in_waiting:
+            return True
+        if mode is WaitMode.SPIN:
+            if time.monotonic() >= deadline:
+                return False
+            continue
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(config.backoff_schedule[step], remaining))
+        step = min(step + 1, len(config.backoff_schedule) - 1)
+
+
+def wait_for_card(
+    si,
+    config: CardWaitConfig = DEFAULT_CONFIG,
+    stop: threading.Event | None = None,
+    timeout: float | None = None,
+) -> bool:
+    # wait until si.poll_sicard() reports a card state change. returns False if we were stopped or timed out
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    while not (stop and stop.is_set()):
+        if si.poll_sicard():
+            return True
+
+        slice_timeout = config.slice_timeout
+        if deadline is not None:
+            slice_timeout = min(slice_timeout, deadline - time.monotonic())
+            if slice_timeout <= 0:
+                return False
+
+        wait_for_input(si._serial, slice_timeout, config)
+
+    return False
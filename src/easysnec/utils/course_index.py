@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator, Sequence
+from typing import TYPE_CHECKING
+
+import numpy as np
+from pyxdameraulevenshtein import damerau_levenshtein_distance
+
+from .alignment import Alignment, align
+
+if TYPE_CHECKING:
+    from .grading import Course
+
+# get_closest_course used to run damerau_levenshtein_distance against every course. That's fine for the ten
+# animal courses, but a school series can load thousands. CourseIndex answers the same question (the first
+# course, in list order, with the smallest distance) while only running the edit distance on a few courses:
+#
+#   1. exact match: a dict from station tuple to course, distance 0 can't be beaten
+#   2. lower bound: the "bag distance" (how many punches/controls can't be paired up regardless of order) never
+#      exceeds the edit distance, and we get it for every course at once from a station histogram matrix
+#   3. visit courses by increasing bound, stop as soon as the bound is worse than the best real distance
+#
+# pyxdameraulevenshtein computes the restricted (optimal string alignment) distance, which isn't a metric, so
+# triangle-inequality tricks like a BK-tree would give wrong answers here. The bag distance bound is safe for it.
+#
+# pyxdameraulevenshtein only gives distances. closest_aligned lines the readout up against the course that won,
+# once, so the Grade gets the edits without searching the course set again.
+#
+# closest_indices does the same for a whole batch of readouts (regrading). For small course sets it skips the
+# pruning and fills in the edit distance tables for every (readout, course) pair at once with numpy.
+
+# above this many courses, batched edit distances cost more than pruning each readout on its own
+BATCH_COURSE_LIMIT = 64
+# cap on the size of one batched edit distance table, in cells
+BATCH_CELLS = 1 << 24
+
+
+class CourseIndex:
+    def __init__(self, courses: Iterable[Course]):
+        self.courses: list[Course] = list(courses)
+        self._stations: list[list[int]] = [list(course.stations) for course in self.courses]
+
+        self._exact: dict[tuple[int, ...], int] = {}
+        for i, stations in enumerate(self._stations):
+            self._exact.setdefault(tuple(stations), i)
+
+        # every station used by any course gets a column, plus a last column for stations no course uses
+        vocabulary = sorted({station for stations in self._stations for station in stations})
+        self._column = {station: i for i, station in enumerate(vocabulary)}
+        self._other = len(vocabulary)
+
+        self._histograms = np.zeros((len(self.courses), len(vocabulary) + 1), dtype=np.int32)
+        for i, stations in enumerate(self._stations):
+            for station in stations:
+                self._histograms[i, self._column[station]] += 1
+        self._lengths = self._histograms.sum(axis=1)
+
+    def __len__(self) -> int:
+        return len(self.courses)
+
+    def __iter__(self) -> Iterator[Course]:
+        return iter(self.courses)
+
+    def lower_bounds(self, stations: Sequence[int]) -> np.ndarray:
+        histogram = np.zeros(self._histograms.shape[1], dtype=np.int32)
+        for station in stations:
+            histogram[self._column.get(station, self._other)] += 1
+
+        # bag distance: max(course controls not covered by the punches, punches not covered by the course)
+        overlap = np.minimum(self._histograms, histogram).sum(axis=1)
+        return np.maximum(self._lengths, len(stations)) - overlap
+
+    def closest_index(self, stations: Sequence[int]) -> int:
+        if not self.courses:
+            raise ValueError("can't pick the closest course out of no courses")
+
+        exact = self._exact.get(tuple(stations))
+        if exact is not None:
+            return exact
+
+        bounds = self.lower_bounds(stations)
+        best_distance, best_index = None, -1
+        # stable sort so equal bounds come out in course order, which keeps min()'s first-wins tie breaking
+        for i in np.argsort(bounds, kind="stable").tolist():
+            if best_distance is not None:
+                if bounds[i] > best_distance:
+                    break
+                if bounds[i] == best_distance and i > best_index:
+                    continue
+
+            distance = damerau_levenshtein_distance(stations, self._stations[i])
+            if (
+                best_distance is None
+                or distance < best_distance
+                or (distance == best_distance and i < best_index)
+            ):
+                best_distance, best_index = distance, i
+
+        return best_index
+
+    def closest(self, stations: Sequence[int]) -> Course:
+        return self.courses[self.closest_index(stations)]
+
+    def closest_aligned(self, stations: Sequence[int]) -> tuple[Course, Alignment]:
+        # the closest course and how the punches line up against it. an exact match is PERFECT for free
+        i = self.closest_index(stations)
+        return self.courses[i], align(self._stations[i], stations)
+
+    def closest_indices(self, station_lists: Sequence[Sequence[int]]) -> np.ndarray:
+        # closest_index for every readout in station_lists
+        result = np.empty(len(station_lists), dtype=np.int64)
+        if len(self.courses) > BATCH_COURSE_LIMIT:
+            for i, stations in enumerate(station_lists):
+                result[i] = self.closest_index(stations)
+            return result
+        if not self.courses:
+            raise ValueError("can't pick the closest course out of no courses")
+
+        todo = []
+        for i, stations in enumerate(station_lists):
+            exact = self._exact.get(tuple(stations))
+            if exact is None:
+                todo.append(i)
+            else:
+                result[i] = exact
+        if not todo:
+            return result
+
+        width = max(len(station_lists[i]) for i in todo)
+        course_width = max(map(len, self._stations))
+        chunk = max(1, BATCH_CELLS // ((width + 1) * (course_width + 1) * len(self.courses)))
+        for first in range(0, len(todo), chunk):
+            rows = todo[first : first + chunk]
+            distances = batch_distances([station_lists[i] for i in rows], self._stations)
+            # argmin picks the first of equal distances, same as min()
+            result[rows] = distances.argmin(axis=1)
+        return result
+
+
+def batch_distances(a_lists: Sequence[Sequence[int]], b_lists: Sequence[Sequence[int]]) -> np.ndarray:
+    # damerau_levenshtein_distance (optimal string alignment) for every pair of a_lists x b_lists. the usual
+    # dynamic programming table, but each cell is an (len(a_lists), len(b_lists)) array, and a whole row of
+    # the table is worked out at once, so the python loop only runs over the rows
+    a_lengths = np.fromiter(map(len, a_lists), dtype=np.int64, count=len(a_lists))
+    b_lengths = np.fromiter(map(len, b_lists), dtype=np.int64, count=len(b_lists))
+    width, b_width = int(a_lengths.max(initial=0)), int(b_lengths.max(initial=0))
+
+    # pad with values that never equal a station (or each other). cells past a sequence's end are never read
+    a = np.full((width, len(a_lists)), -1, dtype=np.int32)
+    for i, stations in enumerate(a_lists):
+        a[: len(stations), i] = stations
+    b = np.full((b_width, len(b_lists)), -2, dtype=np.int32)
+    for i, stations in enumerate(b_lists):
+        b[: len(stations), i] = stations
+
+    # only the last three rows of the table are ever read, so those are all that's kept. a distance never
+    # exceeds the longer sequence, and the insertion step below takes up to b_width off it: small tables fit
+    # in int8, which halves what every step has to read and write
+    dtype = np.int8 if width + b_width < 127 else np.int16
+    # readouts (a_lists, the many) on the last axis, so every step runs over long contiguous rows
+    shape = (b_width + 1, len(b_lists), len(a_lists))
+    rows = [np.empty(shape, dtype=dtype) for _ in range(3)]
+    rows[0][:] = np.arange(b_width + 1, dtype=dtype)[:, None, None]
+    columns = np.arange(b_width + 1, dtype=dtype)[:, None, None]
+    b_index = np.arange(len(b_lists))[None, :]
+    distances = np.empty((len(a_lists), len(b_lists)), dtype=np.int64)
+    done = a_lengths == 0
+    distances[done] = b_lengths[None, :]
+    scratch = np.empty(shape, dtype=dtype)
+    for i in range(1, width + 1):
+        before, previous, row = rows[(i - 2) % 3], rows[(i - 1) % 3], rows[i % 3]
+        a_i = a[i - 1][None, None, :]
+        row[0] = i
+        # substitution (or match) and deletion for every column j >= 1 at once
+        np.add(previous[:-1], a_i != b[:, :, None], out=row[1:])
+        np.add(previous[1:], 1, out=scratch[1:])
+        np.minimum(row[1:], scratch[1:], out=row[1:])
+        if i > 1 and b_width > 1:
+            # transposition of a[i-2:i] and b[j-2:j]
+            swapped = (a_i == b[:-1, :, None]) & (a[i - 2][None, None, :] == b[1:, :, None])
+            np.add(before[:-2], 1, out=scratch[2:])
+            np.minimum(row[2:], scratch[2:], out=row[2:], where=swapped)
+        # insertion: d[i, j] = min over k <= j of d[i, k] + (j - k), a running minimum of d[i, k] - k. a loop
+        # of np.minimum over the columns, np.minimum.accumulate along an outer axis is far slower
+        row -= columns
+        for j in range(1, b_width + 1):
+            np.minimum(row[j], row[j - 1], out=row[j])
+        row += columns
+
+        ending = np.flatnonzero(a_lengths == i)
+        if len(ending):
+            distances[ending] = row[b_lengths[None, :], b_index, ending[:, None]]
+    return distances
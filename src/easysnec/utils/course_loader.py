@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import csv
+import datetime as dt
+import hashlib
+import json
+import xml.etree.ElementTree as ET
+from collections.abc import Iterator
+from dataclasses import replace
+from pathlib import Path
+
+from fastlog import log
+
+from .grading import Course
+
+# Course import. IOF XML 3.0 CourseData files are read with iterparse, one <Course> at a time, and every
+# finished element is cleared again, so a big multi-event file never sits in memory as a whole DOM. Simple
+# CSV files (name, control, control, ...) work too.
+#
+# Parsed course sets are saved to a small json cache named after the sha256 of the file's bytes, so opening
+# the same event again skips parsing altogether, and an edited file can never hit a stale cache entry.
+
+# bump when the cache layout (or what we read from the files) changes
+CACHE_VERSION = 2
+
+
+def default_cache_dir() -> Path:
+    return Path.home() / ".easysnec" / "course_cache"
+
+
+def _local_name(tag: str) -> str:
+    # "{namespace}Course" -> "Course". files without the namespace are accepted too
+    return tag.rsplit("}", 1)[-1]
+
+
+def _control_code(text: str | None) -> int:
+    code = (text or "").strip()
+    if not code.isdigit():
+        raise ValueError(f"control {code!r} is not a station code")
+    return int(code)
+
+
+def _parse_course(element: ET.Element) -> Course:
+    course_name = ""
+    stations = []
+    values = {}
+    for child in element:
+        match _local_name(child.tag):
+            case "Name":
+                course_name = (child.text or "").strip()
+            case "CourseControl" if child.get("type", "Control") == "Control":
+                # several <Control>s in one leg are alternatives, any of them will do. we grade against the first
+                controls = [leg for leg in child if _local_name(leg.tag) == "Control"]
+                if controls:
+                    stations.append(_control_code(controls[0].text))
+                # a <Score> makes it a score-o course, the control is worth that many points
+                scores = [leg for leg in child if _local_name(leg.tag) == "Score"]
+                if controls and scores:
+                    values[stations[-1]] = int(float(scores[0].text or 0))
+    return Course(course_name, bool(values), stations, control_values=values or None)
+
+
+def iter_iof_xml(path: Path | str) -> Iterator[Course]:
+    # yields every <Course> of every <RaceCourseData> in an IOF XML 3.0 CourseData file, controls in file
+    # order. only Control legs count (not Start, Finish or CrossingPoint)
+    context = ET.iterparse(path, events=("start", "end"))
+    _, root = next(context)
+    if _local_name(root.tag) != "CourseData":
+        raise ValueError(f"{path} is not an IOF CourseData file (root is {_local_name(root.tag)})")
+
+    stack = [root]
+    for event, element in context:
+        if event == "start":
+            stack.append(element)
+            continue
+        stack.pop()
+
+        # direct children of RaceCourseData are the unit of work: once one is done, parse it if it's a course
+        # and throw it (and everything before it) away
+        if len(stack) == 2 and _local_name(stack[1].tag) == "RaceCourseData":
+            if _local_name(element.tag) == "Course":
+                yield _parse_course(element)
+            stack[1].clear()
+        elif len(stack) == 1:
+            root.clear()
+
+
+def iter_csv(path: Path | str) -> Iterator[Course]:
+    # one course per row: name, then its controls in order. a header row (non numeric controls) is skipped
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        for row in csv.reader(file):
+            cells = [cell.strip() for cell in row if cell.strip()]
+            if not cells:
+                continue
+            try:
+                stations = [_control_code(cell) for cell in cells[1:]]
+            except ValueError:
+                log.info(f"skipping non-course row {row} in {path}")
+                continue
+            yield Course(cells[0], False, stations)
+
+
+def parse_courses(path: Path | str) -> list[Course]:
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        return list(iter_csv(path))
+    return list(iter_iof_xml(path))
+
+
+def file_digest(path: Path | str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_courses(
+    path: Path | str,
+    cache_dir: Path | str | None = None,
+    time_limit: dt.timedelta | None = None,
+    penalty_per_minute: float = 0,
+) -> list[Course]:
+    # parse a course file, or load it from the cache if we've seen exactly these bytes before. an IOF <Course>
+    # has no time limit and a CSV row is only controls, so a score-o time limit (and the penalty for going
+    # over) comes from the caller (--time-limit, --penalty-per-minute) and goes on every score-o course
+    courses = _load_courses(path, cache_dir)
+    if time_limit is None and not penalty_per_minute:
+        return courses
+    return [
+        replace(course, time_limit=time_limit, penalty_per_minute=penalty_per_minute)
+        if course.is_score_o
+        else course
+        for course in courses
+    ]
+
+
+def _load_courses(path: Path | str, cache_dir: Path | str | None) -> list[Course]:
+    cache_dir = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+    cache_file = cache_dir / f"{file_digest(path)}-v{CACHE_VERSION}.json"
+
+    try:
+        with open(cache_file, encoding="utf-8") as file:
+            return [
+                Course(name, is_score_o, stations, control_values=dict(values) if values else None)
+                for name, is_score_o, stations, values in json.load(file)
+            ]
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, TypeError) as e:
+        log.warning(f"ignoring broken course cache {cache_file}: {e}")
+
+    courses = parse_courses(path)
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        temporary = cache_file.with_suffix(".tmp")
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(
+                [
+                    [c.course_name, c.is_score_o, c.stations, list((c.control_values or {}).items())]
+                    for c in courses
+                ],
+                file,
+            )
+        temporary.replace(cache_file)
+    except OSError as e:
+        log.warning(f"could not cache courses from {path}: {e}")
+    return courses
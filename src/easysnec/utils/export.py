@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import csv
+import datetime as dt
+import os
+import re
+import shutil
+import tempfile
+import threading
+from collections.abc import Iterable
+from contextlib import ExitStack
+from pathlib import Path
+from typing import IO, Protocol, Self
+from xml.sax.saxutils import escape, unescape
+
+from .grading import Grade, OutputData, SuccessStatus
+
+# Results export. Every writer takes one result at a time (a Grade or an OutputData) and puts it straight in
+# a file, so exporting a whole event holds one result in memory, not the event. The station keeps a live
+# export open and appends to it as cards come in (easysnec --export results.csv).
+#
+#   CSV:      one row per result (card, course, status, time, score, missed controls, splits, start, finish,
+#             then leg times and time lost on each leg, see utils/splits.py). each write is flushed, whatever
+#             reads the file in the meantime always sees complete results
+#   IOF XML:  a 3.0 ResultList, one <ClassResult> per course. each course's results are appended to a temp
+#             file of its own, and the ResultList is put together from them into a new file that replaces the
+#             old one: on close(), and for a live export (flush_interval) at most that many seconds after a
+#             write. the file on disk is always a complete document, never half a result
+
+# how long a live IOF XML export may lag behind the last card
+LIVE_FLUSH_INTERVAL = 2.0
+
+# a <ClassResult> as IofResultListWriter writes it: the course name line, and the lines around it
+_CLASS_NAME = re.compile(rb"      <Name>(.*)</Name>\n")
+_CLASS_RESULT_LINES = {b"  <ClassResult>\n", b"    <Class>\n", b"    </Class>\n", b"  </ClassResult>\n"}
+
+IOF_STATUS = {
+    SuccessStatus.SUCCESS: "OK",
+    SuccessStatus.MISSES: "MissingPunch",
+    SuccessStatus.INCOMPLETE: "DidNotFinish",
+}
+
+CSV_HEADER = [
+    "card",
+    "course",
+    "status",
+    "time",
+    "score",
+    "missed_controls",
+    "splits",
+    "start",
+    "finish",
+    "legs",
+    "time_lost",
+]
+
+
+def _output(result: Grade | OutputData) -> OutputData:
+    return result if isinstance(result, OutputData) else OutputData.from_grade(result)
+
+
+def _seconds(moment: dt.timedelta | None) -> str:
+    return "" if moment is None else f"{moment.total_seconds():g}"
+
+
+def _split(seconds: float | None) -> str:
+    return "" if seconds is None else f"{seconds:g}"
+
+
+def _iso(moment: dt.datetime | None) -> str:
+    return "" if moment is None else moment.isoformat()
+
+
+def _leg_end(control: int | None) -> str:
+    return "F" if control is None else str(control)
+
+
+def _person(card_id: int | None) -> list[str]:
+    # the card number as the runner's id and family name, so results software has someone to list
+    card = "" if card_id is None else str(card_id)
+    return [
+        "      <Person>",
+        f'        <Id type="SI">{card}</Id>',
+        "        <Name>",
+        f"          <Family>{card}</Family>",
+        "          <Given>Card</Given>",
+        "        </Name>",
+        "      </Person>",
+    ]
+
+
+class CsvResultWriter:
+    def __init__(self, path: Path | str, append: bool = False):
+        self.path = Path(path)
+        self.count = 0
+        new = not append or not self.path.exists() or self.path.stat().st_size == 0
+        with ExitStack() as stack:
+            self._file = stack.enter_context(
+                open(self.path, "w" if not append else "a", newline="", encoding="utf-8")
+            )
+            self._writer = csv.writer(self._file)
+            if new:
+                self._writer.writerow(CSV_HEADER)
+                self._file.flush()
+            stack.pop_all()
+
+    def write(self, result: Grade | OutputData) -> None:
+        output = _output(result)
+        self._writer.writerow(
+            [
+                output.card_id,
+                output.course_name,
+                output.success_status.name,
+                _seconds(output.time),
+                f"{output.score:g}",
+                " ".join(map(str, output.missed_checkpoints)),
+                # control=seconds after the start, control= if it wasn't punched
+                " ".join(f"{control}={_split(seconds)}" for control, seconds in output.splits),
+                _iso(output.start_time),
+                _iso(output.finish_time),
+                # control the leg ends at (F for the finish)=seconds, and =seconds behind the leg's median
+                " ".join(f"{_leg_end(leg.to_control)}={_split(leg.seconds)}" for leg in output.legs),
+                " ".join(
+                    f"{_leg_end(leg.to_control)}={'' if lost is None else f'{lost:+g}'}"
+                    for leg, lost in zip(output.legs, output.time_lost)
+                ),
+            ]
+        )
+        self._file.flush()
+        self.count += 1
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class IofResultListWriter:
+    def __init__(
+        self,
+        path: Path | str,
+        append: bool = False,
+        event_name: str = "EasySnec",
+        flush_interval: float | None = None,
+    ):
+        self.path = Path(path)
+        self.count = 0
+        # course -> its <PersonResult>s so far, in a temp file of their own that only ever grows
+        self._classes: dict[str, IO[bytes]] = {}
+        self._temp_files = ExitStack()
+        # None: the file is only put together on close (a one-off export). otherwise a write schedules that
+        # this many seconds later, on a timer thread, so the temp files are only touched under the lock
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_timer: threading.Timer | None = None
+
+        # the temp files are closed again if anything below fails
+        with ExitStack() as stack:
+            stack.push(self._temp_files)
+            if append and self.path.exists() and self.path.stat().st_size > 0:
+                # carry on with the classes already in the file, whatever came before them stays as it is
+                with open(self.path, "rb") as file:
+                    self._header = self._read_classes(file)
+            else:
+                self._header = (
+                    '<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<ResultList xmlns="http://www.orienteering.org/datastandard/3.0" iofVersion="3.0" '
+                    f'createTime="{dt.datetime.now().replace(microsecond=0).isoformat()}" creator="EasySnec">\n'
+                    f"  <Event>\n    <Name>{escape(event_name)}</Name>\n  </Event>\n"
+                ).encode()
+                # an empty ResultList until the first close
+                with open(self.path, "wb") as file:
+                    file.write(self._header + b"</ResultList>\n")
+            stack.pop_all()
+
+    def _read_classes(self, file: IO[bytes]) -> bytes:
+        # a ResultList as this writer leaves it, a line at a time: everything up to the first <ClassResult> is
+        # the header, each class's <PersonResult>s go back into its temp file
+        header = []
+        class_file = None
+        for line in file:
+            if line == b"</ResultList>\n":
+                return b"".join(header)
+            if line in _CLASS_RESULT_LINES:
+                continue
+            if (name := _CLASS_NAME.fullmatch(line)) is not None:
+                class_file = self._class_file(unescape(name[1].decode()))
+            elif class_file is not None:
+                class_file.write(line)
+            else:
+                header.append(line)
+        raise ValueError(f"{self.path} is not a ResultList we can append to")
+
+    def _class_file(self, course_name: str) -> IO[bytes]:
+        class_file = self._classes.get(course_name)
+        if class_file is None:
+            class_file = tempfile.TemporaryFile()  # noqa: SIM115 -- closed by close(), with the other temp files
+            self._classes[course_name] = self._temp_files.enter_context(class_file)
+        return class_file
+
+    def write(self, result: Grade | OutputData) -> None:
+        output = _output(result)
+        person_result = self._person_result(output).encode()
+        with self._lock:
+            self._class_file(output.course_name).write(person_result)
+            self.count += 1
+            if self.flush_interval is not None and self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self) -> None:
+        # put the ResultList together from what's been written so far
+        with self._lock:
+            self._flush_timer = None
+            if self._header is not None:
+                self._rebuild()
+
+    def _rebuild(self) -> None:
+        # one <ClassResult> per course, in the order they came in, into a new file that then replaces the old
+        partial = self.path.with_name(self.path.name + ".partial")
+        with open(partial, "wb") as file:
+            file.write(self._header)
+            for course_name, class_file in self._classes.items():
+                file.write(
+                    b"  <ClassResult>\n    <Class>\n"
+                    + f"      <Name>{escape(course_name)}</Name>\n".encode()
+                    + b"    </Class>\n"
+                )
+                class_file.flush()
+                class_file.seek(0)
+                shutil.copyfileobj(class_file, file)
+                # the next result goes after the others again
+                class_file.seek(0, os.SEEK_END)
+                file.write(b"  </ClassResult>\n")
+            file.write(b"</ResultList>\n")
+        os.replace(partial, self.path)
+
+    def _person_result(self, output: OutputData) -> str:
+        # in the order the schema wants them
+        lines = ["    <PersonResult>", *_person(output.card_id), "      <Result>"]
+        if output.start_time is not None:
+            lines.append(f"        <StartTime>{output.start_time.isoformat()}</StartTime>")
+        if output.finish_time is not None:
+            lines.append(f"        <FinishTime>{output.finish_time.isoformat()}</FinishTime>")
+        if output.time is not None:
+            lines.append(f"        <Time>{_seconds(output.time)}</Time>")
+        lines.append(f"        <Status>{IOF_STATUS[output.success_status]}</Status>")
+        lines.append(f'        <Score type="Score">{output.score:g}</Score>')
+        for control, seconds in output.splits:
+            lines.append('        <SplitTime status="Missing">' if seconds is None else "        <SplitTime>")
+            lines.append(f"          <ControlCode>{control}</ControlCode>")
+            if seconds is not None:
+                lines.append(f"          <Time>{seconds:g}</Time>")
+            lines.append("        </SplitTime>")
+        if output.card_id is not None:
+            lines.append(f"        <ControlCard>{output.card_id}</ControlCard>")
+        lines += ["      </Result>", "    </PersonResult>", ""]
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        with self._lock, self._temp_files:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if self._header is None:
+                return
+            self._rebuild()
+            self._header = None
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+ResultWriter = CsvResultWriter | IofResultListWriter
+
+
+class ResultSink(Protocol):
+    # anything the pipeline hands every new grade to: the writers above, utils/broadcast.ResultBroadcaster
+    def write(self, result: Grade | OutputData) -> None: ...
+
+    def close(self) -> None: ...
+
+
+def open_result_writer(
+    path: Path | str, append: bool = False, flush_interval: float | None = None
+) -> ResultWriter:
+    # .csv is CSV, anything else (.xml) a ResultList. flush_interval is for a live ResultList, a CSV file is
+    # flushed on every write anyway
+    if Path(path).suffix.lower() == ".csv":
+        return CsvResultWriter(path, append)
+    return IofResultListWriter(path, append, flush_interval=flush_interval)
+
+
+def export_results(results: Iterable[Grade | OutputData], path: Path | str, append: bool = False) -> int:
+    # write results (a list, or a generator so nothing has to be kept around) to path, returns how many
+    with open_result_writer(path, append) as writer:
+        for result in results:
+            writer.write(result)
+        return writer.count
+
@@ -1,14 +1,26 @@
 from __future__ import annotations
 
 import datetime as dt
+import hashlib
 import uuid
+from array import array
+from collections import Counter
+from collections.abc import Iterable, Iterator, Sequence
 
 # from pydantic.dataclasses import dataclass
-from dataclasses import dataclass
+from dataclasses import FrozenInstanceError, dataclass, field
 from enum import Enum
 from functools import cached_property
+from itertools import pairwise
+
+import numpy as np
 from pyxdameraulevenshtein import damerau_levenshtein_distance
-from collections.abc import Iterable
+
+from . import raw_card
+from .alignment import Alignment, Edit, align
+from .course_index import CourseIndex
+from .raw_card import RawCard
+from .score_o import compile_score_o, punch_table
 
 
 def typed_function(a: int, b: str, c: bool) -> None:
@@ -27,18 +39,152 @@ class ScoreType(Enum):
     ANIMAL_O = 2  # Looks exactly like classic-o from our perspective. this might be an illegal use of an enum
 
 
-@dataclass(frozen=True)
+# punch times are stored as microseconds after the first punch. this marks a punch without a time
+_NO_TIME = -(2**63)
+_MICROSECOND = dt.timedelta(microseconds=1)
+
+
+def _punch_times(punches: list[tuple[int, dt.datetime]]) -> tuple[dt.datetime | None, array]:
+    base = next((time for _, time in punches if time is not None), None)
+    return base, array("q", [_NO_TIME if time is None else (time - base) // _MICROSECOND for _, time in punches])
+
+
 class InputData:
+    # One card readout. A station holds thousands of these over a day, so instead of a list of (station,
+    # datetime) tuples the punches are kept as two flat arrays: station codes (array('H'), 2 bytes each) and
+    # punch times as integer microsecond offsets from the first punch (array('q')). punches/stations build the
+    # old lists on demand, station_codes is the array itself for hot paths that don't need a list.
+    # A readout made with from_raw keeps the card memory (raw) and leaves the times undecoded until asked for.
+    __slots__ = (
+        "_time_base",
+        "_time_offsets",
+        "card_id",
+        "finish_time",
+        "raw",
+        "reader_id",
+        "reading_id",
+        "start_time",
+        "station_codes",
+    )
+
     card_id: int
     start_time: dt.datetime | None
     finish_time: dt.datetime | None
-    punches: list[tuple[int, dt.datetime]]  # TODO: split into punches and times???
-    reading_id: (
-        uuid.UUID
-    )  # TODO: this should be generated internally, and not taken as an arg
+    reading_id: uuid.UUID  # TODO: this should be generated internally, and not taken as an arg
+    reader_id: str | None  # which station read this card (its serial port)
+    station_codes: array
+    raw: RawCard | None  # the card memory this was read from, when it came from a station
+
+    def __init__(
+        self,
+        card_id: int,
+        start_time: dt.datetime | None,
+        finish_time: dt.datetime | None,
+        punches: list[tuple[int, dt.datetime]],  # TODO: split into punches and times???
+        reading_id: uuid.UUID,
+        reader_id: str | None = None,
+    ):
+        base, offsets = _punch_times(punches)
+        fields = {
+            "card_id": card_id,
+            "start_time": start_time,
+            "finish_time": finish_time,
+            "reading_id": reading_id,
+            "reader_id": reader_id,
+            "station_codes": array("H", [station for station, _ in punches]),
+            "raw": None,
+            "_time_base": base,
+            "_time_offsets": offsets,
+        }
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise FrozenInstanceError(f"cannot assign to field '{name}'")
+
+    def __delattr__(self, name):
+        raise FrozenInstanceError(f"cannot delete field '{name}'")
+
+    def __reduce__(self):
+        if self.raw is not None:
+            return (InputData.from_raw, (self.raw, self.reader_id, self.reading_id))
+        return (
+            InputData,
+            (
+                self.card_id,
+                self.start_time,
+                self.finish_time,
+                self.punches,
+                self.reading_id,
+                self.reader_id,
+            ),
+        )
+
+    def _times(self) -> tuple[dt.datetime | None, array]:
+        # a readout made from the card memory only decodes its punch times the first time they're needed
+        try:
+            return self._time_base, self._time_offsets
+        except AttributeError:
+            base, offsets = _punch_times(raw_card.punches(self.raw))
+            object.__setattr__(self, "_time_base", base)
+            object.__setattr__(self, "_time_offsets", offsets)
+            return base, offsets
+
+    def _key(self) -> tuple:
+        return (
+            self.card_id,
+            self.start_time,
+            self.finish_time,
+            self.station_codes,
+            *self._times(),
+            self.reading_id,
+            self.reader_id,
+        )
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash((self.card_id, self.reading_id))
+
+    def __repr__(self):
+        return (
+            f"InputData(card_id={self.card_id!r}, start_time={self.start_time!r}, "
+            f"finish_time={self.finish_time!r}, punches={self.punches!r}, "
+            f"reading_id={self.reading_id!r}, reader_id={self.reader_id!r})"
+        )
+
+    def fingerprint(self) -> bytes:
+        # what was punched and when (not which readout or reader), to tell a re-dipped card from a new run
+        if self.raw is not None:
+            # the card memory says it all, and hashing it doesn't need the punch times decoded
+            digest = hashlib.blake2b(self.raw.card_type.encode(), digest_size=16)
+            digest.update(self.raw.data)
+            return digest.digest()
+        base, offsets = self._times()
+        digest = hashlib.blake2b(self.station_codes.tobytes(), digest_size=16)
+        digest.update(offsets.tobytes())
+        for moment in (self.start_time, self.finish_time, base):
+            digest.update(b"-" if moment is None else moment.isoformat().encode())
+        return digest.digest()
+
+    @property
+    def punches(self) -> list[tuple[int, dt.datetime]]:
+        # materialise the datetimes only when someone actually asks for them
+        base, offsets = self._times()
+        return [
+            (station, None if offset == _NO_TIME else base + offset * _MICROSECOND)
+            for station, offset in zip(self.station_codes, offsets)
+        ]
+
+    @property
+    def stations(self) -> list[int]:
+        return self.station_codes.tolist()
 
     @classmethod
-    def from_si_result(self, si_result: dict) -> InputData:
+    def from_si_result(self, si_result: dict, reader_id: str | None = None) -> InputData:
         # TODO: this seems like exactly the sort of thing Pydantic is well suited for
         return InputData(
             card_id=si_result["card_number"],
@@ -46,24 +192,70 @@ class InputData:
             finish_time=si_result["finish"],
             punches=si_result["punches"],
             reading_id=uuid.uuid4(),
+            reader_id=reader_id,
             # other keys: 'check' (datetime), 'clear' (usually None)
         )
 
-    @cached_property
-    def stations(self) -> list[int]:
-        return [punch[0] for punch in self.punches]
-
-    def get_closest_course(self, courses: Iterable[Course]) -> Course:
+    @classmethod
+    def from_raw(
+        cls, raw: RawCard, reader_id: str | None = None, reading_id: uuid.UUID | None = None
+    ) -> InputData:
+        # straight from the card memory: card number, start, finish and the controls punched are read out now
+        # (all grading needs), the punch times only if someone asks for them
+        readout = cls.__new__(cls)
+        start_time, finish_time = raw_card.start_finish(raw)
+        fields = {
+            "card_id": raw_card.card_number(raw),
+            "start_time": start_time,
+            "finish_time": finish_time,
+            "reading_id": uuid.uuid4() if reading_id is None else reading_id,
+            "reader_id": reader_id,
+            "station_codes": raw_card.station_codes(raw),
+            "raw": raw,
+        }
+        for name, value in fields.items():
+            object.__setattr__(readout, name, value)
+        return readout
+
+    def get_closest_course(self, courses: Iterable[Course] | CourseIndex) -> Course:
         # return the course most similar to what the user did, according to damerau_levenshtein
+        if isinstance(courses, CourseIndex):
+            # same answer as the brute force below, without scoring every course
+            return courses.closest(self.station_codes)
+        stations = self.stations
         return min(
             courses,
-            key=lambda course: damerau_levenshtein_distance(
-                self.stations, course.stations
-            ),
+            key=lambda course: damerau_levenshtein_distance(stations, course.stations),
         )
 
-    def score_against(self, course: Course, score_type: ScoreType = ScoreType.ANIMAL_O):
-        return Grade(self, course, score_type)
+    def score_against(
+        self, course: Course, score_type: ScoreType = ScoreType.ANIMAL_O, alignment: Alignment | None = None
+    ):
+        grade = Grade(self, course, score_type)
+        if alignment is not None:
+            # the course match already lined the punches up, don't do it again
+            grade.__dict__["alignment"] = alignment
+        return grade
+
+    def grade_against_closest(
+        self, courses: Iterable[Course] | CourseIndex, score_type: ScoreType = ScoreType.ANIMAL_O
+    ) -> Grade:
+        # get_closest_course + score_against, keeping the alignment the match worked out
+        if isinstance(courses, CourseIndex):
+            course, alignment = courses.closest_aligned(self.station_codes)
+            return self.score_against(course, score_type, alignment)
+        return self.score_against(self.get_closest_course(courses), score_type)
+
+
+@dataclass(frozen=True)
+class Leg:
+    # one leg of a course: start -> first control, control -> control, ..., last control -> finish
+    from_control: int | None  # None is the start
+    to_control: int | None  # None is the finish
+    # how long the leg took, and seconds after the start at its end. None where an end wasn't punched (or has
+    # no time)
+    seconds: float | None
+    cumulative: float | None
 
 
 @dataclass(frozen=True)
@@ -72,6 +264,11 @@ class Grade:
     course: Course
     score_type: ScoreType
 
+    @cached_property
+    def scored_as(self) -> ScoreType:
+        # a score-o course (<Score> in a course file) is graded as one whatever the station is set to
+        return ScoreType.SCORE_O if self.course.is_score_o else self.score_type
+
     @cached_property
     def status(self) -> SuccessStatus:
         if (
@@ -79,7 +276,9 @@ class Grade:
             or self.input_data.finish_time < self.input_data.start_time
         ):
             return SuccessStatus.INCOMPLETE
-        elif self.course.stations == self.input_data.stations:
+        elif self.course.is_score_o or self.course.stations == self.input_data.stations:
+            # a score-o course has no order to get wrong and no control you have to visit, the score says how
+            # well it went
             return SuccessStatus.SUCCESS
         else:
             return SuccessStatus.MISSES
@@ -89,71 +288,125 @@ class Grade:
         if self.status is SuccessStatus.INCOMPLETE:
             return 0
 
-        match self.score_type:
+        match self.scored_as:
             case ScoreType.SCORE_O:
-                # return the number of visited stations that are also in the course description
-                return len(
-                    set(self.course.stations).intersection(
-                        set(self.input_data.stations)
-                    )
-                )
+                # points for the course's controls that were visited (any order, once each), minus late penalties
+                return compile_score_o(self.course).total(self.input_data)
             case ScoreType.CLASSIC_O | ScoreType.ANIMAL_O:
                 # we care about order. Score is time if you did the course correctly, else 0
                 if self.course.stations == self.input_data.stations:
                     d = self.input_data
                     assert d.finish_time is not None and d.start_time is not None
-                    return 1 / (d.finish_time - d.start_time).seconds
+                    seconds = (d.finish_time - d.start_time).seconds
+                    # finished the second it started: there's no time to rank, like a mispunch
+                    return 1 / seconds if seconds else 0
                 else:
                     # TODO: see triResultatsScore() and getMissed() in ResultatPuce.java from EasyGecNG
                     return 0
 
         raise ValueError(f"I don't know how to score {self.score_type}")
 
+    @cached_property
+    def legs(self) -> list[Leg]:
+        # each control is matched with the first punch of it after the previous control's, like a split time
+        # table reads. a control punched out of order counts as not punched
+        input_data = self.input_data
+        punches = input_data.punches
+        start = input_data.start_time
+        moments: list[dt.datetime | None] = [start]
+        position = 0
+        for control in self.course.stations:
+            moment = None
+            for index in range(position, len(punches)):
+                if punches[index][0] == control:
+                    position = index + 1
+                    moment = punches[index][1]
+                    break
+            moments.append(moment)
+        moments.append(input_data.finish_time)
+
+        controls: list[int | None] = [None, *self.course.stations, None]
+        return [
+            Leg(
+                controls[i],
+                controls[i + 1],
+                None if a is None or b is None else (b - a).total_seconds(),
+                None if b is None or start is None else (b - start).total_seconds(),
+            )
+            for i, (a, b) in enumerate(pairwise(moments))
+        ]
+
+    @cached_property
+    def alignment(self) -> Alignment:
+        # how the punches line up against the course, edit by edit
+        return align(self.course.stations, self.input_data.station_codes)
+
     @cached_property
     def missed_checkpoints(self) -> list[str]:
+        # course controls that weren't punched at all. the alignment's other misses were punched somewhere
+        # else, those are out_of_order_checkpoints. a control that was never punched can't line up anywhere, so
+        # only the alignment's misses need looking at
         if self.status is SuccessStatus.SUCCESS:
             return []
-        missed_checkpoints = [
-            station
-            for station in self.course.stations
-            if station not in self.input_data.stations
-        ]
+        course = self.course.stations
+        punched = set(self.input_data.station_codes)
         return [
-            EMOJI_MAPPING.get(checkpoint, str(checkpoint))
-            for checkpoint in missed_checkpoints
+            EMOJI_MAPPING.get(course[step.course_index], str(course[step.course_index]))
+            for step in self.alignment.edits
+            if step.edit in (Edit.MISSED, Edit.WRONG) and course[step.course_index] not in punched
         ]
 
     @cached_property
     def extra_checkpoints(self) -> list[str]:
+        # punches that aren't on the course at all. those never line up with a control either
         if self.status is SuccessStatus.SUCCESS:
             return []
-        extra_checkpoints = [
-            station
-            for station in self.input_data.stations
-            if station not in self.course.stations
-        ]
+        punches = self.input_data.station_codes
+        on_course = set(self.course.stations)
         return [
-            EMOJI_MAPPING.get(checkpoint, str(checkpoint))
-            for checkpoint in extra_checkpoints
+            EMOJI_MAPPING.get(punches[step.punch_index], str(punches[step.punch_index]))
+            for step in self.alignment.edits
+            if step.edit in (Edit.EXTRA, Edit.WRONG) and punches[step.punch_index] not in on_course
         ]
 
+    @cached_property
+    def out_of_order_checkpoints(self) -> list[str]:
+        # punched, but not where the course has them: swapped with a neighbour, or a control the alignment
+        # couldn't place while a punch of it was left over somewhere else (visited too early / too late)
+        if self.status is SuccessStatus.SUCCESS:
+            return []
+        course = self.course.stations
+        punches = self.input_data.station_codes
+        edits = self.alignment.edits
+        unplaced_punches = Counter(
+            punches[step.punch_index] for step in edits if step.edit in (Edit.EXTRA, Edit.WRONG)
+        )
+
+        out_of_order = []
+        for step in edits:
+            if step.edit is Edit.SWAPPED:
+                out_of_order += course[step.course_index : step.course_index + 2]
+            elif step.edit is not Edit.EXTRA:
+                station = course[step.course_index]
+                if unplaced_punches[station]:
+                    unplaced_punches[station] -= 1
+                    out_of_order.append(station)
+        return [EMOJI_MAPPING.get(checkpoint, str(checkpoint)) for checkpoint in out_of_order]
+
     @cached_property
     def scoring_output(self) -> str:
         match self.status:
             case SuccessStatus.SUCCESS:
                 scoring_output = ""
             case SuccessStatus.MISSES:
-                scoring_output = ""
+                lines = []
                 if self.missed_checkpoints:
-                    scoring_output += (
-                        "Missing checkpoints: "
-                        + ", ".join(self.missed_checkpoints)
-                        + "\n"
-                    )
+                    lines.append("Missing checkpoints: " + ", ".join(self.missed_checkpoints))
                 if self.extra_checkpoints:
-                    scoring_output += "Extra checkpoints: " + ", ".join(
-                        self.extra_checkpoints
-                    )
+                    lines.append("Extra checkpoints: " + ", ".join(self.extra_checkpoints))
+                if self.out_of_order_checkpoints:
+                    lines.append("Out of order: " + ", ".join(self.out_of_order_checkpoints))
+                scoring_output = "\n".join(lines)
             case SuccessStatus.INCOMPLETE:
                 scoring_output = "Missing start or finish checkpoint!"
             case _:
@@ -162,12 +415,196 @@ class Grade:
         return scoring_output
 
 
+@dataclass(frozen=True)
+class GradeBatch:
+    # what grade_many returns: one entry per readout, in the order they were passed in. status, score,
+    # missed_checkpoints and extra_checkpoints hold exactly what the matching Grade properties would
+    courses: list[Course]
+    status: list[SuccessStatus]
+    score: np.ndarray
+    missed_checkpoints: list[list[str]]
+    extra_checkpoints: list[list[str]]
+
+    def __len__(self) -> int:
+        return len(self.courses)
+
+    def grades(self, readouts: Sequence[InputData], score_type: ScoreType = ScoreType.ANIMAL_O) -> Iterator[Grade]:
+        # the batch as one Grade per readout (the readouts it was graded from), with what the batch already
+        # worked out cached on it so none of it gets worked out again
+        scores = self.score.tolist()
+        for i, readout in enumerate(readouts):
+            grade = Grade(readout, self.courses[i], score_type)
+            grade.__dict__.update(
+                status=self.status[i],
+                score=scores[i],
+                missed_checkpoints=self.missed_checkpoints[i],
+                extra_checkpoints=self.extra_checkpoints[i],
+            )
+            yield grade
+
+
+def grade_many(
+    readouts: Sequence[InputData],
+    courses: Iterable[Course] | CourseIndex,
+    score_type: ScoreType = ScoreType.ANIMAL_O,
+) -> GradeBatch:
+    # regrade a whole pile of readouts at once (e.g. after a course got fixed mid-event). every readout is
+    # graded against its closest course, like the station does, but instead of one Grade (and its chain of
+    # cached_properties) per readout, all punches go into one padded numpy array and each course's readouts
+    # are checked in a handful of array operations
+    if not isinstance(courses, CourseIndex):
+        courses = CourseIndex(courses)
+    if score_type not in (ScoreType.SCORE_O, ScoreType.CLASSIC_O, ScoreType.ANIMAL_O):
+        raise ValueError(f"I don't know how to score {score_type}")
+
+    n = len(readouts)
+    # padded[i, :lengths[i]] are readout i's stations, the rest is -1 (never a real station)
+    padded, total_seconds = punch_table(readouts)
+    width = padded.shape[1]
+    lengths = (padded >= 0).sum(axis=1)
+
+    # elapsed seconds, or -1 for INCOMPLETE (no start/finish, or finish before start). .seconds like Grade,
+    # whole seconds leaving out the days
+    incomplete = ~(total_seconds >= 0)
+    elapsed = np.where(incomplete, -1, np.floor(np.where(incomplete, 0, total_seconds)) % 86400).astype(np.int64)
+
+    # match every distinct punch sequence once. the rows' bytes are the key, -1 padding included
+    if width:
+        keys = np.ascontiguousarray(padded).view(np.dtype((np.void, 4 * width))).ravel()
+        _, first, which = np.unique(keys, return_index=True, return_inverse=True)
+        which = which.ravel()
+    else:
+        first, which = np.zeros(min(n, 1), dtype=np.int64), np.zeros(n, dtype=np.int64)
+    distinct = padded[first]
+    distinct_lengths = lengths[first]
+    distinct_course = courses.closest_indices(
+        [row[:length] for row, length in zip(distinct.tolist(), distinct_lengths.tolist())]
+    )
+    course_of = distinct_course[which]
+
+    # what only depends on the punches is worked out once per distinct sequence: whether it's its course
+    # exactly (or the course is score-o, any order will do), and the missed and extra checkpoints
+    exact = np.zeros(len(first), dtype=bool)
+    score_o_course = np.fromiter((course.is_score_o for course in courses.courses), dtype=bool, count=len(courses))
+    distinct_missed: list[list[str]] = [[] for _ in range(len(first))]
+    distinct_extra: list[list[str]] = [[] for _ in range(len(first))]
+    for course_index in np.unique(distinct_course).tolist():
+        course = courses.courses[course_index]
+        keys_of = np.flatnonzero(distinct_course == course_index)
+        course_stations = np.asarray(course.stations, dtype=np.int32)
+        group = distinct[keys_of]
+
+        # like Grade.status
+        if course.is_score_o:
+            exact[keys_of] = True
+        elif len(course_stations) <= width:
+            exact[keys_of] = (distinct_lengths[keys_of] == len(course_stations)) & (
+                group[:, : len(course_stations)] == course_stations
+            ).all(axis=1)
+
+        # member[k, p, c]: punch p of sequence k is control c of the course
+        member = group[:, :, None] == course_stations[None, None, :]
+        missed_mask = ~member.any(axis=1)
+        extra_mask = ~member.any(axis=2) & (group >= 0)
+        key_ids = keys_of.tolist()
+        for k, c in zip(*(axis.tolist() for axis in np.nonzero(missed_mask))):
+            station = course.stations[c]
+            distinct_missed[key_ids[k]].append(EMOJI_MAPPING.get(station, str(station)))
+        extra_keys, extra_punches = np.nonzero(extra_mask)
+        for k, station in zip(extra_keys.tolist(), group[extra_keys, extra_punches].tolist()):
+            distinct_extra[key_ids[k]].append(EMOJI_MAPPING.get(station, str(station)))
+
+    success = exact[which] & ~incomplete
+    # every readout gets its own copy of its sequence's lists. a SUCCESS has nothing missed or extra: the
+    # sequence is its course exactly, so its lists are empty already, unless the course is score-o
+    sequence_of = which.tolist()
+    missed = list(map(list, map(distinct_missed.__getitem__, sequence_of)))
+    extra = list(map(list, map(distinct_extra.__getitem__, sequence_of)))
+    for i in np.flatnonzero(success & score_o_course[course_of]).tolist():
+        missed[i], extra[i] = [], []
+
+    # like Grade.scored_as and Grade.score
+    score_o = score_o_course | (score_type is ScoreType.SCORE_O)
+    score = np.zeros(n, dtype=np.float64)
+    scored_as_score_o = score_o[course_of]
+    # no time at all scores 0
+    won = np.flatnonzero(success & ~scored_as_score_o & (elapsed > 0))
+    score[won] = 1 / elapsed[won]
+    # score-o points only depend on the punches too, the penalty on each readout's time
+    for course_index in np.unique(course_of[scored_as_score_o]).tolist():
+        compiled = compile_score_o(courses.courses[course_index])
+        keys_of = np.flatnonzero(distinct_course == course_index)
+        points = np.zeros(len(first), dtype=np.int64)
+        points[keys_of] = compiled.points_table(distinct[keys_of])
+        rows = np.flatnonzero((course_of == course_index) & ~incomplete)
+        score[rows] = np.maximum(points[which[rows]] - compiled.penalty_table(total_seconds[rows]), 0)
+
+    statuses = np.array(
+        [SuccessStatus.MISSES, SuccessStatus.SUCCESS, SuccessStatus.INCOMPLETE], dtype=object
+    )
+    status = statuses[np.where(incomplete, 2, success.astype(np.int64))].tolist()
+
+    return GradeBatch(
+        courses=[courses.courses[i] for i in course_of.tolist()],
+        status=status,
+        score=score,
+        missed_checkpoints=missed,
+        extra_checkpoints=extra,
+    )
+
+
 @dataclass(frozen=True)
 class OutputData:
     # this is your test result - what you got right, what you got wrong
     course_name: str
     success_status: SuccessStatus
     missed_checkpoints: list[int]
+    # the rest is what the exports (utils/export.py) write out next to that
+    card_id: int | None = None
+    start_time: dt.datetime | None = None
+    finish_time: dt.datetime | None = None
+    score: float = 0
+    # (control, seconds after the start) for every control of the course, None where it wasn't punched
+    splits: list[tuple[int, float | None]] = field(default_factory=list)
+    # every leg, finish included, and how far behind the leg's median each one was (seconds, negative: ahead
+    # of it) against the runners before, see utils/splits.py
+    legs: list[Leg] = field(default_factory=list)
+    time_lost: list[float | None] = field(default_factory=list)
+    # which station read the card, and which readout it was
+    reader_id: str | None = None
+    reading_id: uuid.UUID | None = None
+
+    @property
+    def time(self) -> dt.timedelta | None:
+        if self.success_status is SuccessStatus.INCOMPLETE or not (self.start_time and self.finish_time):
+            return None
+        return self.finish_time - self.start_time
+
+    @classmethod
+    def from_grade(cls, grade: Grade, time_lost: list[float | None] | None = None) -> OutputData:
+        # time_lost is what utils/splits.SplitAnalysis.add worked out for the grade, nothing to compare with if
+        # it never went through one
+        input_data, course = grade.input_data, grade.course
+        missed = []
+        if grade.status is not SuccessStatus.SUCCESS:
+            punched = set(input_data.station_codes)
+            missed = [control for control in course.stations if control not in punched]
+        legs = grade.legs
+        return cls(
+            course_name=course.course_name,
+            success_status=grade.status,
+            missed_checkpoints=missed,
+            card_id=input_data.card_id,
+            start_time=input_data.start_time,
+            finish_time=input_data.finish_time,
+            score=grade.score,
+            # a control's split is where its leg ends
+            splits=[(control, leg.cumulative) for control, leg in zip(course.stations, legs)],
+            legs=legs,
+            time_lost=list(time_lost) if time_lost is not None else [None] * len(legs),
+            reader_id=input_data.reader_id,
+            reading_id=input_data.reading_id,
+        )
 
 
 @dataclass(frozen=True)
@@ -175,6 +612,11 @@ class Course:
     course_name: str
     is_score_o: bool
     stations: list[int]
+    # score-o only: how long runners have, the points lost per started minute over that, and what each
+    # control is worth (controls not in here are worth 1)
+    time_limit: dt.timedelta | None = None
+    penalty_per_minute: float = 0
+    control_values: dict[int, int] | None = None
 
 
 COURSES = [
@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+import queue
+import re
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Self
+
+from fastlog import log
+
+from .course_index import CourseIndex
+from .grading import COURSES, Course, Grade, InputData, ScoreType
+from .raw_card import RawCard
+
+# Every raw readout goes into an append-only sqlite journal (WAL mode), so a dead laptop doesn't take the
+# event's results with it. Appends only put the readout on a queue. A writer thread collects whatever arrived
+# in the last commit_interval (or batch_size readouts) and commits them together: one fsync per batch, and the
+# reader loop never waits on the disk. On startup the journal is replayed to rebuild every grade.
+#
+# Every event has its own journal (~/.easysnec/events/<event>.sqlite3). Without --event the event is the day,
+# so restarting the station on the same day picks its results back up and the next day starts empty.
+#
+# A readout the writer can't encode is logged and left out, the rest of its batch still goes in. If the writer
+# thread dies anyway, flush() raises instead of waiting forever and later appends are dropped with an error.
+#
+# A readout read from a station also keeps the card's memory as it came off the card (card_data, see
+# raw_card.py), and replay decodes that again rather than trusting the decoded punches stored next to it, so
+# a decoding bug fixed later fixes old journals too. The decoded punches are still written for the readouts
+# that have no card memory (typed in, simulated) and for older versions reading the file.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS readouts (
+    seq INTEGER PRIMARY KEY,
+    reading_id TEXT NOT NULL UNIQUE,
+    card_id INTEGER NOT NULL,
+    reader_id TEXT,
+    start_time TEXT,
+    finish_time TEXT,
+    punches TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    card_type TEXT,
+    card_data BLOB,
+    read_at TEXT
+)
+"""
+
+# added after the first journals were written. _connect adds them to an older file, where they stay NULL
+RAW_COLUMNS = {"card_type": "TEXT", "card_data": "BLOB", "read_at": "TEXT"}
+
+
+def default_journal_path(event: str | None = None) -> Path:
+    # the journal of an event, today's if it has no name
+    event = event or dt.date.today().isoformat()
+    if not re.fullmatch(r"[\w.-]+", event) or event.strip(".") == "":
+        raise ValueError(f"event names are letters, digits, '.', '-' and '_', not {event!r}")
+    return Path.home() / ".easysnec" / "events" / f"{event}.sqlite3"
+
+
+def _encode_time(moment: dt.datetime | None) -> str | None:
+    return None if moment is None else moment.isoformat()
+
+
+def _decode_time(text: str | None) -> dt.datetime | None:
+    return None if text is None else dt.datetime.fromisoformat(text)
+
+
+def _encode_raw(raw: RawCard | None) -> tuple:
+    if raw is None:
+        return None, None, None
+    return raw.card_type, raw.data, _encode_time(raw.read_at)
+
+
+def _encode(input_data: InputData, now: float) -> tuple:
+    return (
+        str(input_data.reading_id),
+        input_data.card_id,
+        input_data.reader_id,
+        _encode_time(input_data.start_time),
+        _encode_time(input_data.finish_time),
+        json.dumps([[station, _encode_time(moment)] for station, moment in input_data.punches]),
+        now,
+        *_encode_raw(input_data.raw),
+    )
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    # FULL: a commit is on disk when it returns. with group commit that's one fsync per batch
+    connection.execute("PRAGMA synchronous=FULL")
+    connection.execute(SCHEMA)
+    columns = {row[1] for row in connection.execute("PRAGMA table_info(readouts)")}
+    for name, kind in RAW_COLUMNS.items():
+        if name not in columns:
+            connection.execute(f"ALTER TABLE readouts ADD COLUMN {name} {kind}")
+    connection.commit()
+    return connection
+
+
+class ReadoutJournal:
+    def __init__(
+        self,
+        path: Path | str,
+        commit_interval: float = 0.05,
+        batch_size: int = 256,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.commit_interval = commit_interval
+        self.batch_size = batch_size
+
+        self._connection = _connect(self.path)
+        self._pending: queue.Queue[InputData | threading.Event | None] = queue.Queue()
+        # set when the writer thread died. guarded by _state so flush() can't queue a waiter nobody will wake
+        self._failure: BaseException | None = None
+        self._state = threading.Lock()
+        self._writer = threading.Thread(target=self._write_loop, name="journal-writer", daemon=True)
+        self._writer.start()
+
+    # --- writing
+    def append(self, input_data: InputData) -> None:
+        # never blocks on disk. the readout is durable once the writer's next commit returns (see flush)
+        if self._failure is not None:
+            log.error(f"journal writer is gone, readout {input_data.reading_id} is not journaled")
+            return
+        self._pending.put(input_data)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        # wait until everything appended so far is committed. raises if the writer died
+        done = threading.Event()
+        with self._state:
+            self._check()
+            self._pending.put(done)
+        finished = done.wait(timeout)
+        self._check()
+        return finished
+
+    def _check(self) -> None:
+        if self._failure is not None:
+            raise RuntimeError(f"journal writer stopped: {self._failure!r}") from self._failure
+
+    def close(self) -> None:
+        if self._writer.is_alive():
+            self._pending.put(None)
+            self._writer.join()
+        self._connection.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _write_loop(self) -> None:
+        try:
+            self._collect_and_write()
+        except BaseException as e:
+            log.error(f"journal writer stopped: {e!r}")
+            with self._state:
+                self._failure = e
+                # wake every flush() that's waiting, they raise
+                while True:
+                    try:
+                        item = self._pending.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(item, threading.Event):
+                        item.set()
+            raise
+
+    def _collect_and_write(self) -> None:
+        while True:
+            item = self._pending.get()
+            batch: list[InputData] = []
+            waiters: list[threading.Event] = []
+            closing = False
+
+            # group commit: keep collecting until the batch is full or commit_interval has passed
+            deadline = time.monotonic() + self.commit_interval
+            while True:
+                if item is None:
+                    closing = True
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._pending.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+
+            if batch:
+                try:
+                    self._write(batch)
+                except sqlite3.Error as e:
+                    log.error(f"could not journal {len(batch)} readouts: {e}")
+            for waiter in waiters:
+                waiter.set()
+            if closing:
+                return
+
+    def _write(self, batch: list[InputData]) -> None:
+        now = time.time()
+        rows = []
+        for input_data in batch:
+            try:
+                rows.append(_encode(input_data, now))
+            except (ValueError, TypeError, IndexError, OverflowError) as e:
+                # one readout we can't write (card memory that won't decode, say) mustn't cost the others
+                log.error(f"could not journal readout {input_data.reading_id}: {e!r}")
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO readouts "
+                "(reading_id, card_id, reader_id, start_time, finish_time, punches, recorded_at, "
+                "card_type, card_data, read_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    # --- reading
+    def replay(self) -> Iterator[InputData]:
+        # every committed readout, in the order they were journaled
+        yield from replay(self.path)
+
+
+def replay(path: Path | str) -> Iterator[InputData]:
+    # read-only, so a mistyped path is an error instead of a new empty journal
+    path = Path(path)
+    if not path.is_file():
+        raise FileNotFoundError(f"no readout journal at {path}")
+    connection = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        try:
+            rows = connection.execute(
+                "SELECT reading_id, card_id, reader_id, start_time, finish_time, punches, card_type, card_data, "
+                "read_at FROM readouts ORDER BY seq"
+            )
+        except sqlite3.DatabaseError as e:
+            raise ValueError(f"{path} is not a readout journal: {e}") from e
+        for reading_id, card_id, reader_id, start_time, finish_time, punches, *raw in rows:
+            readout = None
+            if raw[1] is not None:
+                card_type, card_data, read_at = raw
+                try:
+                    readout = InputData.from_raw(
+                        RawCard(card_type, card_data, _decode_time(read_at)),
+                        reader_id=reader_id,
+                        reading_id=uuid.UUID(reading_id),
+                    )
+                except (ValueError, IndexError) as e:
+                    # a card memory we can't make sense of: the punches decoded when it was read will do
+                    log.warning(f"could not decode the card memory of readout {reading_id}: {e}")
+            if readout is None:
+                readout = InputData(
+                    card_id=card_id,
+                    start_time=_decode_time(start_time),
+                    finish_time=_decode_time(finish_time),
+                    punches=[(station, _decode_time(moment)) for station, moment in json.loads(punches)],
+                    reading_id=uuid.UUID(reading_id),
+                    reader_id=reader_id,
+                )
+            yield readout
+    finally:
+        connection.close()
+
+
+def replay_grades(
+    readouts: Iterable[InputData],
+    courses: Iterable[Course],
+    score_type: ScoreType = ScoreType.ANIMAL_O,
+) -> list[Grade]:
+    # regrade replayed readouts the same way the station grades a fresh card
+    index = CourseIndex(courses)
+    return [input_data.grade_against_closest(index, score_type) for input_data in readouts]
+
+
+if __name__ == "__main__":
+    # python -m easysnec.utils.journal [journal path]: rebuild and print every grade in a journal
+    journal_path = Path(sys.argv[1]) if len(sys.argv) > 1 else default_journal_path()
+    start = time.perf_counter()
+    grades = replay_grades(replay(journal_path), COURSES)
+    log.info(f"replayed {len(grades)} readouts in {time.perf_counter() - start:.3f}s")
+    for grade in grades:
+        print(grade.input_data.card_id, grade.course.course_name, grade.status.name, grade.score)
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import itertools
+import math
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass
+
+from .grading import Grade, SuccessStatus
+
+# Standings per course, kept sorted as grades come in so a results screen can ask for the top ten (or where one
+# runner stands) after every card without re-sorting everything.
+#
+# Each course keeps a sorted list of keys (-score, time, arrival). Higher score first, ties broken by the
+# faster time, and runners with the same score and time share a rank. A new grade is a binary search plus a
+# list insert (a memmove, which stays in the microseconds well past the number of runners at any event).
+#
+# A card that's read out again replaces its earlier readout, even if the new one matched a different course.
+
+_Key = tuple[float, float, int]
+
+
+@dataclass(frozen=True)
+class Standing:
+    rank: int
+    grade: Grade
+
+
+def elapsed_seconds(grade: Grade) -> float:
+    # course time, infinitely slow if there's no start or finish to take it from
+    start, finish = grade.input_data.start_time, grade.input_data.finish_time
+    if grade.status is SuccessStatus.INCOMPLETE or start is None or finish is None:
+        return math.inf
+    return (finish - start).total_seconds()
+
+
+class Leaderboard:
+    def __init__(self):
+        # course name -> sorted keys, and the grades in the same order
+        self._keys: dict[str, list[_Key]] = {}
+        self._grades: dict[str, list[Grade]] = {}
+        # card id -> (course name, key) of its current readout
+        self._cards: dict[int, tuple[str, _Key]] = {}
+        self._arrival = itertools.count()
+        # the grading thread adds, the gui reads
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    def courses(self) -> list[str]:
+        with self._lock:
+            return [course for course, keys in self._keys.items() if keys]
+
+    def add(self, grade: Grade) -> int:
+        # (re)place the card's readout, returns its rank on its course
+        course = grade.course.course_name
+        key = (-grade.score, elapsed_seconds(grade), next(self._arrival))
+        with self._lock:
+            self._remove(grade.input_data.card_id)
+            keys = self._keys.setdefault(course, [])
+            position = bisect_left(keys, key)
+            keys.insert(position, key)
+            self._grades.setdefault(course, []).insert(position, grade)
+            self._cards[grade.input_data.card_id] = (course, key)
+            return bisect_left(keys, key[:2]) + 1
+
+    def remove(self, card_id: int) -> Grade | None:
+        with self._lock:
+            return self._remove(card_id)
+
+    def rank(self, card_id: int) -> int | None:
+        # 1 is the best, tied runners share a rank. None if we haven't seen the card
+        with self._lock:
+            if card_id not in self._cards:
+                return None
+            course, key = self._cards[card_id]
+            return bisect_left(self._keys[course], key[:2]) + 1
+
+    def top(self, course: str, k: int) -> list[Standing]:
+        with self._lock:
+            keys = self._keys.get(course, [])
+            grades = self._grades.get(course, [])
+            standings = []
+            for i in range(min(k, len(keys))):
+                # a tie keeps the rank of the first runner with that score and time
+                tied = i and keys[i][:2] == keys[i - 1][:2]
+                standings.append(Standing(standings[-1].rank if tied else i + 1, grades[i]))
+            return standings
+
+    def _remove(self, card_id: int) -> Grade | None:
+        if card_id not in self._cards:
+            return None
+        course, key = self._cards.pop(card_id)
+        position = bisect_left(self._keys[course], key)
+        del self._keys[course][position]
+        return self._grades[course].pop(position)
+
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fastlog import log
+
+# Where does the time go between a card going into the station and its result on screen? Every stage of the
+# reader -> grading -> ui path records how long it took into a rolling window (the last WINDOW samples) and
+# bumps a few counters (readouts, exceptions, reconnects). Recording is a perf_counter and a deque append
+# under a lock, the percentiles are only worked out when someone looks: the periodic log summary, or the
+# optional localhost endpoint in Prometheus text format.
+#
+# Stages, in the order a card goes through them:
+#   read_sicard, ack_sicard            reader thread, serial i/o with the station
+#   queue_wait                         submit -> the grading thread picking the readout up
+#   match_course, grade                grading thread
+#   readout_to_grade                   submit -> graded and handed to on_grade
+#   ui_update                          gui thread, putting the grade in the results model
+
+WINDOW = 1024
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    def __init__(self, window: int = WINDOW):
+        self.samples: deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def quantiles(self) -> list[float]:
+        return _quantiles(self.samples)
+
+
+def _quantiles(samples) -> list[float]:
+    # nearest rank over the window
+    ordered = sorted(samples)
+    if not ordered:
+        return [0.0 for _ in QUANTILES]
+    return [ordered[min(int(q * len(ordered)), len(ordered) - 1)] for q in QUANTILES]
+
+
+class Metrics:
+    def __init__(self, window: int = WINDOW):
+        self.window = window
+        self.stages: dict[str, Histogram] = {}
+        self.counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram(self.window)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def count(self, counter: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def snapshot(self) -> tuple[dict[str, tuple[int, float, list[float]]], dict[str, int]]:
+        # ({stage: (count, total seconds, [p50, p95, p99])}, {counter: value})
+        with self._lock:
+            stages = {
+                stage: (histogram.count, histogram.total, list(histogram.samples))
+                for stage, histogram in self.stages.items()
+            }
+            counters = dict(self.counters)
+        # sort outside the lock, the recording threads shouldn't wait on us
+        return {
+            stage: (count, total, _quantiles(samples)) for stage, (count, total, samples) in stages.items()
+        }, counters
+
+    def summary(self) -> str:
+        stages, counters = self.snapshot()
+        parts = [
+            f"{stage} p50 {p50 * 1e3:.1f}ms p95 {p95 * 1e3:.1f}ms p99 {p99 * 1e3:.1f}ms (n={count})"
+            for stage, (count, _, (p50, p95, p99)) in stages.items()
+        ]
+        parts += [f"{counter}={value}" for counter, value in sorted(counters.items())]
+        return "; ".join(parts) or "nothing recorded yet"
+
+    def prometheus(self) -> str:
+        stages, counters = self.snapshot()
+        lines = [
+            "# HELP easysnec_stage_seconds time spent in each stage of the reader to ui path",
+            "# TYPE easysnec_stage_seconds summary",
+        ]
+        for stage, (count, total, values) in sorted(stages.items()):
+            for q, value in zip(QUANTILES, values):
+                lines.append(f'easysnec_stage_seconds{{stage="{stage}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'easysnec_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'easysnec_stage_seconds_count{{stage="{stage}"}} {count}')
+        for counter, value in sorted(counters.items()):
+            lines.append(f"# TYPE easysnec_{counter}_total counter")
+            lines.append(f"easysnec_{counter}_total {value}")
+        return "\n".join(lines) + "\n"
+
+
+# the station's metrics. readers, the pipeline and the gui all record into this one
+METRICS = Metrics()
+
+
+class MetricsServer:
+    # GET /metrics on localhost, Prometheus text format
+    def __init__(self, metrics: Metrics = METRICS, port: int = 9464, host: str = "127.0.0.1"):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # a scrape every few seconds doesn't belong in the log
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self) -> None:
+        self._thread.start()
+        log.info(f"metrics on http://127.0.0.1:{self.port}/metrics")
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class MetricsLogger:
+    # logs Metrics.summary() every interval seconds
+    def __init__(self, metrics: Metrics = METRICS, interval: float = 60):
+        self.metrics = metrics
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-logger", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            log.info(f"station health: {self.metrics.summary()}")
+
+
+def start_reporting(
+    port: int | None = None, interval: float = 60, metrics: Metrics = METRICS
+) -> list[MetricsServer | MetricsLogger]:
+    # the endpoint if there's a port, the log summary if there's an interval. stop() everything returned
+    reporters: list[MetricsServer | MetricsLogger] = []
+    if port is not None:
+        reporters.append(MetricsServer(metrics, port))
+    if interval > 0:
+        reporters.append(MetricsLogger(metrics, interval))
+    for reporter in reporters:
+        reporter.start()
+    return reporters
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import ctypes
+import os
+import select
+import struct
+import sys
+import threading
+from collections.abc import Callable, Iterable
+from enum import Enum
+
+from fastlog import log
+
+# Serial port hot-plug detection. On linux we watch /dev with inotify and only rescan the ports when a tty-ish
+# node is created or removed there (plugging in a reader shows up within a few ms, and an idle station does no
+# work at all). Everywhere else (or if inotify isn't available) we fall back to scanning every poll_interval.
+# Either way on_change is only called with a real diff: (added, removed).
+
+# inotify(7)
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+EVENT_HEADER = struct.Struct("iIII")
+
+# /dev names pyserial's linux scanner can report
+SERIAL_PREFIXES = ("tty", "rfcomm")
+
+# (vid, pid) of SPORTident's usb stations (a CP210x with SPORTident's own product id). when nobody picked the
+# ports to read from, only these are read, not a gps dongle or a modem that happens to be plugged in too
+SPORTIDENT_USB_IDS = frozenset({(0x10C4, 0x800A)})
+
+
+class WatchMode(Enum):
+    AUTO = 1  # inotify if we can, else poll
+    INOTIFY = 2
+    POLL = 3
+
+
+def list_serial_ports() -> list[str]:
+    # imported lazily, scanning is the expensive bit and importing it isn't free either
+    import serial.tools.list_ports
+
+    return sorted(port.device for port in serial.tools.list_ports.comports())
+
+
+def list_sportident_ports() -> list[str]:
+    # list_serial_ports, SPORTident stations only
+    import serial.tools.list_ports
+
+    return sorted(
+        port.device
+        for port in serial.tools.list_ports.comports()
+        if (port.vid, port.pid) in SPORTIDENT_USB_IDS
+    )
+
+
+def diff_ports(old: Iterable[str], new: Iterable[str]) -> tuple[list[str], list[str]]:
+    # (added, removed), each in sorted order
+    old, new = set(old), set(new)
+    return sorted(new - old), sorted(old - new)
+
+
+def _inotify_fd(directory: str) -> int | None:
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return None
+        mask = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ATTRIB
+        if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (AttributeError, OSError):
+        return None
+
+
+def _event_names(buffer: bytes) -> Iterable[str | None]:
+    # names of the nodes in a batch of inotify events. None means the queue overflowed, so anything could have
+    # changed
+    offset = 0
+    while offset + EVENT_HEADER.size <= len(buffer):
+        _, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+        offset += EVENT_HEADER.size
+        if mask & IN_Q_OVERFLOW:
+            yield None
+        else:
+            yield buffer[offset : offset + length].rstrip(b"\0").decode(errors="replace")
+        offset += length
+
+
+class PortWatcher:
+    def __init__(
+        self,
+        on_change: Callable[[list[str], list[str]], None],
+        list_ports: Callable[[], Iterable[str]] = list_serial_ports,
+        mode: WatchMode = WatchMode.AUTO,
+        poll_interval: float = 1.0,
+        watch_dir: str = "/dev",
+        settle_time: float = 0.05,
+    ):
+        self.on_change = on_change
+        self.list_ports = list_ports
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.watch_dir = watch_dir
+        # udev creates the node before it fixes up permissions and symlinks, give it a moment before scanning
+        self.settle_time = settle_time
+
+        self.ports: list[str] = []
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._fd: int | None = None
+
+    def start(self) -> list[str]:
+        # do the first scan right away (in the caller's thread) and return it, then watch in the background
+        if self.mode is not WatchMode.POLL:
+            self._fd = _inotify_fd(self.watch_dir)
+            if self._fd is None:
+                if self.mode is WatchMode.INOTIFY:
+                    raise OSError(f"could not watch {self.watch_dir} with inotify")
+                log.info("no inotify here, polling for serial ports")
+
+        self.ports = sorted(self.list_ports())
+        self._thread = threading.Thread(target=self._watch, name="port-watcher", daemon=True)
+        self._thread.start()
+        return self.ports
+
+    @property
+    def active_mode(self) -> WatchMode:
+        return WatchMode.INOTIFY if self._fd is not None else WatchMode.POLL
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def rescan(self) -> None:
+        ports = sorted(self.list_ports())
+        added, removed = diff_ports(self.ports, ports)
+        self.ports = ports
+        if added or removed:
+            self.on_change(added, removed)
+
+    def _watch(self) -> None:
+        while not self._stop.is_set():
+            if self._fd is None:
+                if not self._stop.wait(self.poll_interval):
+                    self._rescan_safely()
+                continue
+
+            # wake up now and then to check the stop flag, an idle /dev means we sleep here the whole time
+            readable, _, _ = select.select([self._fd], [], [], 0.25)
+            if not readable or not self._drain():
+                continue
+            if not self._stop.wait(self.settle_time):
+                self._drain()
+                self._rescan_safely()
+
+    def _drain(self) -> bool:
+        # read all pending events, returns whether any of them could be a serial port
+        relevant = False
+        while True:
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return relevant
+            if not buffer:
+                return relevant
+            for name in _event_names(buffer):
+                if name is None or name.startswith(SERIAL_PREFIXES):
+                    relevant = True
+
+    def _rescan_safely(self) -> None:
+        try:
+            self.rescan()
+        except OSError as e:
+            log.error(f"could not list serial ports: {e}")
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import itertools
+import pstats
+import threading
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from fastlog import log
+
+# Opt-in profiling for a station that got slow halfway through an event (easysnec --profile DIR, or
+# EASYSNEC_PROFILE=DIR). The reader loop (reading and acking a card, not the idle wait) and grading run under
+# cProfile, one call in `sample`. tracemalloc follows every allocation.
+#
+# There is one profile for the whole process and only one sample runs at a time: from python 3.12 cProfile sits
+# on the process-wide sys.monitoring, so a second profile enabled while another is running raises ValueError. A
+# sampled call that finds the profile busy (another thread's sample, or some other profiling tool) just isn't
+# profiled.
+# Every `every_readouts` readouts or `every_seconds`, whichever comes first, both are written to DIR
+# (profile-<time>.pstats, memory-<time>.tracemalloc) and only the newest `keep` of each are kept. The profiles
+# are cumulative, so diffing two snapshots shows what ran (and what got allocated) in between:
+#
+#   easysnec profile-diff DIR/profile-a.pstats DIR/profile-b.pstats
+#   easysnec profile-diff DIR/memory-a.tracemalloc DIR/memory-b.tracemalloc
+#
+# Switched off (the default) profile() is a counter check and nothing else.
+
+
+@dataclass(frozen=True)
+class ProfileConfig:
+    directory: Path
+    every_readouts: int = 500
+    every_seconds: float = 15 * 60
+    # profile one call in this many
+    sample: int = 10
+    # snapshots of each kind kept on disk
+    keep: int = 10
+    # stack depth tracemalloc records per allocation, 0 turns memory tracing off
+    memory_frames: int = 1
+
+
+class Profiler:
+    def __init__(self):
+        self.config: ProfileConfig | None = None
+        self._calls = itertools.count()
+        self._profile = cProfile.Profile()
+        # held while the profile is enabled
+        self._active = threading.Lock()
+        self._lock = threading.Lock()
+        self._readouts = 0
+        self._last_snapshot = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.config is not None
+
+    def start(self, config: ProfileConfig) -> None:
+        config.directory.mkdir(parents=True, exist_ok=True)
+        if config.memory_frames:
+            tracemalloc.start(config.memory_frames)
+        self._last_snapshot = time.monotonic()
+        self.config = config
+        log.info(f"profiling to {config.directory} (1 in {config.sample} calls)")
+
+    def stop(self) -> None:
+        # one last snapshot, then back to doing nothing
+        if self.config is None:
+            return
+        self.snapshot()
+        if self.config.memory_frames:
+            tracemalloc.stop()
+        self.config = None
+        with self._active:
+            self._profile = cProfile.Profile()
+
+    @contextmanager
+    def profile(self) -> Iterator[None]:
+        config = self.config
+        if config is None or next(self._calls) % config.sample:
+            yield
+            return
+        if not self._active.acquire(blocking=False):
+            # another thread's sample is running
+            yield
+            return
+        try:
+            try:
+                self._profile.enable()
+            except ValueError:
+                # another profiler (or debugger) has sys.monitoring's profiler slot
+                yield
+                return
+            try:
+                yield
+            finally:
+                self._profile.disable()
+        finally:
+            self._active.release()
+
+    def readout_done(self) -> None:
+        # call once per readout. writes a snapshot when one is due
+        config = self.config
+        if config is None:
+            return
+        with self._lock:
+            self._readouts += 1
+            due = (
+                self._readouts % config.every_readouts == 0
+                or time.monotonic() - self._last_snapshot >= config.every_seconds
+            )
+        if due:
+            self.snapshot()
+
+    def snapshot(self) -> list[Path]:
+        config = self.config
+        if config is None:
+            return []
+        self._last_snapshot = time.monotonic()
+        stamp = time.strftime("%Y%m%d-%H%M%S") + f"-{time.time_ns() % 1_000_000_000:09d}"
+        written = []
+
+        with self._active:
+            # Stats refuses a profile that never ran anything
+            try:
+                stats = pstats.Stats(self._profile, stream=io.StringIO())
+            except TypeError:
+                stats = None
+        if stats is not None:
+            path = config.directory / f"profile-{stamp}.pstats"
+            stats.dump_stats(path)
+            written.append(path)
+        if config.memory_frames and tracemalloc.is_tracing():
+            path = config.directory / f"memory-{stamp}.tracemalloc"
+            tracemalloc.take_snapshot().dump(str(path))
+            written.append(path)
+
+        for pattern in ("profile-*.pstats", "memory-*.tracemalloc"):
+            for old in sorted(config.directory.glob(pattern))[: -config.keep]:
+                old.unlink(missing_ok=True)
+        log.info(f"wrote profiling snapshot {stamp} to {config.directory}")
+        return written
+
+
+# the station's profiler, off unless --profile / EASYSNEC_PROFILE turns it on
+PROFILER = Profiler()
+
+
+def diff_snapshots(old: Path | str, new: Path | str, limit: int = 25) -> str:
+    # what changed between two snapshots of the same kind, biggest changes first
+    old, new = Path(old), Path(new)
+    if old.suffix != new.suffix:
+        raise ValueError(f"can't compare a {old.suffix} snapshot with a {new.suffix} one")
+
+    if new.suffix == ".tracemalloc":
+        differences = tracemalloc.Snapshot.load(str(new)).compare_to(tracemalloc.Snapshot.load(str(old)), "lineno")
+        lines = [f"top {limit} allocation changes, {old.name} -> {new.name}"]
+        lines += [str(difference) for difference in differences[:limit]]
+        return "\n".join(lines)
+
+    before = pstats.Stats(str(old), stream=io.StringIO()).stats  # ty: ignore[unresolved-attribute]
+    after = pstats.Stats(str(new), stream=io.StringIO()).stats  # ty: ignore[unresolved-attribute]
+    rows = []
+    for function, (_, calls, own, cumulative, _) in after.items():
+        _, old_calls, old_own, old_cumulative, _ = before.get(function, (0, 0, 0.0, 0.0, {}))
+        rows.append((own - old_own, cumulative - old_cumulative, calls - old_calls, function))
+    rows.sort(key=lambda row: abs(row[0]), reverse=True)
+
+    lines = [
+        f"top {limit} functions by change in own time, {old.name} -> {new.name}",
+        f"{'own s':>10} {'cumul s':>10} {'calls':>9}  function",
+    ]
+    for own, cumulative, calls, (filename, line, name) in rows[:limit]:
+        lines.append(f"{own:>+10.4f} {cumulative:>+10.4f} {calls:>+9d}  {name} ({filename}:{line})")
+    return "\n".join(lines)
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import datetime as dt
+from array import array
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+from sportident import SIReader
+
+# The memory of an SI card exactly as the station read it out. Readers keep it instead of decoding the whole
+# card on the spot, and the journal stores it, so a readout can always be decoded again, by a decoder with a
+# bug fixed.
+#
+# Most of what happens to a readout only needs the card number, start, finish and which controls were punched.
+# Those come out of the raw memory here without touching the punch times: station_codes() walks the punch
+# records and reads one byte of each. punches() adds the times, for when they're wanted (InputData.punches asks
+# for them the first time someone reads them). Both give exactly what sportident's SIReader._decode_carddata
+# does, but times are worked out in integer microseconds instead of a timedelta per step, which made
+# sportident's decoder most of the cost of a readout. decode() is sportident's, for the rest of the card.
+
+# sportident resolves a card's 12h times to the latest matching moment before the read plus this much (it uses
+# now, which for a live read is when it was read)
+REFTIME_MARGIN = dt.timedelta(hours=2)
+
+_SECOND = 1_000_000
+_NOON = 12 * 3600 * _SECOND
+_DAY = 24 * 3600 * _SECOND
+
+
+@dataclass(frozen=True)
+class RawCard:
+    card_type: str  # sportident's name for it: SI5, SI6, SI8, SI9, SI10, SIpCard, SItCard
+    data: bytes  # the memory blocks, laid out the way SIReader._decode_carddata expects them
+    read_at: dt.datetime
+
+    @property
+    def reftime(self) -> dt.datetime:
+        return self.read_at + REFTIME_MARGIN
+
+
+class _Clock:
+    # SIReader._decode_time, for every time on one card: what it needs of the reference time, worked out once
+    def __init__(self, reftime: dt.datetime):
+        self.day = reftime.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+        self.weekday = reftime.weekday()
+        self.seconds = reftime.hour * 3600 + reftime.minute * 60 + reftime.second
+        self.micro = self.seconds * _SECOND + reftime.microsecond
+
+    def micros(self, data: bytes, at: int, ptd: int | None, subsecond: int | None = None) -> int | None:
+        # the 12h time at data[at:at+2] as microseconds after self.day. None if it was reset
+        high, low = data[at], data[at + 1]
+        if high == 0xEE and low == 0xEE:
+            return None
+        seconds = high << 8 | low
+        if ptd is None:
+            # no day byte (SI5): the closest 12h time before reftime
+            punch = seconds * _SECOND
+            if self.micro < _NOON:
+                return punch if punch < self.micro else punch - _NOON
+            return punch + _NOON if punch < self.micro - _NOON else punch
+
+        if ptd & 1:
+            # pm
+            seconds += 12 * 3600
+        # bits 3..1 are the day of the week, sunday = 0
+        day = (((ptd & 0b1110) >> 1) - 1) % 7
+        if day == self.weekday and seconds > self.seconds:
+            days_back = 7
+        else:
+            days_back = (self.weekday - day) % 7
+        # start and finish have a 1/256 s byte, sportident keeps whole milliseconds of it
+        milliseconds = subsecond * 1000 // 256 if subsecond else 0
+        return seconds * _SECOND - days_back * _DAY + milliseconds * 1000
+
+    def moment(self, micros: int | None) -> dt.datetime | None:
+        return None if micros is None else self.day + dt.timedelta(microseconds=micros)
+
+
+def _layout(raw: RawCard) -> dict:
+    try:
+        return SIReader.CARD[raw.card_type]
+    except KeyError:
+        raise ValueError(f"unknown card type {raw.card_type!r}") from None
+
+
+def card_number(raw: RawCard) -> int:
+    layout, data = _layout(raw), raw.data
+    return SIReader._decode_cardnr(bytes((0, data[layout["CN2"]], data[layout["CN1"]], data[layout["CN0"]])))
+
+
+def start_finish(raw: RawCard) -> tuple[dt.datetime | None, dt.datetime | None]:
+    layout, data, clock = _layout(raw), raw.data, _Clock(raw.reftime)
+    std, ftd = layout["STD"], layout["FTD"]
+    start = clock.micros(data, layout["ST"], data[std] if std else None, data[std + 1] if std else None)
+    finish = clock.micros(
+        data, layout["FT"], data[ftd] if ftd is not None else None, data[ftd + 1] if ftd else None
+    )
+    return clock.moment(start), clock.moment(finish)
+
+
+def _punch_records(raw: RawCard, layout: dict) -> Iterator[int]:
+    # where each punch record starts, walked the way SIReader._decode_carddata does it
+    data = raw.data
+    count = data[layout["RC"]]
+    if raw.card_type == "SI5":
+        # RC is the index of the next punch on SI5
+        count -= 1
+    count = min(count, layout["PM"])
+    record = layout["P1"]
+    if raw.card_type == "SI10" and len(data) == 128 * 8:
+        # all 8 blocks were read, skip the 3 with personal data
+        record += 128 * 3
+    for _ in range(count):
+        if raw.card_type == "SI5" and record % 16 == 0:
+            # first byte of each SI5 block belongs to punches 31-36
+            record += 1
+        yield record
+        record += layout["PL"]
+
+
+def station_codes(raw: RawCard) -> array:
+    # the controls of every punch punches() gives, nothing else. a punch whose time was reset (0xEEEE) is left
+    # out, like sportident does
+    layout, data = _layout(raw), raw.data
+    control, time_high = layout["CN"], layout["PTH"]
+    return array(
+        "H",
+        [
+            data[record + control]
+            for record in _punch_records(raw, layout)
+            if data[record + time_high] != 0xEE or data[record + time_high + 1] != 0xEE
+        ],
+    )
+
+
+def punches(raw: RawCard) -> list[tuple[int, dt.datetime]]:
+    layout, data, clock = _layout(raw), raw.data, _Clock(raw.reftime)
+    control, time_high, day = layout["CN"], layout["PTH"], layout["PTD"]
+    result = []
+    for record in _punch_records(raw, layout):
+        micros = clock.micros(data, record + time_high, None if day is None else data[record + day])
+        if micros is not None:
+            result.append((data[record + control], clock.moment(micros)))
+    return result
+
+
+def decode(raw: RawCard) -> dict:
+    # sportident's full decode (check and clear times too), what SIReaderReadout.read_sicard would have returned
+    _layout(raw)
+    return SIReader._decode_carddata(raw.data, raw.card_type, raw.reftime)
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+
+from .grading import Grade, InputData
+
+# Kids dip the same card at the download station over and over. A repeat readout has a new reading_id but the
+# same card and the same punches, so instead of matching a course and grading it again we hand back the grade
+# of the first readout (reading_id and all). Bounded LRU, keyed by card id + punch fingerprint + whatever
+# else the grade depends on (the score type). Clear it when the course set changes.
+
+
+class ReadoutCache:
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._grades: OrderedDict[tuple, Grade] = OrderedDict()
+        # readers look up, the grading thread stores
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._grades)
+
+    @staticmethod
+    def key(input_data: InputData, context: Hashable = None) -> tuple:
+        return (input_data.card_id, input_data.fingerprint(), context)
+
+    def __contains__(self, key: tuple) -> bool:
+        # a peek: doesn't count as a hit or a miss, or make the entry the most recent
+        with self._lock:
+            return key in self._grades
+
+    def get(self, input_data: InputData, context: Hashable = None) -> Grade | None:
+        key = self.key(input_data, context)
+        with self._lock:
+            grade = self._grades.get(key)
+            if grade is None:
+                self.misses += 1
+                return None
+            self._grades.move_to_end(key)
+            self.hits += 1
+            return grade
+
+    def put(self, input_data: InputData, grade: Grade, context: Hashable = None) -> None:
+        key = self.key(input_data, context)
+        with self._lock:
+            self._grades[key] = grade
+            self._grades.move_to_end(key)
+            while len(self._grades) > self.maxsize:
+                self._grades.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._grades.clear()
+
+    def stats(self) -> str:
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0
+        return f"{self.hits} hits, {self.misses} misses ({rate:.0%}), {len(self)} cached"
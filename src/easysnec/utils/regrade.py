@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import datetime as dt
+import os
+from array import array
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import NamedTuple
+
+import numpy as np
+
+from .course_index import CourseIndex
+from .grading import (
+    Course,
+    Grade,
+    GradeBatch,
+    InputData,
+    ScoreType,
+    SuccessStatus,
+    grade_many,
+)
+
+# Regrading an archive (a season of journals, or every readout again after a course got fixed) on every core.
+# The readouts are cut into chunks of chunk_size and the chunks spread over a process pool. Each worker gets the
+# course table once, already built into a CourseIndex, when it starts (the pool initializer), so after that a
+# chunk only carries readouts there and answers back. And only what grading looks at: station codes, start and
+# finish of each readout there; course number, status, score, missed and extra controls back. The readouts
+# themselves never leave this process and come out as Grades, in the order they went in, with those answers
+# already cached on them.
+#
+# Results stream. At most two chunks per worker are out at a time, so readouts can come from a generator
+# (journal.replay) and grades go straight on to a writer without the archive ever being in memory at once.
+# workers=1 grades the chunks right here, without a pool.
+
+CHUNK_SIZE = 2000
+
+
+class _Card(NamedTuple):
+    # the part of an InputData grade_many reads
+    station_codes: array
+    start_time: dt.datetime | None
+    finish_time: dt.datetime | None
+
+
+# (course number, status, score, missed, extra) for every card of a chunk
+_Answers = tuple[list[int], list[SuccessStatus], list[float], list[list[str]], list[list[str]]]
+
+
+class _Grader:
+    def __init__(self, index: CourseIndex, score_type: ScoreType):
+        self.index = index
+        self.score_type = score_type
+        self._numbers = {id(course): i for i, course in enumerate(index.courses)}
+
+    def __call__(self, cards: list[tuple]) -> _Answers:
+        # plain (station codes, start, finish) tuples, they're cheaper to make and to pickle than _Cards
+        readouts = [_Card(*card) for card in cards]
+        batch = grade_many(readouts, self.index, self.score_type)  # ty: ignore[invalid-argument-type]
+        return (
+            [self._numbers[id(course)] for course in batch.courses],
+            batch.status,
+            batch.score.tolist(),
+            batch.missed_checkpoints,
+            batch.extra_checkpoints,
+        )
+
+
+# each worker process's grader, set up by _start_worker
+_grader: _Grader | None = None
+
+
+def _start_worker(index: CourseIndex, score_type: ScoreType) -> None:
+    global _grader
+    _grader = _Grader(index, score_type)
+
+
+def _grade_chunk(cards: list[tuple]) -> _Answers:
+    assert _grader is not None
+    return _grader(cards)
+
+
+def _cards(chunk: list[InputData]) -> list[tuple]:
+    return [(readout.station_codes, readout.start_time, readout.finish_time) for readout in chunk]
+
+
+def _chunks(readouts: Iterable[InputData], size: int) -> Iterator[list[InputData]]:
+    readouts = iter(readouts)
+    while chunk := list(islice(readouts, size)):
+        yield chunk
+
+
+def _grades(
+    chunk: list[InputData], answers: _Answers, index: CourseIndex, score_type: ScoreType
+) -> Iterator[Grade]:
+    numbers, status, score, missed, extra = answers
+    batch = GradeBatch(
+        courses=[index.courses[number] for number in numbers],
+        status=status,
+        score=np.asarray(score, dtype=np.float64),
+        missed_checkpoints=missed,
+        extra_checkpoints=extra,
+    )
+    return batch.grades(chunk, score_type)
+
+
+def regrade(
+    readouts: Iterable[InputData],
+    courses: Iterable[Course] | CourseIndex,
+    score_type: ScoreType = ScoreType.ANIMAL_O,
+    workers: int | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[Grade]:
+    # every readout graded against its closest course, like the station does, on `workers` processes (default:
+    # one per core). grades come out in the same order as the readouts
+    index = courses if isinstance(courses, CourseIndex) else CourseIndex(courses)
+    if not index.courses:
+        raise ValueError("can't regrade against no courses")
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be at least 1, not {chunk_size}")
+    # checked here, not on the first next()
+    return _regrade(readouts, index, score_type, workers or os.cpu_count() or 1, chunk_size)
+
+
+def _regrade(
+    readouts: Iterable[InputData], index: CourseIndex, score_type: ScoreType, workers: int, chunk_size: int
+) -> Iterator[Grade]:
+    if workers == 1:
+        grader = _Grader(index, score_type)
+        for chunk in _chunks(readouts, chunk_size):
+            yield from _grades(chunk, grader(_cards(chunk)), index, score_type)
+        return
+
+    pool = ProcessPoolExecutor(workers, initializer=_start_worker, initargs=(index, score_type))
+    pending: deque[tuple[list[InputData], Future[_Answers]]] = deque()
+    try:
+        for chunk in _chunks(readouts, chunk_size):
+            pending.append((chunk, pool.submit(_grade_chunk, _cards(chunk))))
+            if len(pending) >= 2 * workers:
+                done, answers = pending.popleft()
+                yield from _grades(done, answers.result(), index, score_type)
+        while pending:
+            done, answers = pending.popleft()
+            yield from _grades(done, answers.result(), index, score_type)
+    finally:
+        # also when the caller stops early: nothing more gets graded
+        pool.shutdown(cancel_futures=True)
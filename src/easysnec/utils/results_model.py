@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import uuid
+from collections.abc import Iterable
+from typing import ClassVar
+
+from PySide6.QtCore import (
+    Property,
+    QAbstractListModel,
+    QByteArray,
+    QModelIndex,
+    QPersistentModelIndex,
+    Qt,
+    Signal,
+    Slot,
+)
+
+from .grading import Grade, SuccessStatus
+from .splits import SplitAnalysis
+
+# Every grade of the session as a list model for qml. Rows are only ever appended, each one with its own
+# beginInsertRows / endInsertRows, so a ListView only creates a delegate for the new row (and with reuseItems it
+# recycles the ones scrolled out of view), no matter how many thousand results are already in there.
+#
+# A card dipped again comes back from the pipeline as the grade it already has. That isn't a new row: its row
+# becomes `latest` again, so the big feedback display shows it once more.
+
+IMAGES = {
+    SuccessStatus.SUCCESS: "./resources/glassy-smiley-good-green.png",
+    SuccessStatus.MISSES: "./resources/glassy-smiley-bad.png",
+    SuccessStatus.INCOMPLETE: "./resources/glassy-smiley-surprised.png",
+}
+FEEDBACK = {
+    SuccessStatus.SUCCESS: "",
+    SuccessStatus.MISSES: "Try again!",
+    SuccessStatus.INCOMPLETE: "",
+}
+
+
+def _elapsed(grade: Grade) -> str:
+    start, finish = grade.input_data.start_time, grade.input_data.finish_time
+    if grade.status is SuccessStatus.INCOMPLETE or start is None or finish is None:
+        return ""
+    minutes, seconds = divmod(int((finish - start).total_seconds()), 60)
+    return f"{minutes}:{seconds:02}"
+
+
+def _legs(grade: Grade, time_lost: list[float | None]) -> str:
+    # "31 1:02 +10  33 0:45 -3 ... F 0:20": each leg by the control it ends at, its time, and how many seconds
+    # it was behind the leg's median when the card came in
+    parts = []
+    for leg, lost in zip(grade.legs, time_lost):
+        if leg.seconds is None:
+            continue
+        minutes, seconds = divmod(round(leg.seconds), 60)
+        part = f"{'F' if leg.to_control is None else leg.to_control} {minutes}:{seconds:02}"
+        parts.append(part if lost is None else f"{part} {round(lost):+d}")
+    return "  ".join(parts)
+
+
+class ResultsModel(QAbstractListModel):
+    CardIdRole = Qt.ItemDataRole.UserRole + 1
+    ReaderIdRole = Qt.ItemDataRole.UserRole + 2
+    CourseRole = Qt.ItemDataRole.UserRole + 3
+    StatusRole = Qt.ItemDataRole.UserRole + 4
+    TimeRole = Qt.ItemDataRole.UserRole + 5
+    ImagePathRole = Qt.ItemDataRole.UserRole + 6
+    FeedbackRole = Qt.ItemDataRole.UserRole + 7
+    ScoringOutputRole = Qt.ItemDataRole.UserRole + 8
+    SplitsRole = Qt.ItemDataRole.UserRole + 9
+
+    ROLE_NAMES: ClassVar[dict[int, bytes]] = {
+        CardIdRole: b"cardId",
+        ReaderIdRole: b"readerId",
+        CourseRole: b"course",
+        StatusRole: b"status",
+        TimeRole: b"time",
+        ImagePathRole: b"imagePath",
+        FeedbackRole: b"feedbackMessage",
+        ScoringOutputRole: b"scoringOutput",
+        SplitsRole: b"splits",
+    }
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._grades: list[Grade] = []
+        # reading_id -> row, to spot a repeat
+        self._rows: dict[uuid.UUID, int] = {}
+        # the row `latest` shows: the newest, or the one dipped again since
+        self._latest = -1
+        # the grading pipeline's leg statistics, for legStats(). the backend hands it in
+        self.split_analysis: SplitAnalysis | None = None
+
+    def rowCount(self, parent: QModelIndex | QPersistentModelIndex | None = None):
+        # flat list, only the invisible root has children
+        return 0 if parent is not None and parent.isValid() else len(self._grades)
+
+    def roleNames(self):
+        return {role: QByteArray(name) for role, name in self.ROLE_NAMES.items()}
+
+    def data(self, index: QModelIndex | QPersistentModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._grades):
+            return None
+        grade = self._grades[index.row()]
+        match role:
+            case ResultsModel.CardIdRole:
+                return grade.input_data.card_id
+            case ResultsModel.ReaderIdRole:
+                return grade.input_data.reader_id or ""
+            case ResultsModel.CourseRole:
+                return grade.course.course_name
+            case ResultsModel.StatusRole:
+                return grade.status.name
+            case ResultsModel.TimeRole:
+                return _elapsed(grade)
+            case ResultsModel.ImagePathRole:
+                return IMAGES[grade.status]
+            case ResultsModel.FeedbackRole:
+                return FEEDBACK[grade.status]
+            case ResultsModel.ScoringOutputRole | Qt.ItemDataRole.DisplayRole:
+                return grade.scoring_output
+            case ResultsModel.SplitsRole:
+                if self.split_analysis is None:
+                    return _legs(grade, [None] * len(grade.legs))
+                return _legs(grade, self.split_analysis.time_lost(grade))
+        return None
+
+    def grade(self, row: int) -> Grade:
+        return self._grades[row]
+
+    @Slot(str, result=list)
+    def legStats(self, course: str) -> list:
+        # every leg of the course so far, start to finish: {from, to, count, mean, stdev, q25, median, q75}
+        # (seconds, from/to null for the start/finish)
+        if self.split_analysis is None:
+            return []
+        return [
+            {
+                "from": leg.from_control,
+                "to": leg.to_control,
+                "count": leg.count,
+                "mean": leg.mean,
+                "stdev": leg.stdev,
+                **{("median" if q == 0.5 else f"q{round(q * 100)}"): value for q, value in leg.quantiles.items()},
+            }
+            for leg in self.split_analysis.legs(course)
+        ]
+
+    @Slot(object)
+    def append(self, grade: Grade):
+        repeat = self._rows.get(grade.input_data.reading_id)
+        if repeat is not None:
+            self._latest = repeat
+            self.latestChanged.emit()
+            return
+        row = len(self._grades)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._grades.append(grade)
+        self._rows[grade.input_data.reading_id] = self._latest = row
+        self.endInsertRows()
+        self.countChanged.emit(len(self._grades))
+        self.latestChanged.emit()
+
+    def extend(self, grades: Iterable[Grade]):
+        # one insert for a whole batch (the journal replay on startup)
+        grades = list(grades)
+        if not grades:
+            return
+        row = len(self._grades)
+        self.beginInsertRows(QModelIndex(), row, row + len(grades) - 1)
+        self._grades.extend(grades)
+        for index, grade in enumerate(grades, row):
+            self._rows[grade.input_data.reading_id] = index
+        self._latest = len(self._grades) - 1
+        self.endInsertRows()
+        self.countChanged.emit(len(self._grades))
+        self.latestChanged.emit()
+
+    # --- count property (r)
+    def get_count(self):
+        return len(self._grades)
+
+    countChanged = Signal(int)
+    count = Property(int, get_count, notify=countChanged)  # ty: ignore[invalid-argument-type]
+
+    # --- latest property (r). the newest row by role name, for the big feedback display
+    def get_latest(self):
+        if not self._grades:
+            return {
+                "imagePath": "./resources/glassy-smiley-late.png",
+                "feedbackMessage": "",
+                "scoringOutput": "",
+            }
+        index = self.index(self._latest)
+        return {name.decode(): self.data(index, role) for role, name in self.ROLE_NAMES.items()}
+
+    # no payload: qml rereads the property anyway, and emitting a dict through a QVariantMap signal leaks
+    # references in pyside
+    latestChanged = Signal()
+    latest = Property("QVariantMap", get_latest, notify=latestChanged)  # ty: ignore[invalid-argument-type]
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import math
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, NamedTuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .grading import Course, InputData
+
+# Score-O: visit as many controls as you can, in any order, within the time limit. Every control is worth its
+# value (1 unless the course says otherwise), visiting one twice counts once, and each started minute over the
+# time limit costs penalty_per_minute points (the total never goes below 0).
+#
+# A course is compiled once into a bit per distinct control and a table of points per byte of the mask. score_many
+# scores a whole batch with numpy: every punch becomes its control's bit, each readout's bits are OR-ed into one
+# uint64 and the points are summed a byte at a time (courses of more than 64 controls fall back to one card at a
+# time). One card at a time, a set intersection in C is quicker than any per-punch python loop, so score() builds
+# the mask from the visited controls instead.
+
+# compiled courses, by id(course). Course holds lists so it can't be a dict key itself
+_compiled: dict[int, tuple[Course, ScoreOCourse]] = {}
+_COMPILED_LIMIT = 4096
+
+
+class ScoreOResult(NamedTuple):
+    visited: int  # bitmask, bit i is ScoreOCourse.controls[i]
+    points: int
+    penalty: float
+
+    @property
+    def score(self) -> float:
+        return max(self.points - self.penalty, 0)
+
+
+class ScoreOCourse:
+    def __init__(self, course: Course):
+        self.course = course
+        self.controls: list[int] = list(dict.fromkeys(course.stations))
+        self.bits: dict[int, int] = {station: 1 << i for i, station in enumerate(self.controls)}
+        self._controls = frozenset(self.controls)
+        values = course.control_values or {}
+        self.values: list[int] = [values.get(station, 1) for station in self.controls]
+        self._value_of = dict(zip(self.controls, self.values))
+        self.time_limit = course.time_limit.total_seconds() if course.time_limit is not None else None
+        self.penalty_per_minute = course.penalty_per_minute
+
+        # byte_points[k][b]: points for the controls behind the set bits of b, in byte k of the mask
+        self.byte_points: list[list[int]] = []
+        for k in range(0, len(self.values), 8):
+            chunk = self.values[k : k + 8] + [0] * 8
+            table = [0] * 256
+            for b in range(1, 256):
+                # the table without b's lowest bit, plus the value of that bit
+                low = b & -b
+                table[b] = table[b ^ low] + chunk[low.bit_length() - 1]
+            self.byte_points.append(table)
+        self._uniform = all(value == 1 for value in self.values)
+
+        # lookup table for score_many: station code -> bit index, -1 if it's not on the course. the last entry
+        # stands in for every code above the course's highest
+        self._bit_index = np.full(max(self.controls, default=0) + 2, -1, dtype=np.int16)
+        self._bit_index[self.controls] = np.arange(len(self.controls), dtype=np.int16)
+
+    def visited(self, stations: Sequence[int]) -> int:
+        # the bits are disjoint, so adding them up is OR-ing them
+        return sum(map(self.bits.__getitem__, self._controls.intersection(stations)))
+
+    def points(self, mask: int) -> int:
+        if self._uniform:
+            return mask.bit_count()
+        total = 0
+        for table in self.byte_points:
+            total += table[mask & 0xFF]
+            mask >>= 8
+        return total
+
+    def penalty(self, elapsed: float | None) -> float:
+        # elapsed in seconds, None if we don't know (no penalty then, the status says INCOMPLETE anyway)
+        if self.time_limit is None or elapsed is None or elapsed <= self.time_limit:
+            return 0
+        return math.ceil((elapsed - self.time_limit) / 60) * self.penalty_per_minute
+
+    def score(self, input_data: InputData) -> ScoreOResult:
+        # a set intersection in C beats OR-ing bits punch by punch in python, the mask is built from what's left
+        visited = self._controls.intersection(input_data.station_codes)
+        points = len(visited) if self._uniform else sum(map(self._value_of.__getitem__, visited))
+        penalty = 0 if self.time_limit is None else self.penalty(_elapsed(input_data))
+        return ScoreOResult(sum(map(self.bits.__getitem__, visited)), points, penalty)
+
+    def total(self, input_data: InputData) -> float:
+        # just score(input_data).score, for the hot path that doesn't want the mask
+        visited = self._controls.intersection(input_data.station_codes)
+        points = len(visited) if self._uniform else sum(map(self._value_of.__getitem__, visited))
+        if self.time_limit is None:
+            return points
+        return max(points - self.penalty(_elapsed(input_data)), 0)
+
+    def score_many(self, readouts: Sequence[InputData]) -> np.ndarray:
+        # score for every readout, same as [self.score(r).score for r in readouts]
+        stations, elapsed = punch_table(readouts)
+        return self.score_table(stations, elapsed)
+
+    def score_table(self, stations: np.ndarray, elapsed: np.ndarray) -> np.ndarray:
+        # score_many for readouts already laid out by punch_table (grade_many has them like that anyway):
+        # stations[i] are readout i's punches padded with -1, elapsed[i] its seconds, nan if it has no time
+        return np.maximum(self.points_table(stations) - self.penalty_table(elapsed), 0)
+
+    def points_table(self, stations: np.ndarray) -> np.ndarray:
+        # points before penalties for every row of stations
+        if len(self.controls) > 64:
+            return np.fromiter(
+                (
+                    sum(map(self._value_of.__getitem__, self._controls.intersection(row)))
+                    for row in stations.tolist()
+                ),
+                dtype=np.int64,
+                count=len(stations),
+            )
+
+        # -1 and every code above the course's highest land on the lookup table's last entry, -1
+        last = len(self._bit_index) - 1
+        index = self._bit_index[np.where(stations < 0, last, np.minimum(stations, last))]
+        bits = np.where(index >= 0, np.left_shift(np.uint64(1), index.clip(0).astype(np.uint64)), np.uint64(0))
+        masks = np.bitwise_or.reduce(bits, axis=1)
+
+        points = np.zeros(len(stations), dtype=np.int64)
+        for k, table in enumerate(self.byte_points):
+            points += np.asarray(table, dtype=np.int64)[(masks >> np.uint64(8 * k)) & np.uint64(0xFF)]
+        return points
+
+    def penalty_table(self, elapsed: np.ndarray) -> np.ndarray:
+        # penalty() for every entry of elapsed (nan: no penalty)
+        penalty = np.zeros(len(elapsed), dtype=np.float64)
+        if self.time_limit is not None:
+            late = elapsed > self.time_limit
+            penalty[late] = np.ceil((elapsed[late] - self.time_limit) / 60) * self.penalty_per_minute
+        return penalty
+
+
+def punch_table(readouts: Sequence[InputData]) -> tuple[np.ndarray, np.ndarray]:
+    # every readout's punches as one row of a (readouts, most punches) array, padded with -1 (never a real
+    # station), and each readout's elapsed seconds (nan without a start or finish), like _elapsed
+    n = len(readouts)
+    codes = [readout.station_codes for readout in readouts]
+    lengths = np.fromiter(map(len, codes), dtype=np.int64, count=n)
+    stations = np.full((n, int(lengths.max(initial=0))), -1, dtype=np.int32)
+    stations[np.arange(stations.shape[1]) < lengths[:, None]] = np.frombuffer(
+        b"".join(code.tobytes() for code in codes), dtype=np.uint16
+    )
+
+    # one pass over the datetimes (turning them into datetime64 first is slower than subtracting them here)
+    elapsed = np.fromiter(
+        (
+            (finish - start).total_seconds()
+            if (finish := readout.finish_time) is not None and (start := readout.start_time) is not None
+            else math.nan
+            for readout in readouts
+        ),
+        dtype=np.float64,
+        count=n,
+    )
+    return stations, elapsed
+
+
+def _elapsed(input_data: InputData) -> float | None:
+    start, finish = input_data.start_time, input_data.finish_time
+    if start is None or finish is None:
+        return None
+    return (finish - start).total_seconds()
+
+
+def compile_score_o(course: Course) -> ScoreOCourse:
+    entry = _compiled.get(id(course))
+    if entry is not None and entry[0] is course:
+        return entry[1]
+    if len(_compiled) >= _COMPILED_LIMIT:
+        _compiled.clear()
+    compiled = ScoreOCourse(course)
+    _compiled[id(course)] = (course, compiled)
+    return compiled
@@ -0,0 +1,372 @@
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import os
+import random
+import select
+import threading
+import time
+import tty
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Self
+
+from fastlog import log
+from sportident import SIReader, _crc
+
+from .grading import COURSES, Course, InputData
+
+# A fake SPORTident readout station (BSM7/8 in "read SI cards" mode, extended protocol) on a pseudo-terminal.
+# SIReaderReadout connects to the pty like to a real station, so the real reader loop (StationReader.run,
+# which ReaderWorker.spin_thread drives) can be exercised without hardware, in tests and in load/soak tests.
+#
+# Cards are inserted one after another, either as fast as the reader takes them or at a fixed rate, and a
+# share of them can fail on purpose: pulled out mid-readout, or a block with a broken crc. Cards are served as
+# SI9 (or SI8, by card number) memory images, which covers everything the reader decodes.
+#
+#   python -m easysnec.utils.si_simulator [--cards 100] [--rate 2] [--removed-early 0.05] [--replay journal]
+# prints the pty path to point easysnec (--port) at.
+
+STX, ETX, ACK, NAK = SIReader.STX[0], SIReader.ETX[0], SIReader.ACK[0], SIReader.NAK[0]
+BLOCK_SIZE = 128
+# extended protocol + handshake, what a readout station reports for O_PROTO
+PROTO_CONFIG = 0b101
+
+SI9_CARDS = range(1_000_000, 2_000_000)
+SI8_CARDS = range(2_000_000, 3_000_000)
+
+
+@dataclass(frozen=True)
+class SimulatedCard:
+    card_number: int
+    start_time: dt.datetime | None
+    finish_time: dt.datetime | None
+    punches: list[tuple[int, dt.datetime]]
+
+    @classmethod
+    def from_input_data(cls, input_data: InputData, card_number: int | None = None) -> SimulatedCard:
+        return cls(
+            card_number if card_number is not None else input_data.card_id,
+            input_data.start_time,
+            input_data.finish_time,
+            [(station, moment) for station, moment in input_data.punches if moment is not None],
+        )
+
+
+def card_type(card_number: int) -> str:
+    if card_number in SI9_CARDS:
+        return "SI9"
+    if card_number in SI8_CARDS:
+        return "SI8"
+    raise ValueError(f"can only simulate SI8/SI9 cards, not {card_number}")
+
+
+def _encode_time(memory: bytearray, offset: int, ptd_offset: int | None, moment: dt.datetime | None) -> None:
+    # 12h seconds at offset, and (if the card has one) the day/am-pm byte plus a 1/256 s byte at ptd_offset
+    if moment is None:
+        memory[offset : offset + 2] = SIReader.TIME_RESET
+        return
+    memory[offset : offset + 2] = ((moment.hour % 12) * 3600 + moment.minute * 60 + moment.second).to_bytes(2)
+    if ptd_offset is not None:
+        # bits 3..1: day of week with sunday = 0, bit 0: pm
+        memory[ptd_offset] = ((moment.isoweekday() % 7) << 1) | (moment.hour >= 12)
+        memory[ptd_offset + 1] = moment.microsecond * 256 // 1_000_000
+
+
+def encode_card(card: SimulatedCard) -> bytes:
+    # the card memory the station would read out, laid out like sportident's SIReader.CARD tables say
+    layout = SIReader.CARD[card_type(card.card_number)]
+    memory = bytearray(b"\xee" * BLOCK_SIZE * layout["BC"])
+
+    memory[layout["CN2"]], memory[layout["CN1"]], memory[layout["CN0"]] = card.card_number.to_bytes(3)
+    _encode_time(memory, layout["ST"], layout["STD"], card.start_time)
+    _encode_time(memory, layout["FT"], layout["FTD"], card.finish_time)
+    _encode_time(memory, layout["CT"], layout["CTD"], card.start_time)
+
+    punches = card.punches[: layout["PM"]]
+    memory[layout["RC"]] = len(punches)
+    for index, (station, moment) in enumerate(punches):
+        record = layout["P1"] + index * layout["PL"]
+        memory[record + layout["CN"]] = station
+        _encode_time(memory, record + layout["PTH"], None, moment)
+        memory[record + layout["PTD"]] = ((moment.isoweekday() % 7) << 1) | (moment.hour >= 12)
+    return bytes(memory)
+
+
+def frame(command: bytes, payload: bytes, station_code: int = 1, corrupt: bool = False) -> bytes:
+    # STX cmd len station(2) payload crc(2) ETX, as SIReader._read_command expects it
+    body = command + bytes([len(payload) + 2]) + station_code.to_bytes(2) + payload
+    crc = _crc(body)
+    if corrupt:
+        crc = bytes([crc[0] ^ 0xFF, crc[1]])
+    return bytes([STX]) + body + crc + bytes([ETX])
+
+
+def generate_cards(
+    rng: random.Random,
+    count: int,
+    courses: list[Course] = COURSES,
+    first_card: int = 1_000_001,
+    mistake_rate: float = 0.2,
+    now: dt.datetime | None = None,
+) -> list[SimulatedCard]:
+    # runners on random courses, a share of them missing or swapping a control. times are whole seconds in the
+    # last few hours (punch records have no sub-second part, and the decoder resolves times backwards from now)
+    now = (now or dt.datetime.now()).replace(microsecond=0)
+    cards = []
+    for index in range(count):
+        stations = list(rng.choice(courses).stations)
+        if stations and rng.random() < mistake_rate:
+            if rng.random() < 0.5:
+                del stations[rng.randrange(len(stations))]
+            elif len(stations) > 1:
+                swap = rng.randrange(len(stations) - 1)
+                stations[swap], stations[swap + 1] = stations[swap + 1], stations[swap]
+
+        moment = start = now - dt.timedelta(seconds=rng.randint(3600, 4 * 3600))
+        punches = []
+        for station in stations:
+            moment += dt.timedelta(seconds=rng.randint(20, 300))
+            punches.append((station, moment))
+        finish = moment + dt.timedelta(seconds=rng.randint(10, 60))
+        cards.append(SimulatedCard(first_card + index, start, finish, punches))
+    return cards
+
+
+@dataclass(frozen=True)
+class SimulatorConfig:
+    rate: float = 0.0  # cards per second, 0 = next card as soon as the last one is done
+    removed_early: float = 0.0  # share of cards pulled out before the readout finished
+    bad_crc: float = 0.0  # share of cards whose last block arrives with a broken crc
+    send_removal: bool = True  # send "card removed" after the ack, like a runner taking the card out
+    station_code: int = 1
+    seed: int | None = None
+
+
+# frozen, so every station can share it as the default
+DEFAULT_CONFIG = SimulatorConfig()
+
+
+@dataclass
+class SimulatorStats:
+    inserted: int = 0
+    acked: int = 0
+    removed_early: int = 0
+    bad_crc: int = 0
+    # card number -> perf_counter() when the card went in / when the reader acked it
+    inserted_at: dict[int, float] = field(default_factory=dict)
+    acked_at: dict[int, float] = field(default_factory=dict)
+
+
+class SimulatedStation:
+    def __init__(self, cards: Iterable[SimulatedCard], config: SimulatorConfig = DEFAULT_CONFIG):
+        self.config = config
+        self.stats = SimulatorStats()
+        # set once every card went through (acked or failed)
+        self.finished = threading.Event()
+
+        self._cards: Iterator[SimulatedCard] = iter(cards)
+        self._rng = random.Random(config.seed)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self._controller, self._device = os.openpty()
+        tty.setraw(self._device)
+        self.port = os.ttyname(self._device)
+
+        # the card in the station: (card, memory, fault) where fault is None, "removed_early" or "bad_crc"
+        self._current: tuple[SimulatedCard, bytes, str | None] | None = None
+        self._connected = False
+        self._next_insert = 0.0
+
+    def start(self) -> SimulatedStation:
+        self._thread = threading.Thread(target=self._serve, name=f"si-simulator {self.port}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        os.close(self._controller)
+        os.close(self._device)
+
+    def __enter__(self) -> Self:
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _write(self, data: bytes) -> None:
+        os.write(self._controller, data)
+
+    def _serve(self) -> None:
+        parser = _parse_host(self)
+        next(parser)
+        while not self._stop.is_set():
+            now = time.perf_counter()
+            if self._connected and self._current is None and not self.finished.is_set():
+                if now >= self._next_insert:
+                    self._insert()
+                    continue
+                timeout = min(self._next_insert - now, 0.05)
+            else:
+                timeout = 0.05
+
+            readable, _, _ = select.select([self._controller], [], [], timeout)
+            if readable:
+                try:
+                    data = os.read(self._controller, 4096)
+                except OSError:
+                    # nobody has the pty open (reader reconnecting), try again in a bit
+                    self._stop.wait(0.01)
+                    continue
+                for byte in data:
+                    parser.send(byte)
+
+    def _insert(self) -> None:
+        card = next(self._cards, None)
+        if card is None:
+            self.finished.set()
+            return
+
+        roll = self._rng.random()
+        fault = None
+        if roll < self.config.removed_early:
+            fault = "removed_early"
+        elif roll < self.config.removed_early + self.config.bad_crc:
+            fault = "bad_crc"
+
+        self._current = (card, encode_card(card), fault)
+        self.stats.inserted += 1
+        self.stats.inserted_at[card.card_number] = time.perf_counter()
+        # card type byte (ignored by the reader) + 3 byte card number
+        self._reply(SIReader.C_SI9_DET, b"\x00" + card.card_number.to_bytes(3))
+
+    def _card_done(self) -> None:
+        self._current = None
+        if self.config.rate > 0:
+            self._next_insert = max(self._next_insert + 1 / self.config.rate, time.perf_counter())
+
+    def _reply(self, command: bytes, payload: bytes, corrupt: bool = False) -> None:
+        self._write(frame(command, payload, self.config.station_code, corrupt))
+
+    def handle_command(self, command: int, parameters: bytes) -> None:
+        command_byte = bytes([command])
+        if command_byte == SIReader.C_SET_MS:
+            self._reply(SIReader.C_SET_MS, parameters[:1])
+        elif command_byte == SIReader.C_GET_SYS_VAL:
+            offset = parameters[:1]
+            if offset == SIReader.O_PROTO:
+                self._reply(SIReader.C_GET_SYS_VAL, offset + bytes([PROTO_CONFIG]))
+            elif offset == SIReader.O_MODE:
+                self._reply(SIReader.C_GET_SYS_VAL, offset + bytes([SIReader.M_READOUT]))
+                # the last step of SIReader's handshake
+                self._connected = True
+                self._next_insert = max(self._next_insert, time.perf_counter())
+            else:
+                self._reply(SIReader.C_GET_SYS_VAL, offset + bytes(parameters[1] if len(parameters) > 1 else 1))
+        elif command_byte == SIReader.C_BEEP:
+            self._reply(SIReader.C_BEEP, parameters[:1])
+        elif command_byte == SIReader.C_GET_SI9 and self._current is not None:
+            card, memory, fault = self._current
+            block = parameters[0] if parameters else 0
+            last_block = block == len(memory) // BLOCK_SIZE - 1
+            if fault == "removed_early":
+                self.stats.removed_early += 1
+                self._reply(SIReader.C_SI_REM, b"\x00" + card.card_number.to_bytes(3))
+                self._card_done()
+                return
+            data = bytes([block]) + memory[block * BLOCK_SIZE : (block + 1) * BLOCK_SIZE]
+            self._reply(SIReader.C_GET_SI9, data, corrupt=fault == "bad_crc" and last_block)
+            if fault == "bad_crc" and last_block:
+                self.stats.bad_crc += 1
+                self._remove(card)
+        else:
+            self._write(bytes([NAK]))
+
+    def handle_ack(self) -> None:
+        if self._current is None:
+            return
+        card, _, _ = self._current
+        self.stats.acked += 1
+        self.stats.acked_at[card.card_number] = time.perf_counter()
+        self._remove(card)
+
+    def _remove(self, card: SimulatedCard) -> None:
+        # the runner takes the card out
+        if self.config.send_removal:
+            self._reply(SIReader.C_SI_REM, b"\x00" + card.card_number.to_bytes(3))
+        self._card_done()
+
+
+def _parse_host(station: SimulatedStation):
+    # byte-at-a-time parser for what the reader sends: wakeup bytes, ACKs and STX cmd len params crc ETX frames
+    while True:
+        byte = yield
+        if byte == ACK:
+            station.handle_ack()
+            continue
+        if byte != STX:
+            continue
+
+        # any number of STX (SIReader sends WAKEUP STX before a frame that starts with STX again)
+        command = yield
+        while command == STX:
+            command = yield
+        length = yield
+        parameters = bytearray()
+        for _ in range(length):
+            parameters.append((yield))
+        crc = bytes([(yield), (yield)])
+        end = yield
+        if end != ETX or _crc(bytes([command, length]) + parameters) != crc:
+            station._write(bytes([NAK]))
+            continue
+        station.handle_command(command, bytes(parameters))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="fake SPORTident readout station on a pty")
+    parser.add_argument("--cards", type=int, default=100, help="how many cards to generate")
+    parser.add_argument("--replay", type=Path, help="replay the readouts in a journal instead")
+    parser.add_argument("--rate", type=float, default=1.0, help="cards per second (0: as fast as possible)")
+    parser.add_argument("--removed-early", type=float, default=0.0, help="share of cards pulled out early")
+    parser.add_argument("--bad-crc", type=float, default=0.0, help="share of cards with a corrupted block")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.replay:
+        from .journal import replay
+
+        cards = [
+            SimulatedCard.from_input_data(
+                input_data,
+                input_data.card_id if input_data.card_id in SI9_CARDS else SI9_CARDS.start + index,
+            )
+            for index, input_data in enumerate(replay(args.replay))
+        ]
+    else:
+        cards = generate_cards(rng, args.cards)
+
+    config = SimulatorConfig(args.rate, args.removed_early, args.bad_crc, seed=args.seed)
+    with SimulatedStation(cards, config) as station:
+        log.info(f"simulated SI station on {station.port} with {len(cards)} cards")
+        try:
+            station.finished.wait()
+            # let the reader ack the last card
+            time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        stats = station.stats
+        log.info(
+            f"inserted {stats.inserted}, acked {stats.acked}, "
+            f"removed early {stats.removed_early}, bad crc {stats.bad_crc}"
+        )
+
+
+if __name__ == "__main__":
+    main()
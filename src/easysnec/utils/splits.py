@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import math
+import threading
+import uuid
+from bisect import bisect_right, insort
+from dataclasses import dataclass
+
+from .grading import Grade, ScoreType, SuccessStatus
+
+# Split analysis: for every course, how long each leg (start -> first control, ..., last control -> finish)
+# takes the field. Every graded card goes through add(), which updates its course's legs in place: a running
+# mean and variance (Welford) and a few approximate quantiles (P², Jain & Chlamtac 1985) per leg. Both keep a
+# fixed handful of numbers however many runners there are, so a card costs O(legs) and nothing is ever
+# re-sorted or re-read. P² is an estimate: once a leg has more than five times its quantiles are interpolated
+# between five markers, usually within a few percent of the exact answer for times like these.
+#
+# Only clean runs go into the statistics: a card that punched the whole course in order (SUCCESS). A mispunch
+# or a card without a finish would drag the legs around its mistake, and a score-o course has no order to run it
+# in, so it has no legs worth comparing.
+#
+# add() also works out the card's time lost (seconds behind each leg's median so far), before its own times go
+# in, so the exports and the results screen show it against the runners who came in before. That's a result of
+# the analysis, not of the grade: add() returns it, time_lost(grade) looks it up again later, and the exports
+# get it through OutputData.from_grade(grade, time_lost).
+#
+# A course whose controls change (a new course file with the same course names) starts its statistics over.
+
+QUANTILES = (0.25, 0.5, 0.75)
+
+
+class RunningStats:
+    # Welford's streaming mean and variance
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+
+    @property
+    def variance(self) -> float:
+        # sample variance
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class P2Quantile:
+    # the P² estimate of one quantile: five markers, the middle one tracks the quantile
+    def __init__(self, p: float):
+        self.p = p
+        self.count = 0
+        self._heights: list[float] = []
+        self._positions = [0, 1, 2, 3, 4]
+        self._desired = [0, 2 * p, 4 * p, 2 + 2 * p, 4]
+        self._increments = (0, p / 2, p, (1 + p) / 2, 1)
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        q = self._heights
+        if self.count <= 5:
+            insort(q, x)
+            return
+
+        # the cell x falls in, stretching the outer markers if it's a new minimum or maximum
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = bisect_right(q, x) - 1
+        n, desired = self._positions, self._desired
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            desired[i] += self._increments[i]
+
+        # move the middle markers one step towards where they should be, along a parabola through their
+        # neighbours, or a line when the parabola would overtake one
+        for i in (1, 2, 3):
+            d = desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                step = 1 if d > 0 else -1
+                height = q[i] + step / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+                q[i] = height
+                n[i] += step
+
+    @property
+    def value(self) -> float | None:
+        if not self.count:
+            return None
+        if self.count <= 5:
+            # still exact: nearest rank of what we have
+            return self._heights[min(int(self.p * self.count), self.count - 1)]
+        return self._heights[2]
+
+
+@dataclass(frozen=True)
+class LegSummary:
+    from_control: int | None  # None is the start
+    to_control: int | None  # None is the finish
+    count: int
+    mean: float | None
+    stdev: float | None
+    # QUANTILES -> seconds
+    quantiles: dict[float, float | None]
+
+    @property
+    def median(self) -> float | None:
+        return self.quantiles.get(0.5)
+
+
+class LegStats:
+    def __init__(self, quantiles: tuple[float, ...] = QUANTILES):
+        self.stats = RunningStats()
+        self.quantiles = {q: P2Quantile(q) for q in quantiles}
+
+    def add(self, seconds: float) -> None:
+        self.stats.add(seconds)
+        for estimate in self.quantiles.values():
+            estimate.add(seconds)
+
+    @property
+    def median(self) -> float | None:
+        estimate = self.quantiles.get(0.5)
+        return None if estimate is None else estimate.value
+
+
+class SplitAnalysis:
+    def __init__(self, quantiles: tuple[float, ...] = QUANTILES):
+        if 0.5 not in quantiles:
+            # time lost is against the median
+            quantiles = (*quantiles, 0.5)
+        self.quantiles = quantiles
+        # course name -> (its controls, stats for each of its legs)
+        self._courses: dict[str, tuple[list[int], list[LegStats]]] = {}
+        # reading_id -> the time lost add() worked out for it
+        self._time_lost: dict[uuid.UUID, list[float | None]] = {}
+        # the grading thread adds, the gui reads
+        self._lock = threading.Lock()
+
+    def courses(self) -> list[str]:
+        with self._lock:
+            return list(self._courses)
+
+    def add(self, grade: Grade) -> list[float | None]:
+        # the card's time lost on each leg, and if it was a clean run its legs go in with the rest of its course
+        legs = grade.legs
+        course = grade.course
+        if grade.scored_as is ScoreType.SCORE_O:
+            return [None] * len(legs)
+        with self._lock:
+            entry = self._courses.get(course.course_name)
+            if entry is None or entry[0] != course.stations:
+                entry = self._courses[course.course_name] = (
+                    list(course.stations),
+                    [LegStats(self.quantiles) for _ in legs],
+                )
+            lost = []
+            for stats, leg in zip(entry[1], legs):
+                median = stats.median
+                lost.append(None if leg.seconds is None or median is None else leg.seconds - median)
+            if grade.status is SuccessStatus.SUCCESS:
+                for stats, leg in zip(entry[1], legs):
+                    if leg.seconds is not None:
+                        stats.add(leg.seconds)
+            self._time_lost[grade.input_data.reading_id] = lost
+        return lost
+
+    def time_lost(self, grade: Grade) -> list[float | None]:
+        # what add() worked out for the grade (a re-dip is the same readout), nothing to compare with if it
+        # never went through add()
+        with self._lock:
+            lost = self._time_lost.get(grade.input_data.reading_id)
+        return list(lost) if lost is not None else [None] * len(grade.legs)
+
+    def legs(self, course: str) -> list[LegSummary]:
+        # the course's legs in order, start to finish. empty if nobody has been graded on it yet
+        with self._lock:
+            entry = self._courses.get(course)
+            if entry is None:
+                return []
+            controls = [None, *entry[0], None]
+            return [
+                LegSummary(
+                    controls[i],
+                    controls[i + 1],
+                    stats.stats.count,
+                    stats.stats.mean if stats.stats.count else None,
+                    stats.stats.stdev if stats.stats.count else None,
+                    {q: estimate.value for q, estimate in stats.quantiles.items()},
+                )
+                for i, stats in enumerate(entry[1])
+            ]
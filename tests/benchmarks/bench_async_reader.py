@@ -0,0 +1,85 @@
+# Threaded readers (a StationReader thread per port, what the gui runs in QThreads) vs. AsyncReaderHub (every
+# port on one asyncio thread) against the same simulated SI stations: reader threads, insert -> ack latency
+# (how fast a reader wakes up for a card and reads it out) and cpu time. The simulators run in this process
+# too, their threads and cpu are the same for both.
+#
+#   python -m tests.benchmarks.bench_async_reader [--stations 16] [--cards 50] [--rate 5]
+
+from __future__ import annotations
+
+import argparse
+import random
+import threading
+import time
+
+from easysnec.async_reader import AsyncReaderHub
+from easysnec.reader import StationReader
+from easysnec.utils.si_simulator import (
+    SimulatedStation,
+    SimulatorConfig,
+    generate_cards,
+)
+
+from .bench_station_load import percentile
+
+
+def run(backend: str, args: argparse.Namespace) -> None:
+    stations = []
+    for index in range(args.stations):
+        cards = generate_cards(random.Random(index), args.cards, first_card=1_000_000 + index * args.cards)
+        stations.append(SimulatedStation(cards, SimulatorConfig(args.rate, seed=index)))
+    readouts = []
+    threads_before = threading.active_count()
+    for station in stations:
+        station.start()
+
+    start, cpu_start = time.perf_counter(), time.process_time()
+    if backend == "async":
+        hub = AsyncReaderHub(readouts.append)
+        hub.start()
+        hub.attach_readers([station.port for station in stations])
+    else:
+        readers = [StationReader(station.port, readouts.append) for station in stations]
+        threads = [threading.Thread(target=reader.run, daemon=True) for reader in readers]
+        for thread in threads:
+            thread.start()
+    time.sleep(0.5)
+    reader_threads = threading.active_count() - threads_before - len(stations)
+    for station in stations:
+        station.finished.wait()
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+    if backend == "async":
+        hub.stop()
+    else:
+        for reader in readers:
+            reader.stop()
+        for thread in threads:
+            thread.join()
+
+    latencies = [
+        station.stats.acked_at[card] - station.stats.inserted_at[card]
+        for station in stations
+        for card in station.stats.acked_at
+    ]
+    for station in stations:
+        station.stop()
+    print(
+        f"{backend:>6}: {reader_threads:3d} reader threads, {len(readouts)} cards in {elapsed:.2f}s, "
+        f"cpu {cpu:.2f}s, insert -> ack "
+        + ", ".join(f"p{int(q * 100)} {percentile(latencies, q) * 1000:.1f} ms" for q in (0.5, 0.95, 0.99))
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stations", type=int, default=16)
+    parser.add_argument("--cards", type=int, default=50, help="cards per station")
+    parser.add_argument("--rate", type=float, default=5.0, help="cards per second per station, 0 = flat out")
+    args = parser.parse_args()
+
+    for backend in ("thread", "async"):
+        run(backend, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# Results broadcast on localhost: a burst of cards pushed to a room full of clients, with and without batching.
+# Reports messages (lines) per client and how long until every client had every result.
+#
+#   python -m tests.benchmarks.bench_broadcast [--clients 20] [--burst 200]
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+
+from easysnec.utils.broadcast import ResultBroadcaster
+from easysnec.utils.course_index import CourseIndex
+
+from .bench_grading import make_courses, make_readout
+
+
+def client(port: int, burst: int, done_at: list[float], lines: list[int]) -> None:
+    # reads until it has all burst results, then notes when that was and how many lines it took
+    with socket.create_connection(("127.0.0.1", port)) as sock, sock.makefile("rb") as file:
+        file.readline()  # snapshot
+        received = count = 0
+        while received < burst:
+            received += len(json.loads(file.readline())["results"])
+            count += 1
+        done_at.append(time.perf_counter())
+        lines.append(count)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--burst", type=int, default=200, help="results written back to back")
+    args = parser.parse_args()
+
+    rng = random.Random(22)
+    courses = CourseIndex(make_courses(rng, 50, 20))
+    readouts = [make_readout(rng, rng.choice(courses.courses)) for _ in range(args.burst)]
+    grades = [readout.score_against(readout.get_closest_course(courses)) for readout in readouts]
+
+    for batch_interval in (0.0, 0.05):
+        broadcaster = ResultBroadcaster(port=0, batch_interval=batch_interval, client_queue=args.burst + 1)
+        broadcaster.start()
+        done_at: list[float] = []
+        lines: list[int] = []
+        clients = [
+            threading.Thread(target=client, args=(broadcaster.port, args.burst, done_at, lines))
+            for _ in range(args.clients)
+        ]
+        for thread in clients:
+            thread.start()
+        while broadcaster.clients < args.clients:
+            time.sleep(0.01)
+
+        start = time.perf_counter()
+        for runner_grade in grades:
+            broadcaster.write(runner_grade)
+        for thread in clients:
+            thread.join()
+        broadcaster.close()
+        print(
+            f"batch_interval {batch_interval * 1000:4.0f} ms: {sum(lines) / len(lines):6.1f} messages per client, "
+            f"all {args.clients} clients had all {args.burst} results after "
+            f"{(max(done_at) - start) * 1000:6.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Measures what waiting for a card costs: cpu seconds burnt per idle minute, and how long it takes from the
+# station sending a byte to wait_for_card returning. Runs against a pty, so no hardware is needed.
+#
+#   python -m tests.benchmarks.bench_card_wait [--idle 5] [--inserts 50]
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import threading
+import time
+
+import serial
+
+from easysnec.utils.card_wait import CardWaitConfig, WaitMode, wait_for_card
+
+
+class FakeSI:
+    def __init__(self, serial_port):
+        self._serial = serial_port
+
+    def poll_sicard(self):
+        if self._serial.in_waiting == 0:
+            return False
+        self._serial.read(self._serial.in_waiting)
+        return True
+
+
+def idle_cpu_per_minute(si, config: CardWaitConfig, seconds: float) -> float:
+    # cpu time used by the waiting thread only, so the benchmark harness itself doesn't count
+    result = {}
+
+    def waiter():
+        start = time.thread_time()
+        wait_for_card(si, config, timeout=seconds)
+        result["cpu"] = time.thread_time() - start
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    thread.join()
+    return result["cpu"] * 60 / seconds
+
+
+def insertion_latency(si, controller: int, config: CardWaitConfig, inserts: int) -> list[float]:
+    latencies = []
+    for _ in range(inserts):
+        ready = threading.Event()
+        woke = {}
+
+        def waiter(ready: threading.Event, woke: dict[str, float]) -> None:
+            ready.set()
+            wait_for_card(si, config, timeout=5)
+            woke["at"] = time.perf_counter()
+
+        thread = threading.Thread(target=waiter, args=(ready, woke))
+        thread.start()
+        ready.wait()
+        time.sleep(0.03)  # let the waiter settle into its idle state
+        sent = time.perf_counter()
+        os.write(controller, b"\x02")
+        thread.join()
+        latencies.append(woke["at"] - sent)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--idle", type=float, default=5.0, help="seconds of idle waiting per mode")
+    parser.add_argument("--inserts", type=int, default=50, help="simulated card insertions per mode")
+    args = parser.parse_args()
+
+    controller, device = os.openpty()
+    port = serial.Serial(os.ttyname(device), timeout=0)
+    si = FakeSI(port)
+
+    print(f"{'mode':<10}{'cpu s / idle min':>18}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for mode in (WaitMode.SPIN, WaitMode.BACKOFF, WaitMode.SELECT):
+        config = CardWaitConfig(mode=mode)
+        cpu = idle_cpu_per_minute(si, config, args.idle)
+        latencies = sorted(insertion_latency(si, controller, config, args.inserts))
+        p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        print(
+            f"{mode.name:<10}{cpu:>18.3f}{statistics.median(latencies) * 1000:>10.3f}"
+            f"{p95 * 1000:>10.3f}{latencies[-1] * 1000:>10.3f}"
+        )
+
+    port.close()
+    os.close(controller)
+    os.close(device)
+
+
+if __name__ == "__main__":
+    main()
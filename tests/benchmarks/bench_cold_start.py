@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+# Cold start of a station, headless vs. gui: fresh interpreter -> station ready (journal replayed, grader and
+# readers running) -> shut down. Peak RSS of the child is reported too.
+#
+#   python -m tests.benchmarks.bench_cold_start [--runs 5]
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HEADLESS = """
+from easysnec.headless import HeadlessStation
+station = HeadlessStation([], {journal!r})
+station.start()
+station.shutdown()
+"""
+
+GUI = """
+from pathlib import Path
+import easysnec
+from PySide6.QtGui import QGuiApplication
+from PySide6.QtQml import QQmlApplicationEngine
+from easysnec.backend import Backend, BackendInterface
+app = QGuiApplication([])
+engine = QQmlApplicationEngine()
+backend_interface = BackendInterface()
+engine.rootContext().setContextProperty("backend", backend_interface)
+backend = Backend(backend_interface, engine, {journal!r})
+backend_interface.set_selected_ports(["/dev/null-reader"])
+backend.start()
+engine.load(Path(easysnec.__file__).parent / "qml" / "Main.qml")
+assert engine.rootObjects()
+backend.shutdown()
+"""
+
+
+def cold_start(code: str, env: dict[str, str]) -> tuple[float, int]:
+    # wall time and peak rss (kB on linux) of one fresh interpreter running code
+    script = "import resource\n" + code + "\nprint(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", script], env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return time.perf_counter() - start, int(output.split()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        journal = os.path.join(directory, "journal.sqlite3")
+        env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+
+        for name, code in (("headless", HEADLESS.format(journal=journal)), ("gui", GUI.format(journal=journal))):
+            runs = [cold_start(code, env) for _ in range(args.runs)]
+            best = min(seconds for seconds, _ in runs)
+            rss = max(kilobytes for _, kilobytes in runs)
+            print(f"{name:>8}: best {best * 1000:7.1f} ms, peak rss {rss / 1024:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# Brute force get_closest_course vs CourseIndex over growing course sets. Readouts are courses with a few
+# random mistakes (missed, extra and swapped controls), which is what a station actually sees.
+#
+#   python -m tests.benchmarks.bench_course_index [--readouts 200]
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from pyxdameraulevenshtein import damerau_levenshtein_distance
+
+from easysnec.utils.course_index import CourseIndex
+from easysnec.utils.grading import Course
+
+
+def make_courses(rng: random.Random, count: int) -> list[Course]:
+    controls = range(31, 131)
+    return [Course(f"course-{i}", False, rng.sample(controls, rng.randint(5, 15))) for i in range(count)]
+
+
+def make_readouts(rng: random.Random, courses: list[Course], count: int) -> list[list[int]]:
+    readouts = []
+    for _ in range(count):
+        stations = list(rng.choice(courses).stations)
+        for _ in range(rng.choice((0, 0, 1, 2, 3))):
+            match rng.randint(0, 2):
+                case 0 if stations:
+                    stations.pop(rng.randrange(len(stations)))
+                case 1:
+                    stations.insert(rng.randint(0, len(stations)), rng.randint(31, 130))
+                case _ if len(stations) > 1:
+                    i = rng.randrange(len(stations) - 1)
+                    stations[i], stations[i + 1] = stations[i + 1], stations[i]
+        readouts.append(stations)
+    return readouts
+
+
+def brute_force(stations: list[int], courses: list[Course]) -> Course:
+    return min(courses, key=lambda course: damerau_levenshtein_distance(stations, course.stations))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readouts", type=int, default=200)
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'courses':>8}{'build ms':>10}{'brute us/card':>15}{'index us/card':>15}{'speedup':>9}")
+    for count in args.counts:
+        courses = make_courses(rng, count)
+        readouts = make_readouts(rng, courses, args.readouts)
+
+        start = time.perf_counter()
+        index = CourseIndex(courses)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = [brute_force(stations, courses) for stations in readouts]
+        brute = (time.perf_counter() - start) / len(readouts)
+
+        start = time.perf_counter()
+        got = [index.closest(stations) for stations in readouts]
+        indexed = (time.perf_counter() - start) / len(readouts)
+
+        assert got == expected
+        print(
+            f"{count:>8}{build * 1000:>10.1f}{brute * 1e6:>15.1f}{indexed * 1e6:>15.1f}{brute / indexed:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Cold parse of a big IOF XML 3.0 course file vs. loading the same file from the course cache.
+#
+#   python -m tests.benchmarks.bench_course_loader [--courses 5000] [--controls 25]
+
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from easysnec.utils.course_loader import load_courses, parse_courses
+
+
+def write_course_data(path: Path, rng: random.Random, courses: int, controls: int) -> None:
+    with open(path, "w", encoding="utf-8") as file:
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        file.write('<CourseData xmlns="http://www.orienteering.org/datastandard/3.0" iofVersion="3.0">\n')
+        file.write("<RaceCourseData>\n")
+        for index in range(courses):
+            file.write(f"<Course><Name>Course {index}</Name>")
+            file.write('<CourseControl type="Start"><Control>S1</Control></CourseControl>')
+            file.writelines(
+                f'<CourseControl type="Control"><Control>{station}</Control></CourseControl>'
+                for station in rng.sample(range(31, 256), controls)
+            )
+            file.write('<CourseControl type="Finish"><Control>F1</Control></CourseControl></Course>\n')
+        file.write("</RaceCourseData>\n</CourseData>\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--courses", type=int, default=5000)
+    parser.add_argument("--controls", type=int, default=25)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "courses.xml"
+        write_course_data(path, random.Random(4), args.courses, args.controls)
+        print(f"{path.stat().st_size / 1e6:.1f} MB, {args.courses} courses")
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        parse_courses(path)
+        parsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"streaming parse {parsed:.3f}s, peak {peak / 1e6:.1f} MB")
+
+        cache_dir = Path(directory) / "cache"
+        load_courses(path, cache_dir)
+        start = time.perf_counter()
+        load_courses(path, cache_dir)
+        print(f"cache hit {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# Streaming results export: time per result and peak memory for CSV and IOF XML, exporting results from a
+# generator (each graded as it's written, like easysnec export does with a journal). The peak should stay
+# flat as the event grows.
+#
+#   python -m tests.benchmarks.bench_export [--cards 1000 20000] [--courses 50]
+
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from easysnec.utils.course_index import CourseIndex
+from easysnec.utils.export import export_results
+
+from .bench_grading import make_courses, make_readout
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, nargs="+", default=[1000, 20000])
+    parser.add_argument("--courses", type=int, default=50)
+    parser.add_argument("--controls", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(21)
+    courses = CourseIndex(make_courses(rng, args.courses, args.controls))
+
+    def grades(n: int):
+        rng = random.Random(n)
+        for _ in range(n):
+            readout = make_readout(rng, rng.choice(courses.courses))
+            yield readout.score_against(readout.get_closest_course(courses))
+
+    with tempfile.TemporaryDirectory() as directory:
+        for cards in args.cards:
+            # grading alone, to take it out of the per-result export time
+            start = time.perf_counter()
+            for _ in grades(cards):
+                pass
+            grading = time.perf_counter() - start
+
+            for suffix in (".csv", ".xml"):
+                path = Path(directory) / f"results{suffix}"
+                start = time.perf_counter()
+                export_results(grades(cards), path)
+                elapsed = time.perf_counter() - start
+                # again under tracemalloc (which slows everything down) for the peak
+                tracemalloc.start()
+                export_results(grades(cards), path)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                print(
+                    f"{cards:6d} results {suffix:>4}: {(elapsed - grading) / cards * 1e6:6.1f} us per result "
+                    f"(+ grading), peak {peak / 1024:7.1f} KiB, file {path.stat().st_size / 1024:8.1f} KiB"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# grade_many vs one Grade per readout, for a regrade of a big pile of readouts against the animal courses.
+# Both sides pick the closest course and work out status, score, missed and extra checkpoints.
+#
+#   python -m tests.benchmarks.bench_grade_many [--readouts 10000]
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import random
+import time
+import uuid
+
+from easysnec.utils.course_index import CourseIndex
+from easysnec.utils.grading import COURSES, InputData, ScoreType, grade_many
+
+
+def make_readouts(rng: random.Random, count: int) -> list[InputData]:
+    start = dt.datetime(2025, 3, 14, 9, 30, 17)
+    readouts = []
+    for i in range(count):
+        stations = list(rng.choice(COURSES).stations)
+        for _ in range(rng.choice((0, 0, 1, 2))):
+            if stations and rng.random() < 0.5:
+                stations.pop(rng.randrange(len(stations)))
+            else:
+                stations.insert(rng.randint(0, len(stations)), rng.randint(31, 45))
+        punches = [(station, start + dt.timedelta(minutes=j)) for j, station in enumerate(stations)]
+        readouts.append(
+            InputData(
+                card_id=i,
+                start_time=start,
+                finish_time=start + dt.timedelta(seconds=rng.randint(600, 5000)),
+                punches=punches,
+                reading_id=uuid.uuid4(),
+            )
+        )
+    return readouts
+
+
+def grade_one_by_one(readouts, score_type):
+    grades = [readout.score_against(readout.get_closest_course(COURSES), score_type) for readout in readouts]
+    for grade in grades:
+        # Grade works them out when they're first read
+        _ = grade.status, grade.score, grade.missed_checkpoints, grade.extra_checkpoints
+    return grades
+
+
+def best_of(repeat: int, fn, *args) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readouts", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    readouts = make_readouts(random.Random(1), args.readouts)
+    index = CourseIndex(COURSES)
+
+    print(f"{'score type':<12}{'Grade ms':>10}{'grade_many ms':>15}{'speedup':>9}")
+    for score_type in (ScoreType.CLASSIC_O, ScoreType.SCORE_O):
+        one_by_one = best_of(args.repeat, grade_one_by_one, readouts, score_type)
+        batched = best_of(args.repeat, grade_many, readouts, index, score_type)
+        print(
+            f"{score_type.name:<12}{one_by_one * 1000:>10.1f}{batched * 1000:>15.1f}"
+            f"{one_by_one / batched:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+# Micro-benchmarks for the grading hot path, so its speed can be tracked from release to release: course
+# matching (brute force and CourseIndex) and every Grade property, over synthetic course sets of growing size
+# and punch sequences of growing length. Each Grade case times a fresh Grade, like the station sees it
+# (properties are cached, and they build on status).
+#
+#   python -m tests.benchmarks.bench_grading run [--quick] [--output results.json]
+#   python -m tests.benchmarks.bench_grading compare baseline.json results.json [--threshold 0.15]
+#
+# run saves seconds per call for every case to json (by default under .benchmarks/). compare prints the
+# ratio for every case both files have and exits with 1 if anything got slower than the threshold allows.
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections.abc import Callable
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+from easysnec.utils.course_index import CourseIndex
+from easysnec.utils.grading import Course, Grade, InputData, ScoreType
+
+COURSE_COUNTS = (10, 100, 1000)
+PUNCH_LENGTHS = (5, 20, 60)
+QUICK_COURSE_COUNTS = (10, 100)
+QUICK_PUNCH_LENGTHS = (5, 20)
+# readouts per case: enough variety that one lucky input doesn't decide the number
+READOUTS = 50
+
+GRADE_PROPERTIES = (
+    "status",
+    "score",
+    "missed_checkpoints",
+    "extra_checkpoints",
+    "out_of_order_checkpoints",
+    "scoring_output",
+)
+
+
+def make_courses(rng: random.Random, count: int, length: int) -> list[Course]:
+    return [
+        Course(f"course {index}", False, rng.sample(range(31, 256), length)) for index in range(count)
+    ]
+
+
+def make_readout(rng: random.Random, course: Course) -> InputData:
+    # a runner on course: a third get it right, the rest miss, add or swap a control or two
+    stations = list(course.stations)
+    for _ in range(rng.choice((0, 1, 2))):
+        match rng.randrange(3):
+            case 0 if stations:
+                stations.pop(rng.randrange(len(stations)))
+            case 1:
+                stations.insert(rng.randint(0, len(stations)), rng.randint(31, 255))
+            case _ if len(stations) > 1:
+                swap = rng.randrange(len(stations) - 1)
+                stations[swap], stations[swap + 1] = stations[swap + 1], stations[swap]
+    start = dt.datetime(2025, 3, 14, 9, 30, 17)
+    return InputData(
+        card_id=rng.randrange(1_000_000, 2_000_000),
+        start_time=start,
+        finish_time=start + dt.timedelta(seconds=60 * len(stations) + 30),
+        punches=[(station, start + dt.timedelta(minutes=i + 1)) for i, station in enumerate(stations)],
+        reading_id=uuid.uuid4(),
+    )
+
+
+def match_all(readouts: list[InputData], courses: list[Course] | CourseIndex) -> list:
+    return [readout.get_closest_course(courses) for readout in readouts]
+
+
+def grade_all(pairs: list[tuple[InputData, Course]], score_type: ScoreType, prop: str) -> list:
+    return [getattr(Grade(readout, course, score_type), prop) for readout, course in pairs]
+
+
+def seconds_per_call(fn: Callable[[], object], calls: int, repeat: int, min_time: float = 0.05) -> float:
+    # best of repeat, each round running fn often enough (a multiple of calls) to take at least min_time
+    rounds = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        if time.perf_counter() - start >= min_time:
+            break
+        rounds *= 2
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best / (rounds * calls)
+
+
+def run_suite(quick: bool = False, repeat: int = 5) -> dict[str, float]:
+    course_counts = QUICK_COURSE_COUNTS if quick else COURSE_COUNTS
+    punch_lengths = QUICK_PUNCH_LENGTHS if quick else PUNCH_LENGTHS
+    results = {}
+
+    for length in punch_lengths:
+        for count in course_counts:
+            rng = random.Random(count * 1000 + length)
+            courses = make_courses(rng, count, length)
+            index = CourseIndex(courses)
+            readouts = [make_readout(rng, rng.choice(courses)) for _ in range(READOUTS)]
+
+            for name, target in (("list", courses), ("index", index)):
+                results[f"get_closest_course[{name}] courses={count} punches={length}"] = seconds_per_call(
+                    partial(match_all, readouts, target), READOUTS, repeat
+                )
+
+        # grading against the matched course doesn't depend on how many courses there are
+        rng = random.Random(length)
+        courses = make_courses(rng, 10, length)
+        pairs = [(make_readout(rng, course), course) for course in courses for _ in range(READOUTS // 10)]
+        for score_type in (ScoreType.CLASSIC_O, ScoreType.SCORE_O):
+            for prop in GRADE_PROPERTIES:
+                if score_type is ScoreType.SCORE_O and prop != "score":
+                    continue  # only score looks at the score type
+                results[f"Grade.{prop}[{score_type.name}] punches={length}"] = seconds_per_call(
+                    partial(grade_all, pairs, score_type, prop), len(pairs), repeat
+                )
+    return results
+
+
+def environment() -> dict[str, str]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "unknown"
+    return {
+        "commit": commit,
+        "date": dt.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": f"{platform.system()} {platform.machine()} {platform.processor()}".strip(),
+    }
+
+
+def compare(
+    baseline: dict[str, float], results: dict[str, float], threshold: float
+) -> tuple[list[tuple[str, float]], list[tuple[str, float]]]:
+    # (regressions, improvements) as (case, new / old) for cases in both runs that moved by more than threshold
+    regressions, improvements = [], []
+    for case in sorted(baseline.keys() & results.keys()):
+        ratio = results[case] / baseline[case]
+        if ratio > 1 + threshold:
+            regressions.append((case, ratio))
+        elif ratio < 1 / (1 + threshold):
+            improvements.append((case, ratio))
+    return regressions, improvements
+
+
+def load(path: Path) -> dict:
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the suite and save the results")
+    run.add_argument("--quick", action="store_true", help="smaller grid, for a quick look")
+    run.add_argument("--repeat", type=int, default=5)
+    run.add_argument("--output", type=Path, help="json file (default: .benchmarks/grading-<commit>-<date>.json)")
+
+    check = commands.add_parser("compare", help="compare two saved runs")
+    check.add_argument("baseline", type=Path)
+    check.add_argument("results", type=Path)
+    check.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown, 0.15 = 15%%")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run_suite(args.quick, args.repeat)
+        for case, seconds in results.items():
+            print(f"{case:<60}{seconds * 1e6:>12.2f} us")
+
+        env = environment()
+        output = args.output or Path(".benchmarks") / f"grading-{env['commit']}-{env['date'].replace(':', '')}.json"
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump({"environment": env, "results": results}, file, indent=2)
+        print(f"saved to {output}")
+        return
+
+    baseline, results = load(args.baseline), load(args.results)
+    if baseline["environment"]["machine"] != results["environment"]["machine"]:
+        print("warning: the two runs come from different machines")
+    regressions, improvements = compare(baseline["results"], results["results"], args.threshold)
+
+    marks = {case: "REGRESSION" for case, _ in regressions} | {case: "faster" for case, _ in improvements}
+    for case in sorted(baseline["results"].keys() & results["results"].keys()):
+        ratio = results["results"][case] / baseline["results"][case]
+        print(f"{case:<60}{ratio:>8.2f}x  {marks.get(case, '')}")
+    for case in sorted(baseline["results"].keys() ^ results["results"].keys()):
+        print(f"{case:<60}  only in {'baseline' if case in baseline['results'] else 'results'}")
+
+    print(f"{len(regressions)} regressions, {len(improvements)} improvements (threshold {args.threshold:.0%})")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# Bytes per readout held in memory: the old dataclass InputData (list of (station, datetime) tuples plus the
+# cached stations list) against the current array backed one.
+#
+#   python -m tests.benchmarks.bench_input_memory [--readouts 5000] [--punches 12]
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import tracemalloc
+import uuid
+from dataclasses import dataclass
+from functools import cached_property
+
+from easysnec.utils.grading import InputData
+
+
+@dataclass(frozen=True)
+class LegacyInputData:
+    card_id: int
+    start_time: dt.datetime | None
+    finish_time: dt.datetime | None
+    punches: list[tuple[int, dt.datetime]]
+    reading_id: uuid.UUID
+    reader_id: str | None = None
+
+    @cached_property
+    def stations(self) -> list[int]:
+        return [punch[0] for punch in self.punches]
+
+
+def bytes_per_readout(cls, count: int, punches: int) -> float:
+    start = dt.datetime(2025, 3, 14, 9, 30, 17)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    # like sportident, every punch comes with its own datetime object. whatever the readouts don't hold on to
+    # is freed again below, so only what they keep is counted
+    raw = [
+        (
+            i,
+            [(31 + p, start + dt.timedelta(seconds=60 * p + i)) for p in range(punches)],
+            uuid.uuid4(),
+        )
+        for i in range(count)
+    ]
+    readouts = []
+    for card_id, raw_punches, reading_id in raw:
+        readout = cls(card_id, start, start + dt.timedelta(hours=1), raw_punches, reading_id)
+        _ = readout.stations  # what grading touches
+        readouts.append(readout)
+    del raw  # the station only keeps the readouts
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readouts", type=int, default=5000)
+    parser.add_argument("--punches", type=int, default=12)
+    args = parser.parse_args()
+
+    legacy = bytes_per_readout(LegacyInputData, args.readouts, args.punches)
+    compact = bytes_per_readout(InputData, args.readouts, args.punches)
+    print(f"{args.punches} punches per readout")
+    print(f"dataclass InputData: {legacy:8.0f} bytes/readout")
+    print(f"compact InputData:   {compact:8.0f} bytes/readout ({legacy / compact:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
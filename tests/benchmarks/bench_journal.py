@@ -0,0 +1,51 @@
+# How much the readout journal costs the reader loop, and how long a restart takes to rebuild every grade.
+#
+#   python -m tests.benchmarks.bench_journal [--readouts 5000]
+
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from easysnec.pipeline import GradingPipeline
+from easysnec.utils.grading import COURSES
+from easysnec.utils.journal import ReadoutJournal, replay
+
+from .bench_grade_many import make_readouts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readouts", type=int, default=5000)
+    args = parser.parse_args()
+
+    readouts = make_readouts(random.Random(2), args.readouts)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "journal.sqlite3"
+
+        with ReadoutJournal(path) as journal:
+            append_times = []
+            start = time.perf_counter()
+            for input_data in readouts:
+                before = time.perf_counter()
+                journal.append(input_data)
+                append_times.append(time.perf_counter() - before)
+            journal.flush()
+            durable = time.perf_counter() - start
+
+        append_times.sort()
+        print(f"append p50 {append_times[len(append_times) // 2] * 1e6:.1f} us, max {append_times[-1] * 1e6:.1f} us")
+        print(f"{len(readouts)} readouts durable after {durable:.3f}s ({len(readouts) / durable:.0f}/s)")
+
+        start = time.perf_counter()
+        pipeline = GradingPipeline(COURSES, lambda grade: None)
+        restored = pipeline.restore(replay(path))
+        print(f"replayed and regraded {restored} readouts in {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Keeping live standings: the incremental Leaderboard vs. sorting every result again after each card, both
+# followed by the top ten and the new runner's rank (what a results screen shows).
+#
+#   python -m tests.benchmarks.bench_leaderboard [--cards 20000] [--courses 8]
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import random
+import time
+import uuid
+
+from easysnec.utils.grading import Course, InputData, ScoreType
+from easysnec.utils.leaderboard import Leaderboard, elapsed_seconds
+
+
+def make_grades(rng: random.Random, cards: int, courses: list[Course]) -> list:
+    start = dt.datetime(2025, 3, 14, 9, 30)
+    grades = []
+    for card_id in range(cards):
+        course = rng.choice(courses)
+        stations = course.stations if rng.random() < 0.8 else course.stations[1:]
+        input_data = InputData(
+            card_id=card_id,
+            start_time=start,
+            finish_time=start + dt.timedelta(seconds=rng.randrange(600, 7200)),
+            punches=[(station, start + dt.timedelta(seconds=i + 1)) for i, station in enumerate(stations)],
+            reading_id=uuid.uuid4(),
+        )
+        grade = input_data.score_against(course, ScoreType.CLASSIC_O)
+        _ = grade.score  # grade once up front, both sides only rank
+        grades.append(grade)
+    return grades
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=20_000)
+    parser.add_argument("--courses", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = random.Random(15)
+    courses = [Course(f"course {i}", False, rng.sample(range(31, 256), 12)) for i in range(args.courses)]
+    grades = make_grades(rng, args.cards, courses)
+
+    board = Leaderboard()
+    start = time.perf_counter()
+    for grade in grades:
+        board.add(grade)
+        board.top(grade.course.course_name, 10)
+        board.rank(grade.input_data.card_id)
+    incremental = time.perf_counter() - start
+
+    # the same without an index: filter and sort the course's results after every card
+    results = []
+    start = time.perf_counter()
+    for grade in grades:
+        results.append(grade)
+        standings = sorted(
+            (runner for runner in results if runner.course is grade.course),
+            key=lambda runner: (-runner.score, elapsed_seconds(runner)),
+        )
+        standings[:10]
+        standings.index(grade)
+        if time.perf_counter() - start > 60:
+            break
+    resorted_cards = len(results)
+    resort = time.perf_counter() - start
+
+    print(f"incremental: {incremental / len(grades) * 1e6:.1f} us per card ({len(grades)} cards)")
+    print(f"full re-sort: {resort / resorted_cards * 1e6:.1f} us per card ({resorted_cards} cards)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Idle cost and plug-in latency of the port watcher: the old 1 s comports() poll (rebuilding the model every
+# time) vs. inotify on a watched directory. Latency uses a temp dir standing in for /dev.
+#
+#   python -m tests.benchmarks.bench_port_watcher [--idle 5]
+
+from __future__ import annotations
+
+import argparse
+import queue
+import resource
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from easysnec.utils.port_watcher import PortWatcher, WatchMode, list_serial_ports
+
+
+def cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def legacy_poll(stop: threading.Event) -> None:
+    # what Backend.update_ports did every second
+    while not stop.wait(1.0):
+        list(list_serial_ports())
+
+
+def idle_cpu(run, seconds: float) -> float:
+    stop = threading.Event()
+    before = cpu_seconds()
+    thread = threading.Thread(target=run, args=(stop,))
+    thread.start()
+    time.sleep(seconds)
+    stop.set()
+    thread.join()
+    return cpu_seconds() - before
+
+
+def watch(mode: WatchMode, directory: str | None = None):
+    def run(stop: threading.Event) -> None:
+        if directory is None:
+            watcher = PortWatcher(lambda added, removed: None, mode=mode)
+        else:
+            watcher = PortWatcher(lambda added, removed: None, mode=mode, watch_dir=directory)
+        watcher.start()
+        stop.wait()
+        watcher.stop()
+
+    return run
+
+
+def plug_latency(mode: WatchMode, directory: Path, plugs: int = 10) -> float:
+    changes = queue.Queue()
+    watcher = PortWatcher(
+        lambda added, removed: changes.put(time.perf_counter()),
+        lambda: [str(path) for path in directory.glob("tty*")],
+        mode=mode,
+        watch_dir=str(directory),
+    )
+    watcher.start()
+    latencies = []
+    for index in range(plugs):
+        time.sleep(0.05)
+        plugged = time.perf_counter()
+        (directory / f"ttyUSB{index}").touch()
+        latencies.append(changes.get(timeout=5) - plugged)
+    watcher.stop()
+    return sum(latencies) / len(latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--idle", type=float, default=5.0, help="seconds of idling to measure")
+    args = parser.parse_args()
+
+    print(f"idle cpu over {args.idle:.0f}s:")
+    print(f"  comports() every 1s: {idle_cpu(legacy_poll, args.idle) * 1000:7.1f} ms")
+    print(f"  inotify on /dev:     {idle_cpu(watch(WatchMode.INOTIFY), args.idle) * 1000:7.1f} ms")
+
+    print("plug-in latency:")
+    for mode in (WatchMode.POLL, WatchMode.INOTIFY):
+        with tempfile.TemporaryDirectory() as directory:
+            print(f"  {mode.name.lower():>7}: {plug_latency(mode, Path(directory)) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
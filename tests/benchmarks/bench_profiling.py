@@ -0,0 +1,51 @@
+# What --profile costs a station: GradingPipeline.grade with the profiler off, sampling one call in 10 (with and
+# without tracemalloc) and profiling every call.
+#
+#   python -m tests.benchmarks.bench_profiling [--courses 500] [--cards 2000]
+
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from easysnec.pipeline import GradingPipeline
+from easysnec.utils.course_index import CourseIndex
+from easysnec.utils.profiling import ProfileConfig, Profiler
+
+from .bench_grading import make_courses, make_readout
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--courses", type=int, default=500)
+    parser.add_argument("--controls", type=int, default=20)
+    parser.add_argument("--cards", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(19)
+    courses = CourseIndex(make_courses(rng, args.courses, args.controls))
+    readouts = [make_readout(rng, rng.choice(courses.courses)) for _ in range(args.cards)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        runs = (("off", None, 0), ("1 in 10, no memory", 10, 0), ("1 in 10", 10, 1), ("every call", 1, 1))
+        for label, sample, frames in runs:
+            profiler = Profiler()
+            if sample is not None:
+                profiler.start(
+                    ProfileConfig(Path(directory), every_readouts=args.cards, sample=sample, memory_frames=frames)
+                )
+            pipeline = GradingPipeline(courses, lambda grade: None, profiler=profiler)
+            start = time.perf_counter()
+            for readout in readouts:
+                pipeline.grade(readout)
+                profiler.readout_done()
+            elapsed = time.perf_counter() - start
+            profiler.stop()
+            print(f"profiling {label:>18}: {elapsed / args.cards * 1e6:8.1f} us per card")
+
+
+if __name__ == "__main__":
+    main()
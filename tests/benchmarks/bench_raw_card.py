@@ -0,0 +1,84 @@
+# What keeping the card memory (utils/raw_card.py) costs and saves. Per card: decoding everything up front the
+# way the readers used to (SIReader._decode_carddata + InputData.from_si_result) against InputData.from_raw,
+# which only reads the card number, start, finish and controls, with and without the punch times asked for
+# later, and both followed by grading. Then a journal of each kind, replayed and regraded: punches out of JSON
+# against the card memory decoded again.
+#
+#   python -m tests.benchmarks.bench_raw_card [--cards 5000]
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from sportident import SIReader
+
+from easysnec.utils.grading import COURSES, CourseIndex, InputData
+from easysnec.utils.journal import ReadoutJournal, replay, replay_grades
+from easysnec.utils.raw_card import RawCard
+from easysnec.utils.si_simulator import encode_card, generate_cards
+
+READ_AT = dt.datetime(2025, 3, 14, 16, 0)
+
+
+def eager(raw: RawCard) -> InputData:
+    return InputData.from_si_result(SIReader._decode_carddata(raw.data, raw.card_type, raw.reftime))
+
+
+def with_times(raw: RawCard) -> InputData:
+    readout = InputData.from_raw(raw)
+    _ = readout.punches
+    return readout
+
+
+def per_card(make, raws: list[RawCard], index: CourseIndex | None = None) -> float:
+    start = time.perf_counter()
+    for raw in raws:
+        readout = make(raw)
+        if index is not None:
+            _ = readout.score_against(readout.get_closest_course(index)).status
+    return (time.perf_counter() - start) / len(raws)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=5000)
+    args = parser.parse_args()
+
+    cards = generate_cards(random.Random(4), args.cards, now=READ_AT)
+    raws = [RawCard("SI9", encode_card(card), READ_AT) for card in cards]
+    index = CourseIndex(COURSES)
+    print(f"{args.cards} SI9 cards, {sum(len(card.punches) for card in cards) / len(cards):.1f} punches each")
+
+    print(f"{'':<32}{'decode µs/card':>16}{'+ grade µs/card':>17}")
+    for name, make in (
+        ("decode everything", eager),
+        ("from_raw", InputData.from_raw),
+        ("from_raw, then punch times", with_times),
+    ):
+        print(f"{name:<32}{per_card(make, raws) * 1e6:>16.1f}{per_card(make, raws, index) * 1e6:>17.1f}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, make in (("punches (json)", eager), ("card memory", InputData.from_raw)):
+            path = Path(directory) / f"{name}.sqlite3"
+            with ReadoutJournal(path) as journal:
+                for raw in raws:
+                    journal.append(make(raw))
+
+            start = time.perf_counter()
+            readouts = list(replay(path))
+            replayed = time.perf_counter() - start
+            replay_grades(readouts, COURSES)
+            regraded = time.perf_counter() - start
+            print(
+                f"journal of {name:<16} replay {replayed:.3f}s, + regrade {regraded:.3f}s, "
+                f"{path.stat().st_size / len(raws):.0f} bytes/readout"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# A re-dipped card: full grading (course match + Grade + scoring_output) vs. a ReadoutCache hit.
+#
+#   python -m tests.benchmarks.bench_readout_cache [--courses 500] [--controls 20]
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+import uuid
+
+from easysnec.utils.course_index import CourseIndex
+from easysnec.utils.grading import InputData
+from easysnec.utils.readout_cache import ReadoutCache
+
+from .bench_grading import make_courses, make_readout
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--courses", type=int, default=500)
+    parser.add_argument("--controls", type=int, default=20)
+    parser.add_argument("--cards", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(17)
+    courses = CourseIndex(make_courses(rng, args.courses, args.controls))
+    readouts = [make_readout(rng, rng.choice(courses.courses)) for _ in range(args.cards)]
+    redips = [
+        InputData(r.card_id, r.start_time, r.finish_time, r.punches, uuid.uuid4(), r.reader_id) for r in readouts
+    ]
+
+    cache = ReadoutCache(maxsize=args.cards)
+    start = time.perf_counter()
+    for readout in readouts:
+        grade = readout.score_against(readout.get_closest_course(courses))
+        _ = grade.scoring_output
+        cache.put(readout, grade)
+    graded = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for readout in redips:
+        assert cache.get(readout) is not None
+    cached = time.perf_counter() - start
+
+    print(f"grade:     {graded / args.cards * 1e6:8.1f} us per card")
+    print(f"cache hit: {cached / args.cards * 1e6:8.1f} us per card ({cache.stats()})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Regrading an archive on a process pool (utils/regrade.py): speedup against the number of worker processes,
+# over a synthetic corpus of readouts against a big course set (so course matching, the part that scales, is
+# most of the work). Also the one-Grade-at-a-time loop the export command used before, for reference. Every
+# run checks it got the same answers as the one before.
+#
+#   python -m tests.benchmarks.bench_regrade [--readouts 100000] [--courses 200] [--workers 1 2 4 8]
+#
+# Speedup can't be more than the number of cores, whatever --workers says. The core count is printed first.
+# "main cpu" is the cpu time this process spent (cutting chunks, shipping them, turning answers into Grades),
+# which is what's left once the workers are spread over enough cores: one worker's seconds over it is the
+# most any number of cores can give.
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import time
+
+from easysnec.utils.course_index import CourseIndex
+from easysnec.utils.regrade import CHUNK_SIZE, regrade
+
+from .bench_grading import make_courses, make_readout
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readouts", type=int, default=100_000)
+    parser.add_argument("--courses", type=int, default=200)
+    parser.add_argument("--length", type=int, default=12, help="controls per course")
+    parser.add_argument("--workers", type=int, nargs="+", default=None, help="default: 1, 2, 4... up to the cores")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    workers = args.workers or [1 << i for i in range(cores.bit_length()) if 1 << i <= cores]
+    rng = random.Random(1)
+    courses = make_courses(rng, args.courses, args.length)
+    readouts = [make_readout(rng, rng.choice(courses)) for _ in range(args.readouts)]
+    index = CourseIndex(courses)
+    print(f"{cores} cores, {args.readouts} readouts, {args.courses} courses of {args.length} controls")
+
+    start = time.perf_counter()
+    expected = [
+        (grade.course.course_name, grade.status, grade.score)
+        for grade in (readout.score_against(readout.get_closest_course(index)) for readout in readouts)
+    ]
+    one_by_one = time.perf_counter() - start
+    print(f"{'one Grade at a time':<22}{one_by_one:>8.2f}s")
+
+    print(f"{'workers':<10}{'seconds':>10}{'main cpu':>10}{'readouts/s':>12}{'speedup':>9}")
+    single = None
+    for count in workers:
+        start, cpu = time.perf_counter(), time.process_time()
+        got = [
+            (grade.course.course_name, grade.status, grade.score)
+            for grade in regrade(readouts, index, workers=count, chunk_size=args.chunk_size)
+        ]
+        seconds, cpu = time.perf_counter() - start, time.process_time() - cpu
+        assert got == expected, f"{count} workers graded differently"
+        single = single or seconds
+        print(f"{count:<10}{seconds:>10.2f}{cpu:>10.2f}{args.readouts / seconds:>12.0f}{single / seconds:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Appending results to a ListView that already shows thousands of them: time per append (model insert plus
+# the view catching up) and how many delegates the view actually holds.
+#
+#   QT_QPA_PLATFORM=offscreen python -m tests.benchmarks.bench_results_model [--rows 10000]
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+
+from PySide6.QtGui import QGuiApplication
+from PySide6.QtQml import QQmlApplicationEngine
+from PySide6.QtQuick import QQuickItem
+from PySide6.QtTest import QTest
+
+from easysnec.utils.grading import COURSES
+from easysnec.utils.results_model import ResultsModel
+
+from ..test_grading import generate_input_from_station_list
+
+VIEW = b"""
+import QtQuick
+import QtQuick.Controls
+ApplicationWindow {
+    width: 260; height: 480; visible: true
+    ListView {
+        objectName: "view"
+        anchors.fill: parent
+        model: results
+        reuseItems: true
+        onCountChanged: positionViewAtEnd()
+        delegate: Label {
+            required property int cardId
+            required property string scoringOutput
+            width: ListView.view.width
+            text: cardId + "\\n" + scoringOutput
+        }
+    }
+}
+"""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000)
+    args = parser.parse_args()
+
+    app = QGuiApplication(sys.argv)
+    model = ResultsModel()
+    engine = QQmlApplicationEngine()
+    engine.rootContext().setContextProperty("results", model)
+    engine.loadData(VIEW)
+    window = engine.rootObjects()[0]
+    view = window.findChild(QQuickItem, "view")
+
+    grades = []
+    for stations in ([39, 31, 32, 35, 37], [39, 32, 31], [31, 32, 35, 37, 39]):
+        input_data = generate_input_from_station_list(stations)
+        grades.append(input_data.score_against(input_data.get_closest_course(COURSES)))
+
+    QTest.qWaitForWindowExposed(window)
+    frames = []
+    window.frameSwapped.connect(lambda: frames.append(time.perf_counter()))
+
+    times = []
+    for row in range(args.rows):
+        start = time.perf_counter()
+        model.append(grades[row % len(grades)])
+        # wait for the frame that shows the new row
+        rendered = len(frames)
+        while len(frames) == rendered:
+            app.processEvents()
+        times.append(frames[-1] - start)
+        if row + 1 in (100, 1000, args.rows):
+            recent = times[-100:]
+            # the content item also holds the pooled (hidden) delegates waiting to be reused
+            delegates = view.childItems()[0].childItems()
+            print(
+                f"{row + 1:>6} rows: append to frame median {statistics.median(recent) * 1e3:.2f} ms, "
+                f"max {max(recent) * 1e3:.2f} ms, {sum(item.isVisible() for item in delegates)} visible "
+                f"/ {len(delegates)} delegates"
+            )
+    del view, window
+    engine.deleteLater()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Score-O for a whole event's worth of cards: the old two-sets-per-card count, the compiled course one card at
+# a time (what Grade.score does), and the compiled course over the whole batch (what grade_many does).
+#
+#   python -m tests.benchmarks.bench_score_o [--cards 10000] [--controls 30]
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import random
+import time
+import uuid
+
+from easysnec.utils.grading import Course, InputData
+from easysnec.utils.score_o import compile_score_o
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=10_000)
+    parser.add_argument("--controls", type=int, default=30)
+    args = parser.parse_args()
+
+    rng = random.Random(16)
+    controls = rng.sample(range(31, 256), args.controls)
+    course = Course(
+        "score",
+        True,
+        controls,
+        time_limit=dt.timedelta(minutes=60),
+        penalty_per_minute=1,
+        control_values={station: rng.choice((10, 20, 30)) for station in controls},
+    )
+    start = dt.datetime(2025, 3, 14, 9, 30)
+    readouts = [
+        InputData(
+            card_id=card_id,
+            start_time=start,
+            finish_time=start + dt.timedelta(minutes=rng.uniform(30, 75)),
+            punches=[(station, start) for station in rng.sample(range(31, 256), rng.randint(5, 40))],
+            reading_id=uuid.uuid4(),
+        )
+        for card_id in range(args.cards)
+    ]
+
+    begin = time.perf_counter()
+    for readout in readouts:
+        len(set(course.stations).intersection(set(readout.stations)))
+    sets = time.perf_counter() - begin
+
+    compiled = compile_score_o(course)
+    begin = time.perf_counter()
+    for readout in readouts:
+        _ = compiled.score(readout).score
+    single = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    compiled.score_many(readouts)
+    batch = time.perf_counter() - begin
+
+    print(f"{args.cards} cards, {args.controls} controls (values and penalties only in the compiled runs)")
+    for name, seconds in (("two sets per card", sets), ("compiled, per card", single), ("compiled, batch", batch)):
+        print(f"{name:<20}{seconds * 1e3:>8.1f} ms  {seconds / args.cards * 1e6:>6.2f} us/card")
+
+
+if __name__ == "__main__":
+    main()
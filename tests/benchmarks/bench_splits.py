@@ -0,0 +1,93 @@
+# Per-card cost of keeping leg statistics (utils/splits.py) as a course's field grows: SplitAnalysis.add
+# (Welford + P² quantiles, O(legs) per card) against keeping every leg time and working mean, stdev and
+# quartiles out again over the whole field after each card. Also how far the P² medians end up from the exact
+# ones.
+#
+#   python -m tests.benchmarks.bench_splits [--controls 20] [--field 100 1000 10000]
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import random
+import statistics
+import time
+import uuid
+
+import numpy as np
+
+from easysnec.utils.grading import Course, InputData
+from easysnec.utils.splits import SplitAnalysis
+
+
+def make_field(rng: random.Random, course: Course, count: int) -> list:
+    # every runner gets every control, each leg lognormal around its own typical time
+    typical = [rng.uniform(60, 400) for _ in range(len(course.stations) + 1)]
+    start = dt.datetime(2025, 3, 14, 9, 30)
+    grades = []
+    for card in range(count):
+        moment, punches = start, []
+        for control, leg in zip(course.stations, typical):
+            moment += dt.timedelta(seconds=rng.lognormvariate(0, 0.3) * leg)
+            punches.append((control, moment))
+        finish = moment + dt.timedelta(seconds=rng.lognormvariate(0, 0.3) * typical[-1])
+        readout = InputData(card, start, finish, punches, uuid.uuid4())
+        grade = readout.score_against(course)
+        _ = grade.legs  # worked out by grading either way, not what's being measured here
+        grades.append(grade)
+    return grades
+
+
+def recompute(field: list[list[float]], grade) -> list[float | None]:
+    # the alternative: keep every leg time and go over all of them again (with numpy, not the statistics module)
+    lost = []
+    for times, leg in zip(field, grade.legs):
+        times.append(leg.seconds)
+        values = np.asarray(times)
+        values.mean(), values.std(ddof=1) if len(values) > 1 else 0.0
+        quartiles = np.quantile(values, (0.25, 0.5, 0.75))
+        lost.append(leg.seconds - quartiles[1])
+    return lost
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--controls", type=int, default=20)
+    parser.add_argument("--field", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--sample", type=int, default=100, help="cards timed at the end of each field")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    course = Course("bench", False, rng.sample(range(31, 256), args.controls))
+    print(f"{args.controls + 1} legs per card")
+    print(f"{'field':>8}{'add µs/card':>14}{'recompute µs/card':>19}{'worst median error':>20}")
+    for size in args.field:
+        grades = make_field(rng, course, size)
+        head, tail = grades[: -args.sample], grades[-args.sample :]
+
+        analysis = SplitAnalysis()
+        for grade in head:
+            analysis.add(grade)
+        start = time.perf_counter()
+        for grade in tail:
+            analysis.add(grade)
+        incremental = (time.perf_counter() - start) / len(tail)
+
+        field: list[list[float]] = [[] for _ in grade.legs]
+        for grade in head:
+            recompute(field, grade)
+        start = time.perf_counter()
+        for grade in tail:
+            recompute(field, grade)
+        full = (time.perf_counter() - start) / len(tail)
+
+        errors = [
+            abs(summary.median - statistics.median(times)) / statistics.median(times)
+            for summary, times in zip(analysis.legs("bench"), field)
+            if summary.median is not None
+        ]
+        print(f"{size:>8}{incremental * 1e6:>14.1f}{full * 1e6:>19.1f}{max(errors):>19.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# End-to-end load test against simulated SI stations on ptys: the real reader loop (StationReader, what
+# ReaderWorker.spin_thread runs) -> GradingPipeline -> grade. Reports sustained cards/second and the latency
+# from card insertion to finished grade.
+#
+#   python -m tests.benchmarks.bench_station_load [--stations 4] [--cards 200] [--rate 0] [--errors 0.05]
+
+from __future__ import annotations
+
+import argparse
+import random
+import threading
+import time
+
+from easysnec.pipeline import GradingPipeline
+from easysnec.reader import StationReader
+from easysnec.utils.grading import COURSES
+from easysnec.utils.metrics import METRICS
+from easysnec.utils.si_simulator import (
+    SimulatedStation,
+    SimulatorConfig,
+    generate_cards,
+)
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stations", type=int, default=4)
+    parser.add_argument("--cards", type=int, default=200, help="cards per station")
+    parser.add_argument("--rate", type=float, default=0.0, help="cards per second per station, 0 = flat out")
+    parser.add_argument("--errors", type=float, default=0.05, help="share of early removals and of bad crcs")
+    args = parser.parse_args()
+
+    graded_at: dict[int, float] = {}
+
+    def on_grade(grade) -> None:
+        graded_at[grade.input_data.card_id] = time.perf_counter()
+
+    pipeline = GradingPipeline(COURSES, on_grade)
+    grader = threading.Thread(target=pipeline.run)
+    grader.start()
+
+    stations = []
+    for index in range(args.stations):
+        cards = generate_cards(random.Random(index), args.cards, first_card=1_000_000 + index * args.cards)
+        config = SimulatorConfig(args.rate, args.errors, args.errors, seed=index)
+        stations.append(SimulatedStation(cards, config).start())
+
+    readers = [StationReader(station.port, pipeline.submit) for station in stations]
+    threads = [threading.Thread(target=reader.run) for reader in readers]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for station in stations:
+        station.finished.wait()
+    for reader in readers:
+        reader.stop()
+    for thread in threads:
+        thread.join()
+    pipeline.close()
+    grader.join()
+    elapsed = time.perf_counter() - start
+
+    inserted_at = {}
+    for station in stations:
+        inserted_at.update(station.stats.inserted_at)
+        station.stop()
+    latencies = [graded_at[card] - inserted_at[card] for card in graded_at]
+    failed = sum(station.stats.removed_early + station.stats.bad_crc for station in stations)
+
+    print(f"{args.stations} stations, {len(graded_at)} cards graded ({failed} failed reads) in {elapsed:.2f}s")
+    print(f"throughput {len(graded_at) / elapsed:.1f} cards/s")
+    print(
+        "insert -> graded latency: "
+        + ", ".join(f"p{int(q * 100)} {percentile(latencies, q) * 1000:.1f} ms" for q in (0.5, 0.95, 0.99))
+    )
+    print("per stage:\n  " + METRICS.summary().replace("; ", "\n  "))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+from pyxdameraulevenshtein import damerau_levenshtein_distance
+
+from easysnec.utils import grading
+from easysnec.utils.alignment import Edit, align
+from easysnec.utils.course_index import CourseIndex
+from easysnec.utils.grading import (
+    COURSES,
+    EMOJI_MAPPING,
+    Course,
+    Grade,
+    ScoreType,
+    SuccessStatus,
+)
+
+from .test_grading import generate_input_from_station_list
+
+
+def replay(course, punches, alignment):
+    # check the edits really turn course into punches: everything between edits matches one to one
+    i = j = 0
+    for step in alignment.edits:
+        if step.course_index is not None:
+            while i < step.course_index:
+                assert course[i] == punches[j]
+                i, j = i + 1, j + 1
+        if step.punch_index is not None:
+            while j < step.punch_index:
+                assert course[i] == punches[j]
+                i, j = i + 1, j + 1
+        match step.edit:
+            case Edit.MISSED:
+                i += 1
+            case Edit.EXTRA:
+                j += 1
+            case Edit.WRONG:
+                assert course[i] != punches[j]
+                i, j = i + 1, j + 1
+            case Edit.SWAPPED:
+                assert (course[i], course[i + 1]) == (punches[j + 1], punches[j])
+                i, j = i + 2, j + 2
+    assert list(course[i:]) == list(punches[j:])
+
+
+def test_alignment_distance_and_traceback_agree_with_osa():
+    rng = random.Random(7)
+    for _ in range(2000):
+        course = [rng.randint(1, 8) for _ in range(rng.randint(0, 10))]
+        punches = list(course)
+        for _ in range(rng.randint(0, 4)):
+            match rng.randrange(4):
+                case 0 if punches:
+                    punches.pop(rng.randrange(len(punches)))
+                case 1:
+                    punches.insert(rng.randint(0, len(punches)), rng.randint(1, 8))
+                case 2 if punches:
+                    punches[rng.randrange(len(punches))] = rng.randint(1, 8)
+                case _ if len(punches) > 1:
+                    k = rng.randrange(len(punches) - 1)
+                    punches[k], punches[k + 1] = punches[k + 1], punches[k]
+        alignment = align(course, punches)
+        assert alignment.distance == damerau_levenshtein_distance(course, punches)
+        # every edit (a swap included) costs one
+        assert alignment.distance == len(alignment.edits)
+        replay(course, punches, alignment)
+
+
+@pytest.mark.parametrize(
+    "punches, edits",
+    [
+        ([1, 2, 3, 4, 5], []),
+        ([1, 3, 2, 4, 5], [(Edit.SWAPPED, 1, 1)]),
+        ([1, 2, 4, 5], [(Edit.MISSED, 2, None)]),
+        ([1, 2, 3, 9, 4, 5], [(Edit.EXTRA, None, 3)]),
+        ([1, 2, 9, 4, 5], [(Edit.WRONG, 2, 2)]),
+        ([], [(Edit.MISSED, i, None) for i in range(5)]),
+    ],
+)
+def test_alignment_edits(punches, edits):
+    alignment = align([1, 2, 3, 4, 5], punches)
+    assert [(step.edit, step.course_index, step.punch_index) for step in alignment.edits] == edits
+
+
+def test_grade_reports_out_of_order_controls():
+    course = Course("Crab", False, [39, 31, 32, 35, 37])
+
+    swapped = Grade(generate_input_from_station_list([39, 32, 31, 35, 37]), course, ScoreType.CLASSIC_O)
+    assert swapped.status is SuccessStatus.MISSES
+    assert swapped.missed_checkpoints == swapped.extra_checkpoints == []
+    assert swapped.out_of_order_checkpoints == ["🦁", "🐸"]
+    assert swapped.scoring_output == "Out of order: 🦁, 🐸"
+
+    # 39 punched last instead of first, 35 missed, 36 extra
+    late = Grade(generate_input_from_station_list([31, 32, 36, 37, 39]), course, ScoreType.CLASSIC_O)
+    assert late.missed_checkpoints == ["🐝"]
+    assert late.extra_checkpoints == ["🐦"]
+    assert late.out_of_order_checkpoints == ["🦀"]
+    assert late.scoring_output == "Missing checkpoints: 🐝\nExtra checkpoints: 🐦\nOut of order: 🦀"
+
+
+def test_missed_and_extra_from_the_alignment_are_every_unpunched_control_and_off_course_punch():
+    rng = random.Random(11)
+    for _ in range(500):
+        course = Course("Random", False, [rng.randint(31, 40) for _ in range(rng.randint(1, 8))])
+        punches = [rng.randint(31, 44) for _ in range(rng.randint(0, 10))]
+        grade = Grade(generate_input_from_station_list(punches), course, ScoreType.CLASSIC_O)
+        if grade.status is SuccessStatus.SUCCESS:
+            continue
+        assert grade.missed_checkpoints == [
+            EMOJI_MAPPING.get(station, str(station)) for station in course.stations if station not in punches
+        ]
+        assert grade.extra_checkpoints == [
+            EMOJI_MAPPING.get(station, str(station)) for station in punches if station not in course.stations
+        ]
+
+
+def test_grading_against_the_closest_course_keeps_the_match_alignment(monkeypatch):
+    readout = generate_input_from_station_list([39, 32, 31, 36, 37])
+    course, alignment = CourseIndex(COURSES).closest_aligned(readout.station_codes)
+    assert course.course_name == "Crab"
+    assert alignment == align(course.stations, readout.station_codes)
+
+    grade = readout.grade_against_closest(CourseIndex(COURSES))
+
+    def no_realignment(*args):
+        raise AssertionError("the grade should reuse the course match's alignment")
+
+    monkeypatch.setattr(grading, "align", no_realignment)
+    assert grade.missed_checkpoints == ["🐝"]
+    assert grade.extra_checkpoints == ["🐦"]
+    assert grade.out_of_order_checkpoints == ["🦁", "🐸"]
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+
+import pytest
+from sportident import SIReader, SIReaderException
+
+from easysnec.async_reader import AsyncReaderConfig, AsyncReaderHub, FrameParser
+from easysnec.headless import HeadlessStation
+from easysnec.utils.si_simulator import (
+    SimulatedStation,
+    SimulatorConfig,
+    frame,
+    generate_cards,
+)
+
+
+def test_frames_split_anywhere():
+    stream = (
+        SIReader.WAKEUP
+        + frame(SIReader.C_SET_MS, b"M")
+        + SIReader.NAK
+        + frame(SIReader.C_GET_SI9, bytes(129), corrupt=True)
+        + SIReader.STX
+        + frame(SIReader.C_SI9_DET, b"\x00\x0f\x42\x41")
+    )
+    for cut in range(len(stream)):
+        parser = FrameParser()
+        frames = parser.feed(stream[:cut]) + parser.feed(stream[cut:])
+        assert frames[0] == (SIReader.C_SET_MS[0], b"M")
+        assert isinstance(frames[1], SIReaderException) and isinstance(frames[2], SIReaderException)
+        assert frames[3] == (SIReader.C_SI9_DET[0], b"\x00\x0f\x42\x41")
+        assert len(frames) == 4
+
+
+@pytest.mark.skipif(not hasattr(os, "openpty"), reason="needs a pty")
+def test_one_thread_reads_many_stations():
+    cards = [generate_cards(random.Random(index), 10, first_card=1_000_001 + 1000 * index) for index in range(4)]
+    stations = [
+        SimulatedStation(station_cards, SimulatorConfig(removed_early=0.15, bad_crc=0.15, seed=index))
+        for index, station_cards in enumerate(cards)
+    ]
+    readouts = []
+    threads = threading.active_count()
+    hub = AsyncReaderHub(readouts.append)
+    for station in stations:
+        station.start()
+    try:
+        hub.start()
+        hub.attach_readers([station.port for station in stations])
+        for station in stations:
+            assert station.finished.wait(30)
+        # the simulators' threads and the hub's, nothing per station
+        assert threading.active_count() == threads + len(stations) + 1
+    finally:
+        hub.stop()
+        for station in stations:
+            station.stop()
+
+    for station in stations:
+        stats = station.stats
+        assert stats.acked + stats.removed_early + stats.bad_crc == stats.inserted == 10
+
+    # exactly the cards the hub acked made it through, from the right station, with their punches intact
+    by_number = {
+        card.card_number: (card, station.port)
+        for station, station_cards in zip(stations, cards)
+        for card in station_cards
+    }
+    assert sorted(input_data.card_id for input_data in readouts) == sorted(
+        number for station in stations for number in station.stats.acked_at
+    )
+    for input_data in readouts:
+        card, port = by_number[input_data.card_id]
+        assert input_data.reader_id == port
+        assert (input_data.start_time, input_data.finish_time) == (card.start_time, card.finish_time)
+        assert input_data.punches == card.punches
+
+
+def test_missing_port_gives_up_and_detach_cancels(tmp_path):
+    hub = AsyncReaderHub(lambda input_data: None, AsyncReaderConfig(connect_attempts=2, connect_retry=0.01))
+    hub.start()
+    try:
+        hub.attach_readers([str(tmp_path / "nothing here")])
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            tasks = [task for task, _ in list(hub.readers.values())]
+            if tasks and all(task.done() for task in tasks):
+                break
+            time.sleep(0.01)
+        assert [task.done() for task, _ in hub.readers.values()] == [True]
+        [(gave_up, _)] = hub.readers.values()
+
+        # asking for the port again starts a new reader instead of keeping the one that gave up
+        hub.attach_readers([str(tmp_path / "nothing here")])
+        time.sleep(0.05)
+        assert [task for task, _ in hub.readers.values()] != [gave_up]
+        hub.attach_readers([])
+        time.sleep(0.05)
+        assert hub.readers == {}
+    finally:
+        hub.stop()
+    assert hub.loop.is_closed()
+
+
+@pytest.mark.skipif(not hasattr(os, "openpty"), reason="needs a pty")
+def test_headless_station_on_the_hub(tmp_path):
+    grades = []
+    with SimulatedStation(generate_cards(random.Random(5), 5)) as station:
+        headless = HeadlessStation(
+            [station.port], tmp_path / "journal.sqlite3", on_grade=grades.append, reader_backend="async"
+        )
+        headless.start()
+        try:
+            assert station.finished.wait(30)
+        finally:
+            headless.shutdown()
+    assert len(grades) == station.stats.acked == 5
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from .benchmarks.bench_grading import compare, run_suite
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    baseline = {"fast": 1.0, "steady": 1.0, "slow": 1.0, "gone": 1.0}
+    results = {"fast": 0.5, "steady": 1.1, "slow": 1.3, "new": 1.0}
+    regressions, improvements = compare(baseline, results, threshold=0.15)
+    assert regressions == [("slow", 1.3)]
+    assert improvements == [("fast", 0.5)]
+
+
+def test_suite_covers_every_grade_property(monkeypatch):
+    from .benchmarks import bench_grading
+
+    monkeypatch.setattr(bench_grading, "QUICK_COURSE_COUNTS", (3,))
+    monkeypatch.setattr(bench_grading, "QUICK_PUNCH_LENGTHS", (4,))
+    monkeypatch.setattr(bench_grading, "seconds_per_call", lambda fn, calls, repeat: fn() and 1.0)
+    results = run_suite(quick=True)
+    assert set(results) == {
+        "get_closest_course[list] courses=3 punches=4",
+        "get_closest_course[index] courses=3 punches=4",
+        *(f"Grade.{prop}[CLASSIC_O] punches=4" for prop in bench_grading.GRADE_PROPERTIES),
+        "Grade.score[SCORE_O] punches=4",
+    }
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import json
+import socket
+import time
+
+from easysnec.utils.broadcast import ResultBroadcaster
+from easysnec.utils.grading import COURSES
+from easysnec.utils.metrics import Metrics
+
+from .test_grading import generate_input_from_station_list
+
+
+def grade(stations: list[int]):
+    readout = generate_input_from_station_list(stations)
+    return readout.score_against(readout.get_closest_course(COURSES))
+
+
+def connect(broadcaster: ResultBroadcaster):
+    client = socket.create_connection(("127.0.0.1", broadcaster.port), timeout=5)
+    return client, client.makefile("rb")
+
+
+def wait_for(condition, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_bursts_are_batched_and_late_joiners_get_a_snapshot():
+    broadcaster = ResultBroadcaster(port=0, batch_interval=0.1)
+    broadcaster.start()
+    try:
+        early, early_lines = connect(broadcaster)
+        assert json.loads(early_lines.readline()) == {"type": "snapshot", "first": 1, "results": []}
+        assert wait_for(lambda: broadcaster.clients == 1)
+
+        for stations in ([39, 31, 32, 35, 37], [31, 33], [33, 32, 40, 38, 34]):
+            broadcaster.write(grade(stations))
+        batch = json.loads(early_lines.readline())
+        assert (batch["type"], batch["first"], len(batch["results"])) == ("results", 1, 3)
+        assert [result["status"] for result in batch["results"]] == ["SUCCESS", "MISSES", "SUCCESS"]
+
+        late, late_lines = connect(broadcaster)
+        snapshot = json.loads(late_lines.readline())
+        assert snapshot["type"] == "snapshot" and snapshot["results"] == batch["results"]
+
+        broadcaster.write(grade([31]))
+        for lines in (early_lines, late_lines):
+            assert json.loads(lines.readline())["first"] == 4
+
+        # asking again
+        late.sendall(b'{"type": "snapshot"}\n')
+        assert len(json.loads(late_lines.readline())["results"]) == 4
+        early.close()
+        late.close()
+    finally:
+        broadcaster.close()
+
+
+def test_a_slow_client_is_dropped_not_waited_for():
+    metrics = Metrics()
+    broadcaster = ResultBroadcaster(port=0, batch_interval=0, client_queue=8, metrics=metrics)
+    broadcaster.start()
+    try:
+        # never reads, with as little socket buffer as the os allows
+        slow, _ = connect(broadcaster)
+        slow.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024)
+        fast, fast_lines = connect(broadcaster)
+        assert wait_for(lambda: broadcaster.clients == 2)
+
+        results = [grade([39, 31, 32, 35, 37]) for _ in range(5)]
+        received = 0
+        json.loads(fast_lines.readline())  # snapshot
+        # a few at a time, so the fast client never has more than a handful of messages queued
+        for _ in range(5000):
+            for runner_grade in results:
+                broadcaster.write(runner_grade)
+            while received < broadcaster.count:
+                received += len(json.loads(fast_lines.readline())["results"])
+            if metrics.counters.get("broadcast_dropped_clients"):
+                break
+
+        assert metrics.counters == {"broadcast_dropped_clients": 1}
+        assert broadcaster.clients == 1
+        slow.close()
+        fast.close()
+    finally:
+        broadcaster.close()
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+import pytest
+import serial
+
+from easysnec.utils.card_wait import (
+    CardWaitConfig,
+    WaitMode,
+    wait_for_card,
+    wait_for_input,
+)
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "openpty"), reason="needs a pty")
+
+
+class FakeSI:
+    # just enough of SIReaderReadout for wait_for_card: any byte from the "station" is a card event
+    def __init__(self, serial_port):
+        self._serial = serial_port
+
+    def poll_sicard(self):
+        if self._serial.in_waiting == 0:
+            return False
+        self._serial.read(self._serial.in_waiting)
+        return True
+
+
+@pytest.fixture
+def pty_port():
+    controller, device = os.openpty()
+    port = serial.Serial(os.ttyname(device), timeout=0)
+    yield controller, port
+    port.close()
+    os.close(controller)
+    os.close(device)
+
+
+@pytest.mark.parametrize("mode", [WaitMode.SELECT, WaitMode.BACKOFF])
+def test_wait_for_input_times_out(pty_port, mode):
+    _, port = pty_port
+    start = time.monotonic()
+    assert not wait_for_input(port, 0.05, CardWaitConfig(mode=mode))
+    assert time.monotonic() - start >= 0.04
+
+
+@pytest.mark.parametrize("mode", [WaitMode.AUTO, WaitMode.SELECT, WaitMode.BACKOFF])
+def test_wait_for_card_wakes_on_input(pty_port, mode):
+    controller, port = pty_port
+    threading.Timer(0.05, os.write, (controller, b"\x02")).start()
+
+    start = time.monotonic()
+    assert wait_for_card(FakeSI(port), CardWaitConfig(mode=mode), timeout=2)
+    assert time.monotonic() - start < 1
+
+
+def test_wait_for_card_stops(pty_port):
+    _, port = pty_port
+    stop = threading.Event()
+    threading.Timer(0.05, stop.set).start()
+
+    assert not wait_for_card(FakeSI(port), CardWaitConfig(slice_timeout=0.01), stop)
+    assert stop.is_set()
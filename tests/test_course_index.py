@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+from pyxdameraulevenshtein import damerau_levenshtein_distance
+
+from easysnec.utils.course_index import CourseIndex, batch_distances
+from easysnec.utils.grading import COURSES, Course
+
+from .test_grading import generate_input_from_station_list
+
+
+def brute_force(stations, courses):
+    return min(courses, key=lambda course: damerau_levenshtein_distance(stations, course.stations))
+
+
+def random_courses(rng, count, controls=range(31, 61)):
+    return [
+        Course(f"course-{i}", False, rng.sample(controls, rng.randint(3, 12)))
+        for i in range(count)
+    ]
+
+
+def test_closest_matches_get_closest_course():
+    index = CourseIndex(COURSES)
+    for stations in ([39, 31, 32, 35, 37], [39, 31, 2001, 35, 37], [38, 31, 32, 36, 37], [], [99]):
+        input_data = generate_input_from_station_list(stations)
+        assert input_data.get_closest_course(index) == input_data.get_closest_course(COURSES)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_closest_matches_brute_force(seed):
+    rng = random.Random(seed)
+    courses = random_courses(rng, 300)
+    # duplicates and near-duplicates make for lots of ties
+    courses += [Course(f"dupe-{i}", False, list(c.stations)) for i, c in enumerate(courses[:20])]
+    index = CourseIndex(courses)
+
+    for _ in range(200):
+        stations = list(rng.choice(courses).stations)
+        for _ in range(rng.randint(0, 4)):
+            match rng.randint(0, 2):
+                case 0 if stations:
+                    stations.pop(rng.randrange(len(stations)))
+                case 1:
+                    stations.insert(rng.randint(0, len(stations)), rng.randint(25, 70))
+                case _ if len(stations) > 1:
+                    i = rng.randrange(len(stations) - 1)
+                    stations[i], stations[i + 1] = stations[i + 1], stations[i]
+
+        assert index.closest(stations) is brute_force(stations, courses)
+
+
+def test_lower_bounds_never_exceed_distance():
+    rng = random.Random(7)
+    courses = random_courses(rng, 50)
+    index = CourseIndex(courses)
+    stations = [rng.randint(25, 70) for _ in range(8)]
+
+    for bound, course in zip(index.lower_bounds(stations), courses):
+        assert bound <= damerau_levenshtein_distance(stations, course.stations)
+
+
+def test_empty_index():
+    with pytest.raises(ValueError):
+        CourseIndex([]).closest([31])
+
+
+def test_batch_distances_match_pairwise():
+    rng = random.Random(11)
+    a_lists = [[rng.randint(30, 40) for _ in range(rng.randint(0, 12))] for _ in range(100)]
+    b_lists = [course.stations for course in COURSES] + [[]]
+
+    distances = batch_distances(a_lists, b_lists)
+    for i, a in enumerate(a_lists):
+        for j, b in enumerate(b_lists):
+            assert distances[i, j] == damerau_levenshtein_distance(a, b)
+
+
+@pytest.mark.parametrize("count", [10, 200])
+def test_closest_indices_match_closest_index(count):
+    rng = random.Random(count)
+    courses = random_courses(rng, count)
+    index = CourseIndex(courses)
+    station_lists = [list(rng.choice(courses).stations) for _ in range(20)]
+    station_lists += [[rng.randint(25, 70) for _ in range(rng.randint(0, 10))] for _ in range(50)]
+
+    assert index.closest_indices(station_lists).tolist() == [
+        index.closest_index(stations) for stations in station_lists
+    ]
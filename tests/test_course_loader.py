@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import datetime as dt
+import uuid
+
+from easysnec.utils import course_loader
+from easysnec.utils.course_loader import load_courses, parse_courses
+from easysnec.utils.grading import Course, InputData, ScoreType
+
+IOF_COURSE_DATA = """<?xml version="1.0" encoding="UTF-8"?>
+<CourseData xmlns="http://www.orienteering.org/datastandard/3.0" iofVersion="3.0">
+  <Event><Name>Test event</Name></Event>
+  <RaceCourseData>
+    <Control><Id>31</Id></Control>
+    <Course>
+      <Name>Short</Name>
+      <CourseControl type="Start"><Control>S1</Control></CourseControl>
+      <CourseControl type="Control"><Control>31</Control></CourseControl>
+      <CourseControl><Control>32</Control><Control>52</Control></CourseControl>
+      <CourseControl type="Finish"><Control>F1</Control></CourseControl>
+    </Course>
+  </RaceCourseData>
+  <RaceCourseData>
+    <Course>
+      <Name>Long</Name>
+      <CourseControl type="Control"><Control>40</Control></CourseControl>
+      <CourseControl type="Control"><Control>41</Control></CourseControl>
+      <CourseControl type="Control"><Control>42</Control></CourseControl>
+    </Course>
+  </RaceCourseData>
+</CourseData>
+"""
+START = dt.datetime(2025, 3, 14, 10, 0)
+
+
+def test_parse_iof_xml(tmp_path):
+    path = tmp_path / "courses.xml"
+    path.write_text(IOF_COURSE_DATA)
+    assert parse_courses(path) == [
+        Course("Short", False, [31, 32]),
+        Course("Long", False, [40, 41, 42]),
+    ]
+
+
+def test_parse_csv_skips_header(tmp_path):
+    path = tmp_path / "courses.csv"
+    path.write_text("course,control 1,control 2\nFrog,31,33\nOwl, 35 ,36,37\n\n")
+    assert parse_courses(path) == [
+        Course("Frog", False, [31, 33]),
+        Course("Owl", False, [35, 36, 37]),
+    ]
+
+
+def test_cache_is_keyed_by_content(tmp_path, monkeypatch):
+    path = tmp_path / "courses.csv"
+    path.write_text("Frog,31,33\n")
+    cache_dir = tmp_path / "cache"
+    assert load_courses(path, cache_dir) == [Course("Frog", False, [31, 33])]
+
+    # same bytes: straight from the cache
+    def fail(path):
+        raise AssertionError("should have hit the cache")
+
+    monkeypatch.setattr(course_loader, "parse_courses", fail)
+    assert load_courses(path, cache_dir) == [Course("Frog", False, [31, 33])]
+
+    # edited file: parsed again
+    monkeypatch.undo()
+    path.write_text("Frog,31,34\n")
+    assert load_courses(path, cache_dir) == [Course("Frog", False, [31, 34])]
+    assert len(list(cache_dir.glob("*.json"))) == 2
+
+
+def test_iof_scores_make_a_score_o_course(tmp_path):
+    path = tmp_path / "score.xml"
+    path.write_text(
+        '<CourseData xmlns="http://www.orienteering.org/datastandard/3.0"><RaceCourseData><Course>'
+        "<Name>Score</Name>"
+        "<CourseControl><Control>31</Control><Score>10</Score></CourseControl>"
+        "<CourseControl><Control>32</Control><Score>30</Score></CourseControl>"
+        "<CourseControl><Control>33</Control></CourseControl>"
+        "</Course></RaceCourseData></CourseData>"
+    )
+    expected = [Course("Score", True, [31, 32, 33], control_values={31: 10, 32: 30})]
+    assert load_courses(path, tmp_path / "cache") == expected
+    # and the same from the cache
+    assert load_courses(path, tmp_path / "cache") == expected
+
+
+def test_time_limit_goes_on_score_o_courses(tmp_path):
+    path = tmp_path / "score.xml"
+    path.write_text(
+        '<CourseData xmlns="http://www.orienteering.org/datastandard/3.0"><RaceCourseData>'
+        "<Course><Name>Score</Name><CourseControl><Control>31</Control><Score>10</Score></CourseControl></Course>"
+        "<Course><Name>Line</Name><CourseControl><Control>32</Control></CourseControl></Course>"
+        "</RaceCourseData></CourseData>"
+    )
+    score, line = load_courses(
+        path, tmp_path / "cache", time_limit=dt.timedelta(minutes=45), penalty_per_minute=2
+    )
+    assert (score.time_limit, score.penalty_per_minute) == (dt.timedelta(minutes=45), 2)
+    assert line == Course("Line", False, [32])
+
+    # and a runner over it loses points
+    late = InputData(
+        card_id=1,
+        start_time=START,
+        finish_time=START + dt.timedelta(minutes=47, seconds=30),
+        punches=[(31, START + dt.timedelta(minutes=10))],
+        reading_id=uuid.uuid4(),
+    )
+    assert late.score_against(score, ScoreType.SCORE_O).score == 10 - 3 * 2
+
+    # the limit isn't cached with the courses, the same file loads without one
+    assert load_courses(path, tmp_path / "cache")[0].time_limit is None
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import csv
+import datetime as dt
+import random
+import sys
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from easysnec import app
+from easysnec.pipeline import GradingPipeline
+from easysnec.utils.export import CsvResultWriter, IofResultListWriter, export_results
+from easysnec.utils.grading import (
+    COURSES,
+    InputData,
+    OutputData,
+    ScoreType,
+    SuccessStatus,
+)
+from easysnec.utils.journal import ReadoutJournal, replay_grades
+from easysnec.utils.splits import SplitAnalysis
+
+from .benchmarks.bench_grade_many import make_readouts
+from .test_grading import generate_input_from_station_list
+
+IOF = "{http://www.orienteering.org/datastandard/3.0}"
+START = dt.datetime(2025, 3, 14, 9, 30)
+
+
+def readout(stations: list[int], card_id: int = 7) -> InputData:
+    return InputData(
+        card_id=card_id,
+        start_time=START,
+        finish_time=START + dt.timedelta(minutes=20),
+        punches=[(station, START + dt.timedelta(minutes=i + 1)) for i, station in enumerate(stations)],
+        reading_id=uuid.uuid4(),
+    )
+
+
+def test_output_data_splits_and_misses():
+    lion = next(course for course in COURSES if course.course_name == "Lion")  # 31, 33, 36, 38, 39
+    output = OutputData.from_grade(readout([31, 36, 33, 38, 39]).score_against(lion))
+    assert output.success_status is SuccessStatus.MISSES
+    assert output.time == dt.timedelta(minutes=20)
+    # 33 was punched, just after 36: missing as a split, not a missed control
+    assert output.missed_checkpoints == []
+    assert output.splits == [(31, 60.0), (33, 180.0), (36, None), (38, 240.0), (39, 300.0)]
+
+    output = OutputData.from_grade(readout([31, 33]).score_against(lion))
+    assert output.missed_checkpoints == [36, 38, 39]
+
+
+def test_csv_export_appends(tmp_path):
+    path = tmp_path / "results.csv"
+    lion = next(course for course in COURSES if course.course_name == "Lion")
+    analysis = SplitAnalysis()
+    first, second = (
+        readout([31, 33, 36, 38, 39]).score_against(lion),
+        readout([31, 33], card_id=8).score_against(lion),
+    )
+    first_output = OutputData.from_grade(first, analysis.add(first))
+    second_output = OutputData.from_grade(second, analysis.add(second))
+    assert export_results([first_output], path) == 1
+    with CsvResultWriter(path, append=True) as writer:
+        writer.write(second_output)
+
+    with open(path, newline="") as file:
+        rows = list(csv.DictReader(file))
+    assert [(row["card"], row["status"], row["time"]) for row in rows] == [
+        ("7", "SUCCESS", "1200"),
+        ("8", "MISSES", "1200"),
+    ]
+    assert rows[1]["missed_controls"] == "36 38 39"
+    assert rows[1]["splits"] == "31=60 33=120 36= 38= 39="
+    assert rows[0]["legs"] == "31=60 33=60 36=60 38=60 39=60 F=900"
+    assert rows[0]["time_lost"] == "31= 33= 36= 38= 39= F="
+    assert rows[1]["legs"] == "31=60 33=60 36= 38= 39= F="
+    assert rows[1]["time_lost"] == "31=+0 33=+0 36= 38= 39= F="
+
+
+def class_results(path) -> list[tuple[str, list[str]]]:
+    root = ET.parse(path).getroot()
+    return [
+        (
+            class_result.find(f"{IOF}Class/{IOF}Name").text,
+            [card.text for card in class_result.iter(f"{IOF}ControlCard")],
+        )
+        for class_result in root.findall(f"{IOF}ClassResult")
+    ]
+
+
+def test_iof_result_list_groups_results_by_course(tmp_path):
+    path = tmp_path / "results.xml"
+    lion, dog = (next(course for course in COURSES if course.course_name == name) for name in ("Lion", "Dog"))
+    with IofResultListWriter(path) as writer:
+        assert class_results(path) == []
+        writer.write(readout([31, 33, 36, 38, 39], card_id=1).score_against(lion))
+        writer.write(readout([31, 33], card_id=2).score_against(lion))
+        writer.write(readout([33, 32, 40, 38, 34], card_id=3).score_against(dog))
+        # back to a course that's had results: into its own <ClassResult>, not a new one
+        writer.write(readout([31, 33, 36], card_id=4).score_against(lion))
+        # nothing half-written in the file until the writer is closed
+        assert class_results(path) == []
+    assert class_results(path) == [("Lion", ["1", "2", "4"]), ("Dog", ["3"])]
+
+    # a restarted station carries on in the same file, and the same classes
+    with IofResultListWriter(path, append=True) as writer:
+        writer.write(readout([31], card_id=5).score_against(lion))
+        writer.write(readout([33], card_id=6).score_against(dog))
+        assert class_results(path) == [("Lion", ["1", "2", "4"]), ("Dog", ["3"])]
+    assert class_results(path) == [("Lion", ["1", "2", "4", "5"]), ("Dog", ["3", "6"])]
+    assert ET.parse(path).getroot().find(f"{IOF}Event/{IOF}Name").text == "EasySnec"
+
+    person_result = ET.parse(path).getroot().find(f"{IOF}ClassResult/{IOF}PersonResult")
+    # no names at a station, the card stands in for the runner
+    assert person_result.find(f"{IOF}Person/{IOF}Id").text == "1"
+    assert person_result.find(f"{IOF}Person/{IOF}Name/{IOF}Family").text == "1"
+    result = person_result.find(f"{IOF}Result")
+    assert result.find(f"{IOF}Status").text == "OK"
+    assert result.find(f"{IOF}Time").text == "1200"
+    assert [split.find(f"{IOF}Time").text for split in result.findall(f"{IOF}SplitTime")] == [
+        "60",
+        "120",
+        "180",
+        "240",
+        "300",
+    ]
+
+
+def test_live_iof_result_list_catches_up_after_a_write(tmp_path):
+    path = tmp_path / "results.xml"
+    lion = next(course for course in COURSES if course.course_name == "Lion")
+    with IofResultListWriter(path, flush_interval=0.05) as writer:
+        writer.write(readout([31, 33, 36, 38, 39], card_id=1).score_against(lion))
+        deadline = time.monotonic() + 5
+        while class_results(path) == [] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert class_results(path) == [("Lion", ["1"])]
+        # and the next result still goes in after it
+        writer.write(readout([31, 33], card_id=2).score_against(lion))
+        writer.flush()
+        assert class_results(path) == [("Lion", ["1", "2"])]
+    assert class_results(path) == [("Lion", ["1", "2"])]
+    assert not (tmp_path / "results.xml.partial").exists()
+
+
+def test_pipeline_appends_to_live_exports(tmp_path):
+    with CsvResultWriter(tmp_path / "live.csv") as writer:
+        pipeline = GradingPipeline(COURSES, lambda grade: None, exports=[writer])
+        pipeline.restore([generate_input_from_station_list([31, 33, 36])])
+        worker = threading.Thread(target=pipeline.run)
+        worker.start()
+        pipeline.submit(generate_input_from_station_list([31, 33, 36, 38, 39]))
+        pipeline.close()
+        worker.join(timeout=5)
+        assert writer.count == 2
+
+    with open(tmp_path / "live.csv", newline="") as file:
+        assert [row["status"] for row in csv.DictReader(file)] == ["MISSES", "SUCCESS"]
+
+
+def test_export_command_grades_with_the_score_type(tmp_path, monkeypatch):
+    readouts = make_readouts(random.Random(8), 50)
+    with ReadoutJournal(tmp_path / "journal.sqlite3") as journal:
+        for readout in readouts:
+            journal.append(readout)
+
+    out = tmp_path / "results.csv"
+    argv = ["easysnec", "export", str(out), f"--journal={tmp_path / 'journal.sqlite3'}", "--score-type", "score-o"]
+    monkeypatch.setattr(sys, "argv", argv)
+    app.main()
+
+    with open(out, newline="") as file:
+        rows = list(csv.DictReader(file))
+    expected = replay_grades(readouts, COURSES, ScoreType.SCORE_O)
+    assert [row["score"] for row in rows] == [f"{grade.score:g}" for grade in expected]
+
+
+def test_export_command_rejects_a_missing_course_file(tmp_path, monkeypatch, capsys):
+    with ReadoutJournal(tmp_path / "journal.sqlite3") as journal:
+        journal.append(generate_input_from_station_list([39, 31, 32, 35, 37]))
+
+    out = tmp_path / "results.csv"
+    argv = [
+        "easysnec",
+        "export",
+        str(out),
+        f"--journal={tmp_path / 'journal.sqlite3'}",
+        f"--courses={tmp_path / 'nope.xml'}",
+    ]
+    monkeypatch.setattr(sys, "argv", argv)
+    with pytest.raises(SystemExit):
+        app.main()
+
+    assert "could not load courses from" in capsys.readouterr().err
+    assert not out.exists()
@@ -1,6 +1,17 @@
 from __future__ import annotations
 import datetime as dt
-from easysnec.utils.grading import InputData, Grade, Course, SuccessStatus, ScoreType
+from easysnec.utils.grading import (
+    COURSES,
+    InputData,
+    Grade,
+    Course,
+    SuccessStatus,
+    ScoreType,
+    grade_many,
+)
+import dataclasses
+import pickle
+import random
 import uuid
 import pytest
 
@@ -86,25 +97,27 @@ def test_classic_o():
     raise NotImplementedError()
 
 
-@pytest.mark.xfail
-def test_score_o():
-    _course = [1, 2, 3, 4, 5, 6]
-
-    # TODO: (input, expected score)?
-    _cases = [
-        [1, 2, 3, 4, 5, 6],  # -> 6
-        [1, 2, 3, 4, 5],  # -> 5
-        [1, 2, 3, 4, 5, 5],  # -> 5
-        [1, 2, 4, 3, 5, 6],  # -> 6
-        [6, 5, 4, 3, 2, 1],  # -> 6
-        [1, 3, 2, 6, 7, 4, 5],  # -> 6
-        [2, 3, 4, 5, 6],  # -> 5
-        [3, 2, 6, 4, 5, 1][6],  # -> 6  # -> 1
-        [],  # -> 0
-        [8],  # -> 0
-        [2, 2, 2, 2, 2, 2, 2],  # -> 1
-    ]
-    raise NotImplementedError()
+@pytest.mark.parametrize(
+    "stations, expected",
+    [
+        ([1, 2, 3, 4, 5, 6], 6),
+        ([1, 2, 3, 4, 5], 5),
+        ([1, 2, 3, 4, 5, 5], 5),
+        ([1, 2, 4, 3, 5, 6], 6),
+        ([6, 5, 4, 3, 2, 1], 6),
+        ([1, 3, 2, 6, 7, 4, 5], 6),
+        ([2, 3, 4, 5, 6], 5),
+        ([3, 2, 6, 4, 5, 1], 6),
+        ([6], 1),
+        ([], 0),
+        ([8], 0),
+        ([2, 2, 2, 2, 2, 2, 2], 1),
+    ],
+)
+def test_score_o(stations, expected):
+    course = Course("score", True, [1, 2, 3, 4, 5, 6])
+    grade = generate_input_from_station_list(stations).score_against(course, ScoreType.SCORE_O)
+    assert grade.score == expected
 
 
 def test_correct(example_course, example_input_success):
@@ -135,3 +148,94 @@ def test_no_finish(example_course, example_input_no_finish):
     grade = Grade(example_input_no_finish, example_course, ScoreType.SCORE_O)
 
     assert grade.status == SuccessStatus.INCOMPLETE
+
+
+def test_from_si_result_keeps_reader_id():
+    si_result = {
+        "card_number": 123,
+        "start": dt.datetime(2025, 3, 14, 9, 30, 17),
+        "finish": dt.datetime(2025, 3, 14, 10, 22, 47),
+        "punches": [(42, dt.datetime(2025, 3, 14, 9, 37, 2))],
+        "check": None,
+        "clear": None,
+    }
+
+    assert InputData.from_si_result(si_result, reader_id="/dev/ttyUSB1").reader_id == "/dev/ttyUSB1"
+    assert InputData.from_si_result(si_result).reader_id is None
+
+
+def test_grade_many_matches_grade():
+    rng = random.Random(3)
+    start = dt.datetime(2025, 3, 14, 9, 30, 17)
+    readouts = []
+    for i in range(500):
+        stations = list(rng.choice(COURSES).stations)
+        for _ in range(rng.choice((0, 0, 1, 2))):
+            if stations and rng.random() < 0.5:
+                stations.pop(rng.randrange(len(stations)))
+            else:
+                stations.insert(rng.randint(0, len(stations)), rng.randint(25, 45))
+        finish = rng.choice([start + dt.timedelta(seconds=rng.randint(60, 5000)), None, dt.datetime.min])
+        readouts.append(
+            InputData(
+                card_id=i,
+                start_time=rng.choice([start, start, None]),
+                finish_time=finish,
+                punches=[(station, start) for station in stations],
+                reading_id=uuid.uuid4(),
+            )
+        )
+
+    for score_type in (ScoreType.SCORE_O, ScoreType.ANIMAL_O):
+        batch = grade_many(readouts, COURSES, score_type)
+        assert len(batch) == len(readouts)
+        for i, readout in enumerate(readouts):
+            grade = readout.score_against(readout.get_closest_course(COURSES), score_type)
+            assert batch.courses[i] == grade.course
+            assert batch.status[i] == grade.status
+            assert batch.score[i] == grade.score
+            assert batch.missed_checkpoints[i] == grade.missed_checkpoints
+            assert batch.extra_checkpoints[i] == grade.extra_checkpoints
+
+
+def test_no_time_at_all_scores_nothing():
+    start = dt.datetime(2025, 3, 14, 9, 30)
+    lion = next(course for course in COURSES if course.course_name == "Lion")
+    readouts = [
+        InputData(
+            card_id=card_id,
+            start_time=start,
+            finish_time=start + dt.timedelta(seconds=seconds),
+            punches=[(station, start) for station in lion.stations],
+            reading_id=uuid.uuid4(),
+        )
+        for card_id, seconds in ((1, 0), (2, 600))
+    ]
+    batch = grade_many(readouts, COURSES, ScoreType.CLASSIC_O)
+    assert batch.status == [SuccessStatus.SUCCESS, SuccessStatus.SUCCESS]
+    assert batch.score.tolist() == [0, 1 / 600]
+    assert [readout.score_against(lion).score for readout in readouts] == [0, 1 / 600]
+
+
+def test_input_data_round_trips_punches(example_input_success):
+    punches = example_input_success.punches
+    assert punches == [
+        (42, dt.datetime(2025, 3, 14, 9, 37, 2)),
+        (43, dt.datetime(2025, 3, 14, 9, 57, 8)),
+        (49, dt.datetime(2025, 3, 14, 10, 9, 44)),
+    ]
+    assert example_input_success.stations == [42, 43, 49]
+    assert list(example_input_success.station_codes) == [42, 43, 49]
+
+    input_data = generate_input_from_station_list([])
+    assert input_data.punches == [] and input_data.stations == []
+
+
+def test_input_data_is_frozen_and_picklable(example_input_success):
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        example_input_success.card_id = 5
+
+    copy = pickle.loads(pickle.dumps(example_input_success))
+    assert copy == example_input_success
+    assert hash(copy) == hash(example_input_success)
+    assert copy != generate_input_from_station_list([42, 43, 49])
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+import threading
+import time
+
+from easysnec import app, headless
+from easysnec.headless import HeadlessStation
+from easysnec.utils.export import CsvResultWriter
+from easysnec.utils.grading import ScoreType, SuccessStatus
+
+from .test_grading import generate_input_from_station_list
+
+
+def test_headless_never_imports_pyside():
+    code = (
+        "import sys, easysnec.app, easysnec.headless; "
+        "sys.exit(any(name.split('.')[0] == 'PySide6' for name in sys.modules))"
+    )
+    assert subprocess.run([sys.executable, "-c", code], check=False).returncode == 0
+
+
+def test_headless_station_grades_and_journals(tmp_path):
+    grades = []
+    station = HeadlessStation([], tmp_path / "journal.sqlite3", on_grade=grades.append)
+    station.start()
+    station.pipeline.submit(generate_input_from_station_list([39, 31, 32, 35, 37]))
+    station.shutdown()
+    assert [grade.status for grade in grades] == [SuccessStatus.SUCCESS]
+
+    # a restarted station picks the readout back up from the journal
+    restarted = HeadlessStation([], tmp_path / "journal.sqlite3", on_grade=grades.append)
+    restarted.start()
+    restarted.shutdown()
+    assert [grade.status for grade in restarted.pipeline.results] == [SuccessStatus.SUCCESS]
+
+
+def test_a_reader_that_gave_up_is_started_again(tmp_path, monkeypatch):
+    started = []
+
+    class GivesUp:
+        # couldn't open its port
+        def __init__(self, port, on_readout):
+            started.append(port)
+
+        def run(self):
+            pass
+
+        def stop(self):
+            pass
+
+    monkeypatch.setattr(headless, "StationReader", GivesUp)
+    station = HeadlessStation(["/dev/ttyUSB0"], tmp_path / "journal.sqlite3")
+    station.start()
+    reader, _ = station.readers["/dev/ttyUSB0"]
+    reader.join(5)
+    station.attach_readers(["/dev/ttyUSB0"])
+    station.shutdown()
+    assert started == ["/dev/ttyUSB0", "/dev/ttyUSB0"]
+
+
+def test_port_changes_from_the_watcher_thread_are_not_lost(tmp_path, monkeypatch):
+    class Idle:
+        def __init__(self, port, on_readout):
+            # opening a port takes a moment, long enough for another change to come in meanwhile
+            time.sleep(0.01)
+            self.stopped = threading.Event()
+
+        def run(self):
+            self.stopped.wait()
+
+        def stop(self):
+            self.stopped.set()
+
+    monkeypatch.setattr(headless, "StationReader", Idle)
+    station = HeadlessStation([], tmp_path / "journal.sqlite3")
+    station.start()
+    ports = [f"/dev/ttyUSB{i}" for i in range(8)]
+    watchers = [threading.Thread(target=station.on_ports_changed, args=([port], [])) for port in ports]
+    for watcher in watchers:
+        watcher.start()
+    for watcher in watchers:
+        watcher.join(5)
+    assert sorted(station.ports) == ports
+    assert sorted(station.readers) == ports
+    station.shutdown()
+    assert station.readers == {}
+
+
+def test_score_type_flag_reaches_the_station(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(headless, "run_headless", lambda *args, **kwargs: calls.append(kwargs))
+    monkeypatch.setattr(
+        sys, "argv", ["easysnec", "--headless", "--score-type", "score-o", "--journal", str(tmp_path / "j.sqlite3")]
+    )
+    app.main()
+    assert [kwargs["score_type"] for kwargs in calls] == [ScoreType.SCORE_O]
+
+
+def test_shutdown_waits_for_the_grader(tmp_path):
+    class Export(CsvResultWriter):
+        def close(self):
+            closed.append(self.count)
+            super().close()
+
+    closed = []
+    # slower than any timeout the shutdown could have given up after
+    station = HeadlessStation([], tmp_path / "journal.sqlite3", on_grade=lambda grade: time.sleep(2.5))
+    station.exports.append(Export(tmp_path / "results.csv"))
+    station.pipeline.exports.append(station.exports[-1])
+    station.start()
+    station.pipeline.submit(generate_input_from_station_list([39, 31, 32, 35, 37]))
+    station.shutdown()
+    assert closed == [1]
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import datetime as dt
+import threading
+import uuid
+from pathlib import Path
+
+import pytest
+
+from easysnec.pipeline import GradingPipeline
+from easysnec.utils import journal as journal_module
+from easysnec.utils.grading import COURSES, InputData, SuccessStatus
+from easysnec.utils.journal import (
+    ReadoutJournal,
+    default_journal_path,
+    replay,
+    replay_grades,
+)
+
+from .test_grading import generate_input_from_station_list
+
+
+def test_journal_round_trip(tmp_path):
+    readouts = [
+        generate_input_from_station_list([39, 31, 32, 35, 37]),
+        InputData(
+            card_id=7,
+            start_time=None,
+            finish_time=dt.datetime(2025, 3, 14, 10, 22, 47, 500000),
+            punches=[],
+            reading_id=uuid.uuid4(),
+            reader_id="/dev/ttyUSB0",
+        ),
+    ]
+
+    with ReadoutJournal(tmp_path / "journal.sqlite3") as journal:
+        for input_data in readouts:
+            journal.append(input_data)
+        assert journal.flush(timeout=5)
+        assert list(journal.replay()) == readouts
+
+    # and again after a restart, straight from disk
+    assert list(replay(tmp_path / "journal.sqlite3")) == readouts
+
+
+def test_journal_ignores_duplicate_reading_ids(tmp_path):
+    input_data = generate_input_from_station_list([39, 31, 32, 35, 37])
+    with ReadoutJournal(tmp_path / "journal.sqlite3") as journal:
+        journal.append(input_data)
+        journal.append(input_data)
+
+    assert list(replay(tmp_path / "journal.sqlite3")) == [input_data]
+
+
+def test_replay_never_creates_a_journal(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        list(replay(tmp_path / "events" / "nope.sqlite3"))
+    with pytest.raises(FileNotFoundError):
+        list(replay(tmp_path / "nope.sqlite3"))
+    assert list(tmp_path.iterdir()) == []
+
+    (tmp_path / "empty.sqlite3").touch()
+    with pytest.raises(ValueError):
+        list(replay(tmp_path / "empty.sqlite3"))
+
+
+def test_pipeline_journals_and_restores(tmp_path):
+    path = tmp_path / "journal.sqlite3"
+    with ReadoutJournal(path) as journal:
+        pipeline = GradingPipeline(COURSES, lambda grade: None, journal=journal)
+        pipeline.submit(generate_input_from_station_list([39, 31, 32, 35, 37]))
+        pipeline.submit(generate_input_from_station_list([31, 33, 36, 38]))
+
+    restarted = GradingPipeline(COURSES, lambda grade: None)
+    assert restarted.restore(replay(path)) == 2
+    assert [grade.status for grade in restarted.results] == [
+        SuccessStatus.SUCCESS,
+        SuccessStatus.MISSES,
+    ]
+    assert [grade.course for grade in replay_grades(replay(path), COURSES)] == [
+        grade.course for grade in restarted.results
+    ]
+
+
+def test_every_event_has_its_own_journal(monkeypatch, tmp_path):
+    monkeypatch.setattr(Path, "home", lambda: tmp_path)
+    today = default_journal_path()
+    assert today == tmp_path / ".easysnec" / "events" / f"{dt.date.today().isoformat()}.sqlite3"
+    assert default_journal_path("spring-cup_2025") == today.with_name("spring-cup_2025.sqlite3")
+    for name in ("../escape", "a/b", ".."):
+        with pytest.raises(ValueError):
+            default_journal_path(name)
+
+
+def test_a_readout_that_wont_encode_costs_only_itself(tmp_path, monkeypatch):
+    bad, good = generate_input_from_station_list([31]), generate_input_from_station_list([39, 31, 32, 35, 37])
+    encode = journal_module._encode
+
+    def picky(input_data, now):
+        if input_data is bad:
+            raise ValueError("can't encode this one")
+        return encode(input_data, now)
+
+    monkeypatch.setattr(journal_module, "_encode", picky)
+    with ReadoutJournal(tmp_path / "journal.sqlite3", commit_interval=1) as journal:
+        # the same batch
+        journal.append(bad)
+        journal.append(good)
+        assert journal.flush(timeout=5)
+    assert list(replay(tmp_path / "journal.sqlite3")) == [good]
+
+
+def test_flush_fails_when_the_writer_died(tmp_path, monkeypatch):
+    journal = ReadoutJournal(tmp_path / "journal.sqlite3")
+
+    def broken(batch):
+        raise MemoryError
+
+    monkeypatch.setattr(journal, "_write", broken)
+    monkeypatch.setattr(threading, "excepthook", lambda args: None)
+    journal.append(generate_input_from_station_list([31]))
+    with pytest.raises(RuntimeError):
+        journal.flush(timeout=5)
+    with pytest.raises(RuntimeError):
+        journal.flush(timeout=5)
+    # appends after that don't pile up anywhere
+    journal.append(generate_input_from_station_list([32]))
+    journal.close()
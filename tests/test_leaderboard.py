@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import datetime as dt
+import random
+import uuid
+
+from easysnec.utils.grading import Course, InputData, ScoreType
+from easysnec.utils.leaderboard import Leaderboard, elapsed_seconds
+
+FOREST = Course("Forest", False, [31, 32, 33])
+FIELD = Course("Field", False, [34, 35])
+
+
+def grade(card_id: int, course: Course, minutes: float, stations: list[int] | None = None):
+    start = dt.datetime(2025, 3, 14, 9, 30)
+    stations = course.stations if stations is None else stations
+    input_data = InputData(
+        card_id=card_id,
+        start_time=start,
+        finish_time=start + dt.timedelta(minutes=minutes),
+        punches=[(station, start + dt.timedelta(seconds=i + 1)) for i, station in enumerate(stations)],
+        reading_id=uuid.uuid4(),
+    )
+    return input_data.score_against(course, ScoreType.CLASSIC_O)
+
+
+def test_leaderboard_ranks_by_score_then_time():
+    board = Leaderboard()
+    assert board.add(grade(1, FOREST, 30)) == 1
+    assert board.add(grade(2, FOREST, 20)) == 1
+    # a mispunch scores 0, so it ranks behind every clean run however fast it was
+    assert board.add(grade(3, FOREST, 10, [31, 33])) == 3
+    # same time as card 1: tied
+    assert board.add(grade(4, FOREST, 30)) == 2
+    assert board.add(grade(5, FIELD, 40)) == 1
+
+    assert [(s.rank, s.grade.input_data.card_id) for s in board.top("Forest", 10)] == [
+        (1, 2),
+        (2, 1),
+        (2, 4),
+        (4, 3),
+    ]
+    assert [s.grade.input_data.card_id for s in board.top("Forest", 2)] == [2, 1]
+    assert board.top("Nowhere", 3) == []
+    assert [board.rank(card) for card in (1, 2, 3, 4, 5, 6)] == [2, 1, 4, 2, 1, None]
+    assert sorted(board.courses()) == ["Field", "Forest"]
+    assert len(board) == 5
+
+
+def test_leaderboard_replaces_and_removes_readouts():
+    board = Leaderboard()
+    board.add(grade(1, FOREST, 30))
+    board.add(grade(2, FOREST, 25))
+    assert board.rank(1) == 2
+
+    # read out again, faster (say the start was fixed): replaces the old result instead of adding one
+    board.add(grade(1, FOREST, 20))
+    assert board.rank(1) == 1
+    assert len(board.top("Forest", 10)) == 2
+
+    # and again, now matching another course
+    board.add(grade(1, FIELD, 20))
+    assert [s.grade.input_data.card_id for s in board.top("Forest", 10)] == [2]
+    assert board.rank(1) == 1
+
+    assert board.remove(2).input_data.card_id == 2
+    assert board.remove(2) is None
+    assert board.courses() == ["Field"]
+
+
+def test_leaderboard_matches_full_sort():
+    rng = random.Random(7)
+    board = Leaderboard()
+    latest = {}
+    for _ in range(500):
+        card_id = rng.randrange(200)
+        course = rng.choice((FOREST, FIELD))
+        stations = course.stations if rng.random() < 0.8 else course.stations[:-1]
+        runner = grade(card_id, course, rng.randrange(10, 60), stations)
+        board.add(runner)
+        latest[card_id] = runner
+
+    for course in (FOREST, FIELD):
+        expected = sorted(
+            (runner for runner in latest.values() if runner.course is course),
+            key=lambda runner: (-runner.score, elapsed_seconds(runner)),
+        )
+        standings = board.top(course.course_name, len(expected))
+        assert [(-s.grade.score, elapsed_seconds(s.grade)) for s in standings] == [
+            (-runner.score, elapsed_seconds(runner)) for runner in expected
+        ]
+        for standing in standings:
+            assert board.rank(standing.grade.input_data.card_id) == standing.rank
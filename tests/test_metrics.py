@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import queue
+import threading
+import urllib.request
+
+from easysnec.pipeline import GradingPipeline
+from easysnec.utils.grading import COURSES
+from easysnec.utils.metrics import Metrics, MetricsServer
+
+from .test_grading import generate_input_from_station_list
+
+
+def test_metrics_quantiles_and_counters():
+    metrics = Metrics(window=100)
+    for ms in range(1, 201):
+        metrics.observe("grade", ms / 1000)
+    metrics.count("readouts")
+    metrics.count("readouts", 2)
+
+    stages, counters = metrics.snapshot()
+    count, total, (p50, p95, p99) = stages["grade"]
+    # the window only holds the last 100 samples (101..200 ms), count and sum cover all of them
+    assert count == 200
+    assert abs(total - sum(range(1, 201)) / 1000) < 1e-9
+    assert (p50, p95, p99) == (0.151, 0.196, 0.2)
+    assert counters == {"readouts": 3}
+    assert "grade p50 151.0ms" in metrics.summary()
+
+
+def test_pipeline_records_every_stage():
+    metrics = Metrics()
+    grades = queue.Queue()
+    pipeline = GradingPipeline(COURSES, grades.put, metrics=metrics)
+    worker = threading.Thread(target=pipeline.run)
+    worker.start()
+    readout = generate_input_from_station_list([39, 31, 32, 35, 37])
+    pipeline.submit(readout)
+    grades.get(timeout=5)
+    pipeline.submit(readout)  # a repeat
+    pipeline.close()
+    worker.join(timeout=5)
+
+    stages, counters = metrics.snapshot()
+    assert {stage: stages[stage][0] for stage in stages} == {
+        "queue_wait": 2,
+        "match_course": 1,
+        "grade": 1,
+        "readout_to_grade": 1,
+    }
+    assert counters == {"repeat_readouts": 1}
+
+
+def test_metrics_endpoint_speaks_prometheus():
+    metrics = Metrics()
+    metrics.observe("read_sicard", 0.25)
+    metrics.count("reader_exceptions")
+    server = MetricsServer(metrics, port=0)
+    server.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            body = response.read().decode()
+    finally:
+        server.stop()
+
+    assert 'easysnec_stage_seconds{stage="read_sicard",quantile="0.99"} 0.250000' in body
+    assert 'easysnec_stage_seconds_count{stage="read_sicard"} 1' in body
+    assert "easysnec_reader_exceptions_total 1" in body
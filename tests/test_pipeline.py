@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import threading
+
+from easysnec.pipeline import GradingPipeline
+from easysnec.utils.grading import COURSES, SuccessStatus
+
+from .test_grading import generate_input_from_station_list
+
+
+def test_pipeline_grades_in_submission_order():
+    grades = []
+    pipeline = GradingPipeline(COURSES, grades.append)
+    worker = threading.Thread(target=pipeline.run)
+    worker.start()
+
+    pipeline.submit(generate_input_from_station_list([39, 31, 32, 35, 37]))
+    pipeline.submit(generate_input_from_station_list([31, 33, 36, 38]))
+    pipeline.close()
+    worker.join(timeout=5)
+
+    assert not worker.is_alive()
+    assert [grade.course.course_name for grade in grades] == ["Crab", "Lion"]
+    assert [grade.status for grade in grades] == [SuccessStatus.SUCCESS, SuccessStatus.MISSES]
+    # same card both times: the second readout replaced the first in the standings
+    assert len(pipeline.leaderboard) == 1
+    assert pipeline.leaderboard.courses() == ["Lion"]
+
+
+def test_pipeline_survives_bad_readout():
+    grades = []
+
+    def on_grade(grade):
+        if not grades:
+            grades.append(None)
+            raise RuntimeError("ui went away")
+        grades.append(grade)
+
+    pipeline = GradingPipeline(COURSES, on_grade)
+    pipeline.submit(generate_input_from_station_list([39, 31, 32, 35, 37]))
+    pipeline.submit(generate_input_from_station_list([39, 31, 32, 35, 37]))
+    pipeline.close()
+    pipeline.run()
+
+    assert grades[0] is None
+    assert grades[1].status == SuccessStatus.SUCCESS
+
+
+def test_set_courses_waits_for_the_grade_in_progress():
+    grades = []
+    pipeline = GradingPipeline(COURSES, grades.append)
+    grading, release = threading.Event(), threading.Event()
+    grade = pipeline.grade
+
+    def slow_grade(input_data):
+        grading.set()
+        release.wait(timeout=5)
+        return grade(input_data)
+
+    pipeline.grade = slow_grade
+    worker = threading.Thread(target=pipeline.run)
+    worker.start()
+    pipeline.submit(generate_input_from_station_list([39, 31, 32, 35, 37]))
+    assert grading.wait(timeout=5)
+
+    # the gui swaps the courses while the grading thread is still grading against the old ones
+    swapper = threading.Thread(target=pipeline.set_courses, args=(COURSES[1:],))
+    swapper.start()
+    swapper.join(timeout=0.2)
+    assert swapper.is_alive()
+    release.set()
+    swapper.join(timeout=5)
+    pipeline.close()
+    worker.join(timeout=5)
+
+    assert grades[0].course.course_name == "Crab"
+    # the old course set's grade was cached before the swap, not after it
+    assert len(pipeline.cache) == 0
+
+
+def test_pipeline_stops_while_waiting_for_a_readout():
+    pipeline = GradingPipeline(COURSES, lambda grade: None)
+    stop = threading.Event()
+    worker = threading.Thread(target=pipeline.run, args=(stop,))
+    worker.start()
+
+    # nothing submitted: the grading thread is waiting on the empty queue
+    stop.set()
+    worker.join(timeout=5)
+    assert not worker.is_alive()
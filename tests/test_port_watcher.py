@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import queue
+import sys
+
+import pytest
+
+from easysnec.utils.port_watcher import (
+    PortWatcher,
+    WatchMode,
+    diff_ports,
+    list_sportident_ports,
+)
+
+
+def test_diff_ports():
+    assert diff_ports(["/dev/ttyUSB0", "/dev/ttyUSB1"], ["/dev/ttyUSB1", "/dev/ttyACM0"]) == (
+        ["/dev/ttyACM0"],
+        ["/dev/ttyUSB0"],
+    )
+    assert diff_ports(["/dev/ttyUSB0"], ["/dev/ttyUSB0"]) == ([], [])
+
+
+@pytest.mark.parametrize(
+    "mode",
+    [
+        pytest.param(
+            WatchMode.INOTIFY,
+            marks=pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is linux only"),
+        ),
+        WatchMode.POLL,
+    ],
+)
+def test_watcher_reports_plugged_and_unplugged_ports(tmp_path, mode):
+    changes = queue.Queue()
+    scans = []
+
+    def list_ports():
+        scans.append(1)
+        return [str(path) for path in tmp_path.glob("tty*")]
+
+    (tmp_path / "ttyUSB0").touch()
+    watcher = PortWatcher(
+        lambda added, removed: changes.put((added, removed)),
+        list_ports,
+        mode=mode,
+        poll_interval=0.05,
+        watch_dir=str(tmp_path),
+    )
+    assert watcher.start() == [str(tmp_path / "ttyUSB0")]
+    assert watcher.active_mode is mode
+    try:
+        (tmp_path / "ttyUSB1").touch()
+        assert changes.get(timeout=5) == ([str(tmp_path / "ttyUSB1")], [])
+        (tmp_path / "ttyUSB0").unlink()
+        assert changes.get(timeout=5) == ([], [str(tmp_path / "ttyUSB0")])
+
+        if mode is WatchMode.INOTIFY:
+            # nodes that can't be serial ports don't even trigger a scan
+            scanned = len(scans)
+            (tmp_path / "sda1").touch()
+            (tmp_path / "ttyUSB1").touch()  # attrib change, same ports: scan but no change reported
+            with pytest.raises(queue.Empty):
+                changes.get(timeout=0.3)
+            assert len(scans) == scanned + 1
+        else:
+            with pytest.raises(queue.Empty):
+                changes.get(timeout=0.3)
+    finally:
+        watcher.stop()
+
+
+def test_only_sportident_stations_are_listed_as_stations(monkeypatch):
+    import serial.tools.list_ports
+    from serial.tools.list_ports_common import ListPortInfo
+
+    def port(device, vid, pid):
+        info = ListPortInfo(device)
+        info.vid, info.pid = vid, pid
+        return info
+
+    ports = [
+        port("/dev/ttyUSB1", 0x10C4, 0x800A),
+        port("/dev/ttyACM0", 0x1546, 0x01A7),  # a gps
+        port("/dev/ttyS0", None, None),
+        port("/dev/ttyUSB0", 0x10C4, 0x800A),
+    ]
+    monkeypatch.setattr(serial.tools.list_ports, "comports", lambda: ports)
+    assert list_sportident_ports() == ["/dev/ttyUSB0", "/dev/ttyUSB1"]
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import cProfile
+import threading
+
+import pytest
+
+from easysnec.pipeline import GradingPipeline
+from easysnec.utils.grading import COURSES
+from easysnec.utils.profiling import ProfileConfig, Profiler, diff_snapshots
+
+from .test_grading import generate_input_from_station_list
+
+
+def test_profiler_is_a_no_op_until_started(tmp_path):
+    profiler = Profiler()
+    with profiler.profile():
+        pass
+    profiler.readout_done()
+    assert profiler.snapshot() == []
+    profiler.stop()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_pipeline_snapshots_rotate_and_diff(tmp_path):
+    profiler = Profiler()
+    profiler.start(ProfileConfig(tmp_path, every_readouts=2, sample=1, keep=2))
+    try:
+        pipeline = GradingPipeline(COURSES, lambda grade: None, profiler=profiler)
+        worker = threading.Thread(target=pipeline.run)
+        worker.start()
+        for stations in ([39, 31, 32, 35, 37], [31, 32], [32, 33, 34], [38, 34], [31], [33, 39]):
+            pipeline.submit(generate_input_from_station_list(stations))
+        pipeline.close()
+        worker.join(timeout=5)
+    finally:
+        profiler.stop()
+
+    # 3 due snapshots and the one from stop(), the newest 2 of each kind kept
+    profiles = sorted(tmp_path.glob("profile-*.pstats"))
+    memory = sorted(tmp_path.glob("memory-*.tracemalloc"))
+    assert (len(profiles), len(memory)) == (2, 2)
+
+    profile_diff = diff_snapshots(*profiles)
+    assert "own s" in profile_diff
+    assert "allocation changes" in diff_snapshots(*memory)
+    with pytest.raises(ValueError):
+        diff_snapshots(profiles[0], memory[0])
+
+
+def test_threads_profiling_at_the_same_time(tmp_path):
+    # from python 3.12 there is one profiler slot per process: whichever thread doesn't get it goes unprofiled
+    profiler = Profiler()
+    profiler.start(ProfileConfig(tmp_path, sample=1, memory_frames=0))
+    inside = threading.Barrier(2, timeout=5)
+    errors = []
+
+    def sample():
+        try:
+            with profiler.profile():
+                inside.wait()
+                sum(range(1000))
+                inside.wait()
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=sample) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # and the same when something else is already profiling
+    other = cProfile.Profile()
+    other.enable()
+    try:
+        with profiler.profile():
+            pass
+    finally:
+        other.disable()
+
+    try:
+        assert errors == []
+        assert len(profiler.snapshot()) == 1
+    finally:
+        profiler.stop()
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+import pickle
+import random
+import sqlite3
+
+import pytest
+from sportident import SIReader
+
+from easysnec.utils import raw_card
+from easysnec.utils.grading import COURSES, InputData
+from easysnec.utils.journal import ReadoutJournal, replay, replay_grades
+from easysnec.utils.raw_card import RawCard
+from easysnec.utils.si_simulator import encode_card, generate_cards
+
+READ_AT = dt.datetime(2025, 3, 14, 12, 0)
+
+# how much memory the station reads out of each card type
+CARD_SIZES = {
+    "SI5": 128,
+    "SI6": 128 * 3,
+    "SI8": 128 * 2,
+    "SI9": 128 * 2,
+    "SI10": 128 * 5,
+    "SIpCard": 128 * 2,
+    "SItCard": 128 * 2,
+}
+
+
+def random_memory(rng: random.Random, card_type: str, size: int) -> bytes:
+    # any bytes at all, with a believable punch count and some of the punch times reset
+    layout = SIReader.CARD[card_type]
+    memory = bytearray(rng.randbytes(size))
+    first = layout["P1"] + (128 * 3 if card_type == "SI10" and size == 128 * 8 else 0)
+    # up to a couple past the card's limit, as long as the records are in the memory read out
+    memory[layout["RC"]] = rng.randint(0, min(layout["PM"] + 2, (size - first) // layout["PL"]))
+    for record in range(layout["P1"], size - layout["PL"], layout["PL"]):
+        if rng.random() < 0.1:
+            memory[record + layout["PTH"] : record + layout["PTL"] + 1] = SIReader.TIME_RESET
+    return bytes(memory)
+
+
+@pytest.mark.parametrize("card_type, size", [*CARD_SIZES.items(), ("SI10", 128 * 8)])
+def test_decoding_agrees_with_sportident(card_type, size):
+    rng = random.Random(card_type)
+    for _ in range(200):
+        # read at any moment in the two weeks after READ_AT
+        read_at = READ_AT + dt.timedelta(microseconds=rng.randrange(14 * 24 * 3600 * 10**6))
+        raw = RawCard(card_type, random_memory(rng, card_type, size), read_at)
+        decoded = raw_card.decode(raw)
+        assert raw_card.card_number(raw) == decoded["card_number"]
+        assert raw_card.start_finish(raw) == (decoded["start"], decoded["finish"])
+        assert raw_card.punches(raw) == decoded["punches"]
+        assert raw_card.station_codes(raw).tolist() == [station for station, _ in decoded["punches"]]
+
+
+def test_unknown_card_type():
+    with pytest.raises(ValueError):
+        raw_card.station_codes(RawCard("SI11", bytes(256), READ_AT))
+
+
+def test_readout_decodes_punch_times_only_when_asked(monkeypatch):
+    card = generate_cards(random.Random(1), 1, now=READ_AT)[0]
+    raw = RawCard("SI9", encode_card(card), READ_AT)
+    decodes = []
+    punches = raw_card.punches
+    monkeypatch.setattr(raw_card, "punches", lambda raw: decodes.append(raw) or punches(raw))
+
+    readout = InputData.from_raw(raw, reader_id="/dev/ttyUSB0")
+    grade = readout.score_against(readout.get_closest_course(COURSES))
+    grade.status, grade.score, readout.fingerprint()
+    assert decodes == []
+
+    assert (readout.card_id, readout.start_time, readout.finish_time) == (
+        card.card_number,
+        card.start_time,
+        card.finish_time,
+    )
+    assert readout.punches == card.punches
+    assert readout.punches == card.punches
+    assert len(decodes) == 1
+
+    eager = InputData.from_si_result(raw_card.decode(raw), reader_id="/dev/ttyUSB0")
+    assert InputData.from_raw(raw, "/dev/ttyUSB0", eager.reading_id) == eager
+    # pickles as its card memory, not as the decoded punches
+    assert pickle.loads(pickle.dumps(readout)) == readout
+    assert pickle.loads(pickle.dumps(readout)).raw == raw
+
+
+def test_journal_keeps_the_card_memory(tmp_path):
+    path = tmp_path / "journal.sqlite3"
+    cards = generate_cards(random.Random(2), 5, now=READ_AT)
+    readouts = [InputData.from_raw(RawCard("SI9", encode_card(card), READ_AT)) for card in cards]
+    with ReadoutJournal(path) as journal:
+        for readout in readouts:
+            journal.append(readout)
+    assert list(replay(path)) == readouts
+
+    # replay decodes the card memory again, it doesn't go by the punches that were decoded when it was read
+    with sqlite3.connect(path) as connection:
+        connection.execute("UPDATE readouts SET punches = '[]', card_id = 0")
+    replayed = list(replay(path))
+    assert [readout.raw for readout in replayed] == [readout.raw for readout in readouts]
+    assert [readout.punches for readout in replayed] == [card.punches for card in cards]
+
+    # and if the card memory is beyond decoding, the punches stored next to it are what's left
+    with sqlite3.connect(path) as connection:
+        connection.execute("UPDATE readouts SET card_type = 'SI11'")
+    assert [readout.card_id for readout in replay(path)] == [0] * len(cards)
+
+
+def test_journal_from_before_card_memory(tmp_path):
+    path = tmp_path / "journal.sqlite3"
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "CREATE TABLE readouts (seq INTEGER PRIMARY KEY, reading_id TEXT NOT NULL UNIQUE, "
+            "card_id INTEGER NOT NULL, reader_id TEXT, start_time TEXT, finish_time TEXT, punches TEXT NOT NULL, "
+            "recorded_at REAL NOT NULL)"
+        )
+        connection.execute(
+            "INSERT INTO readouts (reading_id, card_id, start_time, finish_time, punches, recorded_at) "
+            "VALUES ('0c3c2f36-8d6e-4d8c-9f1e-1a2b3c4d5e6f', 7, NULL, NULL, ?, 0)",
+            (json.dumps([[31, "2025-03-14T10:00:00"]]),),
+        )
+
+    card = generate_cards(random.Random(3), 1, now=READ_AT)[0]
+    fresh = InputData.from_raw(RawCard("SI9", encode_card(card), READ_AT))
+    with ReadoutJournal(path) as journal:
+        journal.append(fresh)
+    old, new = replay(path)
+    assert old.raw is None and old.punches == [(31, dt.datetime(2025, 3, 14, 10))]
+    assert new == fresh
+    assert len(replay_grades([old, new], COURSES)) == 2
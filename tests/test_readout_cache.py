@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import threading
+import uuid
+
+from easysnec.pipeline import GradingPipeline
+from easysnec.utils.grading import COURSES, InputData, ScoreType
+from easysnec.utils.journal import ReadoutJournal, replay
+from easysnec.utils.readout_cache import ReadoutCache
+
+from .test_grading import generate_input_from_station_list
+
+
+def redip(input_data: InputData) -> InputData:
+    # the same card read out again: new reading_id, same punches
+    return InputData(
+        input_data.card_id,
+        input_data.start_time,
+        input_data.finish_time,
+        input_data.punches,
+        uuid.uuid4(),
+        input_data.reader_id,
+    )
+
+
+def test_cache_is_a_bounded_lru():
+    cache = ReadoutCache(maxsize=2)
+    readouts = [generate_input_from_station_list(stations) for stations in ([31], [32], [33])]
+    grades = [readout.score_against(COURSES[0]) for readout in readouts]
+
+    cache.put(readouts[0], grades[0])
+    cache.put(readouts[1], grades[1])
+    assert cache.get(redip(readouts[0])) is grades[0]  # now the most recent
+    cache.put(readouts[2], grades[2])  # evicts readouts[1]
+    assert cache.get(readouts[1]) is None
+    assert cache.get(readouts[2]) is grades[2]
+    # the score type is part of the key
+    assert cache.get(readouts[2], ScoreType.SCORE_O) is None
+    assert (cache.hits, cache.misses, len(cache)) == (2, 2, 2)
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_fingerprint_ignores_reading_but_not_punches():
+    readout = generate_input_from_station_list([39, 31, 32])
+    assert readout.fingerprint() == redip(readout).fingerprint()
+    assert readout.fingerprint() != generate_input_from_station_list([39, 32, 31]).fingerprint()
+
+
+def test_pipeline_hands_out_the_first_grade_for_a_redip(tmp_path):
+    grades = []
+    with ReadoutJournal(tmp_path / "journal.sqlite3") as journal:
+        pipeline = GradingPipeline(COURSES, grades.append, journal=journal)
+        worker = threading.Thread(target=pipeline.run)
+        worker.start()
+
+        first = generate_input_from_station_list([39, 31, 32, 35, 37])
+        pipeline.submit(first)
+        pipeline.submit(redip(first))
+        pipeline.close()
+        worker.join(timeout=5)
+
+    assert len(grades) == 2
+    assert grades[1] is grades[0]
+    assert grades[1].input_data.reading_id == first.reading_id
+    assert len(pipeline.results) == 1
+    assert (pipeline.cache.hits, pipeline.cache.misses) == (1, 1)
+    # journaled once
+    assert [readout.reading_id for readout in replay(tmp_path / "journal.sqlite3")] == [first.reading_id]
+
+
+def test_new_course_set_invalidates_the_cache():
+    pipeline = GradingPipeline(COURSES, lambda grade: None)
+    first = generate_input_from_station_list([39, 31, 32, 35, 37])
+    pipeline.restore([first])
+    assert pipeline.cache.get(redip(first), ScoreType.ANIMAL_O) is not None
+
+    pipeline.set_courses(COURSES[:3])
+    assert pipeline.cache.get(redip(first), ScoreType.ANIMAL_O) is None
+
+
+def test_redip_while_the_first_readout_is_still_queued(tmp_path):
+    grades = []
+    exported = []
+    with ReadoutJournal(tmp_path / "journal.sqlite3") as journal:
+        pipeline = GradingPipeline(COURSES, grades.append, journal=journal)
+        pipeline.export = exported.append
+        first = generate_input_from_station_list([39, 31, 32, 35, 37])
+        # both in the queue before the grading thread gets to either
+        pipeline.submit(first)
+        pipeline.submit(redip(first))
+        pipeline.close()
+        pipeline.run()
+
+    assert len(grades) == 2 and grades[1] is grades[0]
+    assert len(pipeline.results) == len(exported) == 1
+    assert [readout.reading_id for readout in replay(tmp_path / "journal.sqlite3")] == [first.reading_id]
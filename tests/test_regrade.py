@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import csv
+import random
+import sys
+
+import pytest
+
+from easysnec import app
+from easysnec.utils.grading import COURSES, ScoreType
+from easysnec.utils.journal import ReadoutJournal, replay_grades
+from easysnec.utils.regrade import regrade
+
+from .benchmarks.bench_grade_many import make_readouts
+
+
+def answers(grades):
+    return [
+        (
+            grade.input_data,
+            grade.course,
+            grade.status,
+            grade.score,
+            grade.missed_checkpoints,
+            grade.extra_checkpoints,
+        )
+        for grade in grades
+    ]
+
+
+@pytest.mark.parametrize("score_type", [ScoreType.ANIMAL_O, ScoreType.SCORE_O])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_regrade_matches_grading_one_by_one(score_type, workers):
+    readouts = make_readouts(random.Random(5), 700)
+    expected = answers(replay_grades(readouts, COURSES, score_type))
+    # a generator in, chunks that don't divide the readouts evenly, more chunks than the pool holds at once
+    grades = regrade(iter(readouts), COURSES, score_type, workers=workers, chunk_size=64)
+    assert answers(grades) == expected
+
+
+def test_regrade_stops_when_the_caller_does():
+    readouts = make_readouts(random.Random(6), 500)
+    grades = regrade(readouts, COURSES, workers=2, chunk_size=50)
+    first = [next(grades) for _ in range(60)]
+    grades.close()
+    assert [grade.input_data for grade in first] == readouts[:60]
+
+
+def test_regrade_checks_its_arguments_up_front():
+    with pytest.raises(ValueError):
+        regrade([], [])
+    with pytest.raises(ValueError):
+        regrade([], COURSES, chunk_size=0)
+
+
+def test_regrade_command(tmp_path, monkeypatch, capsys):
+    readouts = make_readouts(random.Random(7), 300)
+    journals = [tmp_path / "a.sqlite3", tmp_path / "b.sqlite3"]
+    for path, part in zip(journals, (readouts[:100], readouts[100:])):
+        with ReadoutJournal(path) as journal:
+            for readout in part:
+                journal.append(readout)
+
+    out = tmp_path / "results.csv"
+    argv = ["easysnec", "regrade", str(out), "--workers", "2", "--chunk-size", "32"]
+    monkeypatch.setattr(sys, "argv", argv + [f"--journal={path}" for path in journals])
+    app.main()
+
+    with open(out, newline="") as file:
+        rows = list(csv.DictReader(file))
+    assert [int(row["card"]) for row in rows] == [readout.card_id for readout in readouts]
+    expected = replay_grades(readouts, COURSES)
+    assert [row["status"] for row in rows] == [grade.status.name for grade in expected]
+    assert "regraded 300 readouts" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("command", ["regrade", "export"])
+def test_commands_reject_a_missing_journal_before_writing(command, tmp_path, monkeypatch, capsys):
+    out = tmp_path / "results.csv"
+    out.write_text("kept\n")
+    argv = ["easysnec", command, str(out), f"--journal={tmp_path / 'nope.sqlite3'}"]
+    monkeypatch.setattr(sys, "argv", argv)
+    with pytest.raises(SystemExit):
+        app.main()
+
+    assert "no readout journal at" in capsys.readouterr().err
+    assert out.read_text() == "kept\n"
+    assert not (tmp_path / "nope.sqlite3").exists()
+
+
+def test_regrade_command_rejects_a_broken_course_file(tmp_path, monkeypatch, capsys):
+    courses = tmp_path / "courses.xml"
+    courses.write_text("<CourseData><RaceCourseData>")
+    out = tmp_path / "results.csv"
+    argv = ["easysnec", "regrade", str(out), f"--journal={tmp_path / 'nope.sqlite3'}", f"--courses={courses}"]
+    monkeypatch.setattr(sys, "argv", argv)
+    with pytest.raises(SystemExit):
+        app.main()
+
+    assert "could not load courses from" in capsys.readouterr().err
+    assert not out.exists()
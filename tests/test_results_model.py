@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from PySide6.QtCore import QModelIndex
+from PySide6.QtTest import QAbstractItemModelTester
+
+from easysnec.utils.grading import COURSES
+from easysnec.utils.results_model import ResultsModel
+from easysnec.utils.splits import SplitAnalysis
+
+from .test_grading import generate_input_from_station_list
+
+
+def grade(stations: list[int]):
+    input_data = generate_input_from_station_list(stations)
+    return input_data.score_against(input_data.get_closest_course(COURSES))
+
+
+def test_results_model_inserts_one_row_per_readout():
+    model = ResultsModel()
+    tester = QAbstractItemModelTester(model, QAbstractItemModelTester.FailureReportingMode.Fatal)
+    inserts = []
+    model.rowsInserted.connect(lambda parent, first, last: inserts.append((first, last)))
+    resets = []
+    model.modelReset.connect(lambda: resets.append(1))
+
+    assert model.get_latest()["scoringOutput"] == ""
+    model.append(grade([39, 31, 32, 35, 37]))
+    model.append(grade([39, 32, 31]))
+    model.extend([grade([39, 31, 32, 35, 37]) for _ in range(3)])
+    model.extend([])
+
+    assert inserts == [(0, 0), (1, 1), (2, 4)]
+    assert not resets
+    assert model.rowCount() == model.get_count() == 5
+    assert model.rowCount(model.index(0)) == 0
+
+    names = {bytes(name).decode(): role for role, name in model.roleNames().items()}
+    second = model.index(1)
+    assert model.data(second, names["status"]) == "MISSES"
+    assert model.data(second, names["feedbackMessage"]) == "Try again!"
+    assert model.data(second, names["scoringOutput"]).startswith("Missing checkpoints: ")
+    assert model.data(model.index(0), names["status"]) == "SUCCESS"
+    assert model.data(model.index(0), names["time"]) != ""
+    assert model.data(QModelIndex(), names["status"]) is None
+
+    assert model.data(model.index(0), names["splits"]).startswith("39 ")
+    assert model.legStats("Crab") == []
+    model.split_analysis = SplitAnalysis()
+    model.split_analysis.add(model.grade(0))
+    crab = model.legStats("Crab")
+    assert [(leg["from"], leg["to"], leg["count"]) for leg in crab[:2]] == [(None, 39, 1), (39, 31, 1)]
+    assert crab[0]["median"] == crab[0]["mean"] and "q25" in crab[0]
+
+    assert model.get_latest()["status"] == "SUCCESS"
+    assert model.grade(1).status.name == "MISSES"
+
+    # the pipeline hands a re-dip out as the grade it already has: no new row, but it's the latest again
+    latest = []
+    model.latestChanged.connect(lambda: latest.append(1))
+    model.append(model.grade(1))
+    assert model.rowCount() == 5 and inserts[-1] == (2, 4)
+    assert latest and model.get_latest()["status"] == "MISSES"
+    del tester
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import datetime as dt
+import random
+import uuid
+
+import pytest
+
+from easysnec.utils.grading import (
+    Course,
+    InputData,
+    ScoreType,
+    SuccessStatus,
+    grade_many,
+)
+from easysnec.utils.score_o import ScoreOCourse, compile_score_o
+
+
+def readout(stations: list[int], minutes: float | None) -> InputData:
+    start = dt.datetime(2025, 3, 14, 9, 30)
+    return InputData(
+        card_id=1,
+        start_time=start,
+        finish_time=None if minutes is None else start + dt.timedelta(minutes=minutes),
+        punches=[(station, start + dt.timedelta(seconds=i + 1)) for i, station in enumerate(stations)],
+        reading_id=uuid.uuid4(),
+    )
+
+
+COURSE = Course(
+    "score",
+    True,
+    [31, 32, 33, 34, 35],
+    time_limit=dt.timedelta(minutes=45),
+    penalty_per_minute=2,
+    control_values={31: 10, 32: 20, 35: 50},
+)
+
+
+@pytest.mark.parametrize(
+    "stations, minutes, points, penalty",
+    [
+        ([31, 32, 33, 34, 35], 40, 82, 0),
+        ([35, 35, 40], 45, 50, 0),  # on the limit is still in time
+        ([35, 35, 40], 45 + 1 / 60, 50, 2),  # one second over is a started minute
+        ([31, 32], 50, 30, 10),
+        ([31], 60, 10, 30),  # can't go below 0
+        ([], 10, 0, 0),
+    ],
+)
+def test_score_o_values_and_penalties(stations, minutes, points, penalty):
+    result = compile_score_o(COURSE).score(readout(stations, minutes))
+    assert (result.points, result.penalty) == (points, penalty)
+    assert result.score == max(points - penalty, 0)
+    assert compile_score_o(COURSE).total(readout(stations, minutes)) == result.score
+    assert readout(stations, minutes).score_against(COURSE, ScoreType.SCORE_O).score == result.score
+
+
+@pytest.mark.parametrize("score_type", [ScoreType.ANIMAL_O, ScoreType.SCORE_O])
+def test_a_score_o_course_is_graded_as_one_whatever_the_station_is_set_to(score_type):
+    readouts = [readout([35, 33, 31], 40), readout([], 40), readout([31, 32], None)]
+    grades = [input_data.score_against(COURSE, score_type) for input_data in readouts]
+    assert [grade.status for grade in grades] == [
+        SuccessStatus.SUCCESS,
+        SuccessStatus.SUCCESS,
+        SuccessStatus.INCOMPLETE,
+    ]
+    assert [grade.score for grade in grades] == [61, 0, 0]
+    assert [grade.missed_checkpoints for grade in grades[:2]] == [[], []]
+
+    batch = grade_many(readouts, [COURSE], score_type)
+    assert batch.status == [grade.status for grade in grades]
+    assert batch.score.tolist() == [grade.score for grade in grades]
+    assert batch.missed_checkpoints == [grade.missed_checkpoints for grade in grades]
+
+
+def test_score_o_visited_mask():
+    compiled = ScoreOCourse(COURSE)
+    assert compiled.visited([33, 31, 99, 33]) == 0b101
+    assert compile_score_o(COURSE) is compile_score_o(COURSE)
+
+
+@pytest.mark.parametrize("controls", [12, 70])
+def test_score_many_matches_score(controls):
+    rng = random.Random(controls)
+    course = Course(
+        "big",
+        True,
+        rng.sample(range(31, 400), controls),
+        time_limit=dt.timedelta(minutes=60),
+        penalty_per_minute=1.5,
+        control_values={station: rng.randint(1, 9) for station in range(31, 400, 3)},
+    )
+    readouts = [
+        readout(
+            rng.choices(range(25, 420), k=rng.randint(0, 2 * controls)),
+            rng.choice([None, rng.uniform(10, 90)]),
+        )
+        for _ in range(300)
+    ]
+    compiled = compile_score_o(course)
+    assert compiled.score_many(readouts).tolist() == [compiled.score(r).score for r in readouts]
+    assert compiled.score_many([]).tolist() == []
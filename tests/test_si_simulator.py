@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import os
+import random
+import threading
+
+import pytest
+from sportident import SIReader
+
+from easysnec.reader import StationReader
+from easysnec.utils.si_simulator import (
+    SimulatedCard,
+    SimulatedStation,
+    SimulatorConfig,
+    encode_card,
+    generate_cards,
+)
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "openpty"), reason="needs a pty")
+
+
+@pytest.mark.parametrize("card_number", [1_234_567, 2_345_678])
+def test_encoded_card_decodes_back(card_number):
+    card = generate_cards(random.Random(1), 1, first_card=card_number)[0]
+    card_type = "SI9" if card_number < 2_000_000 else "SI8"
+    decoded = SIReader._decode_carddata(encode_card(card), card_type)
+    assert decoded["card_number"] == card.card_number
+    assert decoded["start"] == card.start_time
+    assert decoded["finish"] == card.finish_time
+    assert decoded["punches"] == card.punches
+
+
+def test_encoded_card_without_start():
+    card = SimulatedCard(1_000_001, None, None, [])
+    decoded = SIReader._decode_carddata(encode_card(card), "SI9")
+    assert decoded["start"] is None and decoded["finish"] is None and decoded["punches"] == []
+
+
+def test_reader_loop_against_simulated_station():
+    cards = generate_cards(random.Random(2), 12)
+    readouts = []
+    config = SimulatorConfig(removed_early=0.15, bad_crc=0.15, seed=3)
+    with SimulatedStation(cards, config) as station:
+        reader = StationReader(station.port, readouts.append)
+        thread = threading.Thread(target=reader.run)
+        thread.start()
+        try:
+            assert station.finished.wait(30)
+        finally:
+            reader.stop()
+            thread.join()
+
+    stats = station.stats
+    assert stats.inserted == len(cards)
+    assert stats.acked + stats.removed_early + stats.bad_crc == len(cards)
+    assert stats.removed_early and stats.bad_crc
+
+    # exactly the cards the reader acked made it through, with their punches intact
+    by_number = {card.card_number: card for card in cards}
+    assert sorted(input_data.card_id for input_data in readouts) == sorted(stats.acked_at)
+    for input_data in readouts:
+        card = by_number[input_data.card_id]
+        assert input_data.reader_id == station.port
+        assert (input_data.start_time, input_data.finish_time) == (card.start_time, card.finish_time)
+        assert input_data.punches == card.punches
+        assert input_data.raw.data == encode_card(card)
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import datetime as dt
+import random
+import statistics
+import threading
+import uuid
+
+import pytest
+
+from easysnec.pipeline import GradingPipeline
+from easysnec.utils.grading import (
+    COURSES,
+    Course,
+    InputData,
+    OutputData,
+    ScoreType,
+    SuccessStatus,
+)
+from easysnec.utils.splits import P2Quantile, RunningStats, SplitAnalysis
+
+START = dt.datetime(2025, 3, 14, 9, 30)
+LION = next(course for course in COURSES if course.course_name == "Lion")  # 31, 33, 36, 38, 39
+
+
+def readout(punches: list[tuple[int, int]], finish: int, card_id: int = 7) -> InputData:
+    # punches as (control, seconds after the start)
+    return InputData(
+        card_id=card_id,
+        start_time=START,
+        finish_time=START + dt.timedelta(seconds=finish),
+        punches=[(control, START + dt.timedelta(seconds=seconds)) for control, seconds in punches],
+        reading_id=uuid.uuid4(),
+    )
+
+
+def test_running_stats_and_p2_quantiles():
+    rng = random.Random(3)
+    times = [rng.lognormvariate(5, 0.4) for _ in range(5000)]
+    stats = RunningStats()
+    estimates = {q: P2Quantile(q) for q in (0.25, 0.5, 0.75)}
+    for i, seconds in enumerate(times):
+        stats.add(seconds)
+        for estimate in estimates.values():
+            estimate.add(seconds)
+        if i == 2:
+            # exact while there are five or fewer
+            assert estimates[0.5].value == sorted(times[:3])[1]
+
+    assert stats.mean == pytest.approx(statistics.mean(times))
+    assert stats.stdev == pytest.approx(statistics.stdev(times))
+    ordered = sorted(times)
+    for q, estimate in estimates.items():
+        assert estimate.value == pytest.approx(ordered[int(q * len(ordered))], rel=0.03)
+    assert P2Quantile(0.5).value is None
+
+
+def test_legs_follow_the_course():
+    grade = readout([(31, 60), (36, 150), (33, 180), (38, 240), (39, 300)], 330).score_against(LION)
+    legs = [(leg.from_control, leg.to_control, leg.seconds, leg.cumulative) for leg in grade.legs]
+    # 36 was punched before 33, so it doesn't count and neither leg around it has a time
+    assert legs == [
+        (None, 31, 60.0, 60.0),
+        (31, 33, 120.0, 180.0),
+        (33, 36, None, None),
+        (36, 38, None, 240.0),
+        (38, 39, 60.0, 300.0),
+        (39, None, 30.0, 330.0),
+    ]
+    assert SplitAnalysis().time_lost(grade) == [None] * 6
+
+
+def test_time_lost_is_against_the_runners_before():
+    analysis = SplitAnalysis()
+    first = readout([(31, 60), (33, 120), (36, 180), (38, 240), (39, 300)], 330).score_against(LION)
+    second = readout([(31, 90), (33, 140), (36, 200), (38, 260), (39, 320)], 350).score_against(LION)
+    assert analysis.add(first) == [None] * 6
+    assert analysis.add(second) == [30.0, -10.0, 0.0, 0.0, 0.0, 0.0]
+    assert analysis.time_lost(second) == [30.0, -10.0, 0.0, 0.0, 0.0, 0.0]
+    assert OutputData.from_grade(second, analysis.time_lost(second)).time_lost == [30.0, -10.0, 0.0, 0.0, 0.0, 0.0]
+
+    legs = analysis.legs("Lion")
+    assert [(leg.from_control, leg.to_control, leg.count) for leg in legs] == [
+        (None, 31, 2),
+        (31, 33, 2),
+        (33, 36, 2),
+        (36, 38, 2),
+        (38, 39, 2),
+        (39, None, 2),
+    ]
+    assert legs[0].mean == 75.0
+    assert legs[0].stdev == pytest.approx(statistics.stdev([60, 90]))
+    assert analysis.legs("Frog") == []
+
+    # same name, other controls: that's a different course, its statistics start over
+    changed = Course("Lion", False, [31, 33])
+    analysis.add(readout([(31, 60), (33, 120)], 150).score_against(changed))
+    assert [leg.count for leg in analysis.legs("Lion")] == [1, 1, 1]
+
+
+def test_pipeline_works_out_time_lost_before_handing_grades_out():
+    graded = []
+    pipeline = GradingPipeline([LION], graded.append)
+    pipeline.restore([readout([(31, 60), (33, 120), (36, 180), (38, 240), (39, 300)], 330, card_id=1)])
+    worker = threading.Thread(target=pipeline.run)
+    worker.start()
+    pipeline.submit(readout([(31, 50), (33, 120), (36, 180), (38, 240), (39, 300)], 330, card_id=2))
+    pipeline.close()
+    worker.join(5)
+
+    assert pipeline.splits.time_lost(graded[0]) == [-10.0, 10.0, 0.0, 0.0, 0.0, 0.0]
+    assert [leg.count for leg in pipeline.splits.legs("Lion")] == [2] * 6
+
+
+def test_only_clean_runs_go_into_the_statistics():
+    analysis = SplitAnalysis()
+    clean = readout([(31, 60), (33, 120), (36, 180), (38, 240), (39, 300)], 330)
+    analysis.add(clean.score_against(LION))
+
+    # a mispunch gets its time lost on the legs it has, but doesn't move the medians
+    mispunch = readout([(31, 600), (33, 1200), (38, 1300), (39, 1400)], 1500).score_against(LION)
+    assert mispunch.status is SuccessStatus.MISSES
+    assert analysis.add(mispunch)[:2] == [540.0, 540.0]
+    # neither does a card that never finished
+    unfinished = InputData(
+        card_id=8,
+        start_time=START,
+        finish_time=None,
+        punches=[(31, START + dt.timedelta(seconds=900))],
+        reading_id=uuid.uuid4(),
+    )
+    analysis.add(unfinished.score_against(LION))
+    assert [leg.count for leg in analysis.legs("Lion")] == [1] * 6
+
+    # and a score-o course has no legs to compare
+    score = Course("Score", True, [31, 33])
+    assert analysis.add(clean.score_against(score, ScoreType.SCORE_O)) == [None] * 3
+    assert analysis.courses() == ["Lion"]